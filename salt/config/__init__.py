@@ -187,6 +187,14 @@ VALID_OPTS = {
     # '': Disable the key cache [default]
     'key_cache': six.string_types,
 
+    # The number of minion public keys, and of RSA objects made out of them,
+    # each master worker keeps in memory for authentication
+    'minion_key_cache_size': int,
+
+    # The number of minion sign-ins per second the master handles, the minions
+    # beyond that rate are told when to try again. 0 means no limit.
+    'auth_rate_limit': float,
+
     # The user under which the daemon should run
     'user': six.string_types,
 
@@ -361,6 +369,21 @@ VALID_OPTS = {
     # Maximum number of concurrently active processes at any given point in time
     'process_count_max': int,
 
+    # The number of pre-forked processes running the jobs of the minion, 0 to
+    # fork a process for each job
+    'job_workers': int,
+
+    # The number of jobs a job worker runs before being replaced, 0 for no limit
+    'job_worker_max_jobs': int,
+
+    # The globs of the functions whose jobs run in the job workers, all of
+    # them when empty
+    'job_worker_functions': list,
+
+    # Whether the minion process keeps track of the running jobs in memory
+    # rather than reading the proc files whenever they are listed
+    'job_registry': bool,
+
     # Whether or not the salt minion should run scheduled mine updates
     'mine_enabled': bool,
 
@@ -379,6 +402,23 @@ VALID_OPTS = {
     # The chunk size to use when streaming files with the file server
     'file_buffer_size': int,
 
+    # Only fetch the changes to files which the minion has an older copy of
+    'file_delta': bool,
+
+    # The number of chunks of file_buffer_size bytes the minion asks for in
+    # each request when fetching a file
+    'file_transfer_chunks': int,
+
+    # The maximum number of chunks the master sends in reply to one request
+    'file_transfer_max_chunks': int,
+
+    # Fetch the small files of a directory or environment in batches
+    'file_bulk_fetch': bool,
+
+    # Keep a manifest of the files on the master and only fetch the changes to
+    # it, to tell which cached files are up to date
+    'file_manifest': bool,
+
     # The TCP port on which minion events should be published if ipc_mode is TCP
     'tcp_pub_port': int,
 
@@ -479,6 +519,14 @@ VALID_OPTS = {
     # Fire events as state chunks are processed by the state compiler
     'state_events': bool,
 
+    # The number of worker processes used to run independent state chunks at
+    # the same time, 0 or 1 runs the chunks one after another
+    'state_workers': int,
+
+    # Cache the rendered data of SLS files on the minion and only render them
+    # again when the file, pillar, grains or renderer configuration changes
+    'state_render_cache': bool,
+
     # The number of seconds a minion should wait before retry when attempting authentication
     'acceptance_wait_time': float,
 
@@ -540,6 +588,12 @@ VALID_OPTS = {
     'return_retry_timer': int,
     'return_retry_timer_max': int,
 
+    # The number of seconds during which the returns of finished jobs are collected to be sent
+    # to the master in one request, 0 sends every return on its own, and the number of returns
+    # after which the batch is sent right away
+    'return_batch_window': float,
+    'return_batch_size': int,
+
     # Specify one or more returners in which all events will be sent to. Requires that the returners
     # in question have an event_return(event) function!
     'event_return': (list, six.string_types),
@@ -548,6 +602,17 @@ VALID_OPTS = {
     # returner specified by 'event_return'
     'event_return_queue': int,
 
+    # Also flush the queued events to the returner once they hold that many
+    # bytes, or once the oldest of them is that many seconds old
+    'event_return_queue_max_bytes': int,
+    'event_return_queue_max_seconds': (int, float),
+
+    # The number of flushed events which can wait for the returner in memory,
+    # and the size of the spill directory the events beyond that are written
+    # to before being dropped
+    'event_return_backlog': int,
+    'event_return_spill_size': int,
+
     # Only forward events to an event returner if it matches one of the tags in this list
     'event_return_whitelist': list,
 
@@ -601,6 +666,11 @@ VALID_OPTS = {
     # the number of connected minions increases.
     'worker_threads': int,
 
+    # Pools of extra MWorker processes dedicated to some commands, each with
+    # its worker_threads, queue_depth and commands. The other commands are
+    # handled by the worker_threads workers.
+    'worker_pools': dict,
+
     # The port for the master to listen to returns on. The minion needs to connect to this port
     # to send returns.
     'ret_port': int,
@@ -651,6 +721,10 @@ VALID_OPTS = {
     # Frequency of the proxy_keep_alive, in minutes
     'proxy_keep_alive_interval': int,
 
+    # Keep an index of the files served by the roots fileserver backend, and
+    # their hashes, which is updated every roots_update_interval seconds
+    'roots_index': bool,
+
     # Update intervals
     'roots_update_interval': int,
     'azurefs_update_interval': int,
@@ -838,12 +912,24 @@ VALID_OPTS = {
     # Specify whether the master should store end times for jobs as returns come in
     'job_cache_store_endtime': bool,
 
+    # Keep the local job cache in append-only segment files instead of a directory per job, and
+    # the size in bytes and age in seconds at which the segments are rotated
+    'job_cache_segments': bool,
+    'job_cache_segment_size': int,
+    'job_cache_segment_time': int,
+
     # The minion data cache is a cache of information about the minions stored on the master.
     # This information is primarily the pillar and grains data. The data is cached in the master
     # cachedir under the name of the minion and used to predetermine what minions are expected to
     # reply from executions.
     'minion_data_cache': bool,
 
+    # Keep an index of the grains and pillar in the minion data cache to resolve grain and pillar
+    # targets without reading the data of every minion, and the number of seconds between full
+    # checks of the index against the cache.
+    'minion_data_index': bool,
+    'minion_data_index_refresh': int,
+
     # The number of seconds between AES key rotations on the master
     'publish_session': int,
 
@@ -921,6 +1007,18 @@ VALID_OPTS = {
     # The number of minutes between the minion refreshing its cache of grains
     'grains_refresh_every': int,
 
+    # The number of seconds the result of each grains function is reused for,
+    # by function name or glob, overriding the TTLs the functions declare
+    'grains_ttl': dict,
+
+    # The number of threads running the grains functions which do not take the
+    # other grains concurrently, 0 runs them one after the other
+    'grains_workers': int,
+
+    # The number of seconds a grains function run by the grains_workers has to
+    # return before the grains of its last run are used instead
+    'grains_timeout': int,
+
     # Use lspci to gather system data for grains on a minion
     'enable_lspci': bool,
 
@@ -950,6 +1048,10 @@ VALID_OPTS = {
     # If set, the master will sign all publications before they are sent out
     'sign_pub_messages': bool,
 
+    # Encrypt with AES-GCM instead of AES-CBC and HMAC-SHA256: the requests of
+    # a minion, when its master supports it, and the publications of a master
+    'aes_gcm': bool,
+
     # The size of key that should be generated when creating new keys
     'keysize': int,
 
@@ -1237,6 +1339,7 @@ DEFAULT_MINION_OPTS = {
     'master_failback_interval': 0,
     'verify_master_pubkey_sign': False,
     'sign_pub_messages': False,
+    'aes_gcm': False,
     'always_verify_signature': False,
     'master_sign_key_name': 'master_sign',
     'syndic_finger': '',
@@ -1251,6 +1354,9 @@ DEFAULT_MINION_OPTS = {
     'grains_cache': False,
     'grains_cache_expiration': 300,
     'grains_deep_merge': False,
+    'grains_ttl': {},
+    'grains_workers': 0,
+    'grains_timeout': 30,
     'conf_file': os.path.join(salt.syspaths.CONFIG_DIR, 'minion'),
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'minion'),
     'sock_pool_size': 1,
@@ -1379,6 +1485,10 @@ DEFAULT_MINION_OPTS = {
     'autosign_timeout': 120,
     'multiprocessing': True,
     'process_count_max': -1,
+    'job_workers': 0,
+    'job_worker_max_jobs': 1000,
+    'job_worker_functions': [],
+    'job_registry': False,
     'mine_enabled': True,
     'mine_return_job': False,
     'mine_interval': 60,
@@ -1386,6 +1496,11 @@ DEFAULT_MINION_OPTS = {
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
     'ipv6': None,
     'file_buffer_size': 262144,
+    'file_delta': False,
+    'file_transfer_chunks': 1,
+    'file_transfer_max_chunks': 16,
+    'file_bulk_fetch': False,
+    'file_manifest': False,
     'tcp_pub_port': 4510,
     'tcp_pull_port': 4511,
     'tcp_authentication_retries': 5,
@@ -1413,6 +1528,8 @@ DEFAULT_MINION_OPTS = {
     'state_auto_order': True,
     'state_events': False,
     'state_aggregate': False,
+    'state_workers': 0,
+    'state_render_cache': False,
     'snapper_states': False,
     'snapper_states_config': 'root',
     'acceptance_wait_time': 10,
@@ -1432,6 +1549,8 @@ DEFAULT_MINION_OPTS = {
     'recon_randomize': True,
     'return_retry_timer': 5,
     'return_retry_timer_max': 10,
+    'return_batch_window': 0,
+    'return_batch_size': 100,
     'random_reauth_delay': 10,
     'winrepo_source_dir': 'salt://win/repo-ng/',
     'winrepo_dir': os.path.join(salt.syspaths.BASE_FILE_ROOTS_DIR, 'win', 'repo'),
@@ -1537,6 +1656,7 @@ DEFAULT_MASTER_OPTS = {
     'auth_mode': 1,
     'user': _MASTER_USER,
     'worker_threads': 5,
+    'worker_pools': {},
     'sock_dir': os.path.join(salt.syspaths.SOCK_DIR, 'master'),
     'sock_pool_size': 1,
     'ret_port': 4506,
@@ -1546,6 +1666,8 @@ DEFAULT_MASTER_OPTS = {
     'root_dir': salt.syspaths.ROOT_DIR,
     'pki_dir': os.path.join(salt.syspaths.CONFIG_DIR, 'pki', 'master'),
     'key_cache': '',
+    'minion_key_cache_size': 10000,
+    'auth_rate_limit': 0,
     'cachedir': os.path.join(salt.syspaths.CACHE_DIR, 'master'),
     'file_roots': {
         'base': [salt.syspaths.BASE_FILE_ROOTS_DIR,
@@ -1578,6 +1700,8 @@ DEFAULT_MASTER_OPTS = {
     'file_client': 'local',
     'local': True,
 
+    'roots_index': False,
+
     # Update intervals
     'roots_update_interval': DEFAULT_INTERVAL,
     'azurefs_update_interval': DEFAULT_INTERVAL,
@@ -1688,6 +1812,7 @@ DEFAULT_MASTER_OPTS = {
     'file_recv': False,
     'file_recv_max_size': 100,
     'file_buffer_size': 1048576,
+    'file_transfer_max_chunks': 16,
     'file_ignore_regex': [],
     'file_ignore_glob': [],
     'fileserver_backend': ['roots'],
@@ -1714,7 +1839,12 @@ DEFAULT_MASTER_OPTS = {
     'ext_job_cache': '',
     'master_job_cache': 'local_cache',
     'job_cache_store_endtime': False,
+    'job_cache_segments': False,
+    'job_cache_segment_size': 16777216,
+    'job_cache_segment_time': 3600,
     'minion_data_cache': True,
+    'minion_data_index': False,
+    'minion_data_index_refresh': 300,
     'enforce_mine_cache': False,
     'ipc_mode': _DFLT_IPC_MODE,
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
@@ -1744,6 +1874,10 @@ DEFAULT_MASTER_OPTS = {
     'engines': [],
     'event_return': '',
     'event_return_queue': 0,
+    'event_return_queue_max_bytes': 0,
+    'event_return_queue_max_seconds': 0,
+    'event_return_backlog': 10000,
+    'event_return_spill_size': 104857600,
     'event_return_whitelist': [],
     'event_return_blacklist': [],
     'event_match_type': 'startswith',
@@ -1794,6 +1928,7 @@ DEFAULT_MASTER_OPTS = {
     'tcp_keepalive_cnt': -1,
     'tcp_keepalive_intvl': -1,
     'sign_pub_messages': True,
+    'aes_gcm': False,
     'keysize': 2048,
     'transport': 'zeromq',
     'gather_job_timeout': 10,
@@ -12,6 +12,7 @@ import os
 import sys
 import copy
 import time
+import errno
 import hmac
 import base64
 import hashlib
@@ -22,9 +23,9 @@ import binascii
 import weakref
 import getpass
 import tornado.gen
+from collections import OrderedDict
 
 # Import third party libs
-from salt.ext.six.moves import zip  # pylint: disable=import-error,redefined-builtin
 from salt.ext import six
 
 try:
@@ -56,6 +57,17 @@ if not HAS_M2 and not HAS_CDOME:
         # No need for crypt in local mode
         pass
 
+# AES-GCM comes from pycryptodome, whichever library is used otherwise
+try:
+    from Cryptodome.Cipher import AES as AEAD_AES
+except ImportError:
+    try:
+        from Crypto.Cipher import AES as AEAD_AES
+    except ImportError:
+        AEAD_AES = None
+# PyCrypto has no GCM mode
+HAS_AEAD = hasattr(AEAD_AES, 'MODE_GCM')
+
 # Import salt libs
 import salt.defaults.exitcodes
 import salt.payload
@@ -205,15 +217,19 @@ def get_rsa_pub_key(path):
     Read a public key off the disk.
     '''
     log.debug('salt.crypt.get_rsa_pub_key: Loading public key')
+    with salt.utils.files.fopen(path, 'rb' if HAS_M2 else 'r') as f:
+        return _load_rsa_pub_key(f.read())
+
+
+def _load_rsa_pub_key(data):
+    '''
+    Load a public key from its PEM string
+    '''
     if HAS_M2:
-        with salt.utils.files.fopen(path, 'rb') as f:
-            data = f.read().replace(b'RSA ', b'')
+        data = salt.utils.stringutils.to_bytes(data).replace(b'RSA ', b'')
         bio = BIO.MemoryBuffer(data)
-        key = RSA.load_pub_key_bio(bio)
-    else:
-        with salt.utils.files.fopen(path) as f:
-            key = RSA.importKey(f.read())
-    return key
+        return RSA.load_pub_key_bio(bio)
+    return RSA.importKey(data)
 
 
 def sign_message(privkey_path, message, passphrase=None):
@@ -222,6 +238,14 @@ def sign_message(privkey_path, message, passphrase=None):
     '''
     key = get_rsa_key(privkey_path, passphrase)
     log.debug('salt.crypt.sign_message: Signing message.')
+    return sign_message_with_key(key, message)
+
+
+def sign_message_with_key(key, message):
+    '''
+    Sign a message with a private key which was already loaded by
+    get_rsa_key. Returns the signature.
+    '''
     if HAS_M2:
         md = EVP.MessageDigest('sha1')
         md.update(salt.utils.stringutils.to_bytes(message))
@@ -313,6 +337,84 @@ def public_decrypt(pub, message):
         return verifier.verify(message)
 
 
+class MinionKeyCache(object):
+    '''
+    The public keys of the minions in the master pki_dir, kept in memory by
+    each worker, along with the RSA objects made out of them.
+
+    A cached key is used as long as the mtime and size of its file did not
+    change, which takes a stat and no read. Missing keys are remembered as
+    well, and both caches evict the least recently used keys beyond
+    minion_key_cache_size entries.
+    '''
+    DIRS = ('minions', 'minions_pre', 'minions_rejected', 'minions_denied')
+
+    def __init__(self, opts):
+        self.pki_dir = opts['pki_dir']
+        self.size = opts.get('minion_key_cache_size', 10000)
+        # (directory, minion id) -> (mtime and size of the key file, contents
+        # of the key), both None if missing
+        self.keys = OrderedDict()
+        # contents of a key -> RSA object
+        self.rsa_keys = OrderedDict()
+
+    def _stamp(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError as exc:
+            if exc.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def _cache(self, cache, key, value):
+        if self.size > 0:
+            cache[key] = value
+            while len(cache) > self.size:
+                cache.popitem(last=False)
+        return value
+
+    def get(self, name, minion_id):
+        '''
+        Return the contents of the key of a minion in one of the pki_dir
+        directories, None if there is none
+        '''
+        key = (name, minion_id)
+        path = os.path.join(self.pki_dir, name, minion_id)
+        stamp = self._stamp(path)
+        cached = self.keys.pop(key, None)
+        if cached is not None and cached[0] == stamp:
+            # Most recently used
+            self.keys[key] = cached
+            return cached[1]
+        value = None
+        if stamp is not None:
+            try:
+                with salt.utils.files.fopen(path, 'r') as fp_:
+                    value = fp_.read()
+            except (IOError, OSError) as exc:
+                if exc.errno not in (errno.ENOENT, errno.EISDIR):
+                    raise
+        return self._cache(self.keys, key, (stamp, value))[1]
+
+    def set(self, name, minion_id, value):
+        '''
+        Remember the key of a minion the worker just wrote
+        '''
+        stamp = self._stamp(os.path.join(self.pki_dir, name, minion_id))
+        self._cache(self.keys, (name, minion_id), (stamp, value))
+
+    def rsa(self, pub):
+        '''
+        Return the RSA object of a public key
+        '''
+        if pub in self.rsa_keys:
+            value = self.rsa_keys.pop(pub)
+            self.rsa_keys[pub] = value
+            return value
+        return self._cache(self.rsa_keys, pub, _load_rsa_pub_key(pub))
+
+
 class MasterKeys(dict):
     '''
     The Master Keys class is used to manage the RSA public key pair used for
@@ -514,7 +616,7 @@ class AsyncAuth(object):
         if key in AsyncAuth.creds_map:
             creds = AsyncAuth.creds_map[key]
             self._creds = creds
-            self._crypticle = Crypticle(self.opts, creds['aes'])
+            self._crypticle = self._make_crypticle(creds)
             self._authenticate_future = tornado.concurrent.Future()
             self._authenticate_future.set_result(True)
         else:
@@ -541,6 +643,15 @@ class AsyncAuth(object):
     def crypticle(self):
         return self._crypticle
 
+    def _make_crypticle(self, creds):
+        '''
+        Return the Crypticle for the AES key in creds, encrypting with AES-GCM
+        when it is enabled and the master supports it
+        '''
+        return Crypticle(self.opts,
+                         creds['aes'],
+                         aead=self.opts.get('aes_gcm', False) and creds.get('aead', False))
+
     @property
     def authenticated(self):
         return hasattr(self, '_authenticate_future') and \
@@ -603,6 +714,10 @@ class AsyncAuth(object):
             except SaltClientError as exc:
                 error = exc
                 break
+            if creds == 'busy':
+                # Come back when the master asked to
+                yield tornado.gen.sleep(self.retry_after)
+                continue
             if creds == 'retry':
                 if self.opts.get('detect_mode') is True:
                     error = SaltClientError('Detect mode is on')
@@ -645,7 +760,7 @@ class AsyncAuth(object):
             key = self.__key(self.opts)
             AsyncAuth.creds_map[key] = creds
             self._creds = creds
-            self._crypticle = Crypticle(self.opts, creds['aes'])
+            self._crypticle = self._make_crypticle(creds)
             self._authenticate_future.set_result(True)  # mark the sign-in as complete
             # Notify the bus about creds change
             if self.opts.get('auth_events') is True:
@@ -731,6 +846,13 @@ class AsyncAuth(object):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     raise tornado.gen.Return('full')
+                # is the master too busy signing in other minions?
+                elif payload['load']['ret'] == 'busy':
+                    self.retry_after = payload['load'].get(
+                        'retry_after', self.opts['acceptance_wait_time'])
+                    log.info('The Salt Master is busy, retrying to authenticate '
+                             'in %.2f seconds', self.retry_after)
+                    raise tornado.gen.Return('busy')
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -761,6 +883,8 @@ class AsyncAuth(object):
                 if salt.utils.crypt.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        # Masters which can decrypt AES-GCM say so
+        auth['aead'] = payload.get('aead', False)
         raise tornado.gen.Return(auth)
 
     def get_keys(self):
@@ -1210,6 +1334,10 @@ class SAuth(AsyncAuth):
             acceptance_wait_time_max = acceptance_wait_time
         while True:
             creds = self.sign_in(channel=channel)
+            if creds == 'busy':
+                # Come back when the master asked to
+                time.sleep(self.retry_after)
+                continue
             if creds == 'retry':
                 if self.opts.get('caller'):
                     # We have a list of masters, so we should break
@@ -1232,7 +1360,7 @@ class SAuth(AsyncAuth):
                 continue
             break
         self._creds = creds
-        self._crypticle = Crypticle(self.opts, creds['aes'])
+        self._crypticle = self._make_crypticle(creds)
 
     def sign_in(self, timeout=60, safe=True, tries=1, channel=None):
         '''
@@ -1305,6 +1433,13 @@ class SAuth(AsyncAuth):
                 # has the master returned that its maxed out with minions?
                 elif payload['load']['ret'] == 'full':
                     return 'full'
+                # is the master too busy signing in other minions?
+                elif payload['load']['ret'] == 'busy':
+                    self.retry_after = payload['load'].get(
+                        'retry_after', self.opts['acceptance_wait_time'])
+                    log.info('The Salt Master is busy, retrying to authenticate '
+                             'in %.2f seconds', self.retry_after)
+                    return 'busy'
                 else:
                     log.error(
                         'The Salt Master has cached the public key for this '
@@ -1338,6 +1473,8 @@ class SAuth(AsyncAuth):
                 if salt.utils.crypt.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        # Masters which can decrypt AES-GCM say so
+        auth['aead'] = payload.get('aead', False)
         return auth
 
 
@@ -1347,17 +1484,34 @@ class Crypticle(object):
 
     Encryption algorithm: AES-CBC
     Signing algorithm: HMAC-SHA256
+
+    With aead, data is encrypted and authenticated with AES-256-GCM instead,
+    using a key derived from the same key string. Both forms of data are
+    decrypted, whichever one is used to encrypt.
     '''
 
     PICKLE_PAD = b'pickle::'
     AES_BLOCK_SIZE = 16
     SIG_SIZE = hashlib.sha256().digest_size
-
-    def __init__(self, opts, key_string, key_size=192):
+    AEAD_MAGIC = b'gcm1'
+    AEAD_NONCE_SIZE = 12
+    AEAD_TAG_SIZE = 16
+    # Setting up AES-GCM costs more than it saves for smaller data, which
+    # is still encrypted with AES-CBC
+    AEAD_MIN_SIZE = 16384
+
+    def __init__(self, opts, key_string, key_size=192, aead=False):
         self.key_string = key_string
         self.keys = self.extract_keys(self.key_string, key_size)
         self.key_size = key_size
         self.serial = salt.payload.Serial(opts)
+        self.aead = aead and HAS_AEAD
+        if HAS_AEAD:
+            self.aead_key = hmac.new(self.keys[1],
+                                     self.keys[0] + b'aes-256-gcm',
+                                     hashlib.sha256).digest()
+        else:
+            self.aead_key = None
 
     @classmethod
     def generate_key_string(cls, key_size=192):
@@ -1377,10 +1531,15 @@ class Crypticle(object):
         assert len(key) == key_size / 8 + cls.SIG_SIZE, 'invalid key'
         return key[:-cls.SIG_SIZE], key[-cls.SIG_SIZE:]
 
-    def encrypt(self, data):
+    def encrypt(self, data, aead=None):
         '''
-        encrypt data with AES-CBC and sign it with HMAC-SHA256
+        encrypt data with AES-CBC and sign it with HMAC-SHA256, or with
+        AES-GCM if aead is set, which defaults to the aead of the Crypticle
         '''
+        if aead is None:
+            aead = self.aead
+        if aead and HAS_AEAD and len(data) >= self.AEAD_MIN_SIZE:
+            return self._encrypt_aead(data)
         aes_key, hmac_key = self.keys
         pad = self.AES_BLOCK_SIZE - len(data) % self.AES_BLOCK_SIZE
         if six.PY2:
@@ -1399,28 +1558,45 @@ class Crypticle(object):
         sig = hmac.new(hmac_key, data, hashlib.sha256).digest()
         return data + sig
 
+    def _encrypt_aead(self, data):
+        nonce = os.urandom(self.AEAD_NONCE_SIZE)
+        cypher = AEAD_AES.new(self.aead_key, AEAD_AES.MODE_GCM, nonce=nonce)
+        encr, tag = cypher.encrypt_and_digest(data)
+        return self.AEAD_MAGIC + nonce + encr + tag
+
+    def _decrypt_aead(self, data):
+        '''
+        Return the decrypted data, None if it does not authenticate
+        '''
+        nonce_end = len(self.AEAD_MAGIC) + self.AEAD_NONCE_SIZE
+        if len(data) < nonce_end + self.AEAD_TAG_SIZE:
+            return None
+        cypher = AEAD_AES.new(self.aead_key,
+                              AEAD_AES.MODE_GCM,
+                              nonce=data[len(self.AEAD_MAGIC):nonce_end])
+        try:
+            return cypher.decrypt_and_verify(data[nonce_end:-self.AEAD_TAG_SIZE],
+                                             data[-self.AEAD_TAG_SIZE:])
+        except ValueError:
+            return None
+
     def decrypt(self, data):
         '''
-        verify HMAC-SHA256 signature and decrypt data with AES-CBC
+        verify HMAC-SHA256 signature and decrypt data with AES-CBC, or verify
+        and decrypt data encrypted with AES-GCM
         '''
+        if six.PY3 and not isinstance(data, bytes):
+            data = salt.utils.stringutils.to_bytes(data)
+        if HAS_AEAD and data[:len(self.AEAD_MAGIC)] == self.AEAD_MAGIC:
+            ret = self._decrypt_aead(data)
+            if ret is not None:
+                return ret
+            # The IV of AES-CBC data may start with the same bytes
         aes_key, hmac_key = self.keys
         sig = data[-self.SIG_SIZE:]
         data = data[:-self.SIG_SIZE]
-        if six.PY3 and not isinstance(data, bytes):
-            data = salt.utils.stringutils.to_bytes(data)
         mac_bytes = hmac.new(hmac_key, data, hashlib.sha256).digest()
-        if len(mac_bytes) != len(sig):
-            log.debug('Failed to authenticate message')
-            raise AuthenticationError('message authentication failed')
-        result = 0
-
-        if six.PY2:
-            for zipped_x, zipped_y in zip(mac_bytes, sig):
-                result |= ord(zipped_x) ^ ord(zipped_y)
-        else:
-            for zipped_x, zipped_y in zip(mac_bytes, sig):
-                result |= zipped_x ^ zipped_y
-        if result != 0:
+        if not hmac.compare_digest(mac_bytes, sig):
             log.debug('Failed to authenticate message')
             raise AuthenticationError('message authentication failed')
         iv_bytes = data[:self.AES_BLOCK_SIZE]
@@ -1437,11 +1613,11 @@ class Crypticle(object):
         else:
             return data[:-data[-1]]
 
-    def dumps(self, obj):
+    def dumps(self, obj, aead=None):
         '''
         Serialize and encrypt a python object
         '''
-        return self.encrypt(self.PICKLE_PAD + self.serial.dumps(obj))
+        return self.encrypt(self.PICKLE_PAD + self.serial.dumps(obj), aead=aead)
 
     def loads(self, data, raw=False):
         '''
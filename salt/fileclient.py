@@ -26,6 +26,7 @@ import salt.payload
 import salt.transport
 import salt.fileserver
 import salt.utils.data
+import salt.utils.filedelta
 import salt.utils.files
 import salt.utils.gzip_util
 import salt.utils.hashutils
@@ -46,6 +47,9 @@ from salt.ext.six.moves.urllib.parse import urlparse, urlunparse
 # pylint: enable=no-name-in-module,import-error
 
 log = logging.getLogger(__name__)
+
+# The number of files requested at once by RemoteClient._cache_many
+BULK_BATCH_SIZE = 200
 MAX_FILENAME_LENGTH = 255
 
 
@@ -205,17 +209,19 @@ class Client(object):
             ret.append(self.cache_file(path, saltenv, cachedir=cachedir))
         return ret
 
+    def _cache_many(self, paths, saltenv='base', cachedir=None):
+        '''
+        Cache a list of files from the file server, return the list of their
+        locations in the cache, False for the files which were not cached
+        '''
+        return [self.cache_file(salt.utils.url.create(path), saltenv, cachedir=cachedir)
+                for path in paths]
+
     def cache_master(self, saltenv='base', cachedir=None):
         '''
         Download and cache all files on a master in a specified environment
         '''
-        ret = []
-        for path in self.file_list(saltenv):
-            ret.append(
-                self.cache_file(
-                    salt.utils.url.create(path), saltenv, cachedir=cachedir)
-            )
-        return ret
+        return self._cache_many(self.file_list(saltenv), saltenv, cachedir=cachedir)
 
     def cache_dir(self, path, saltenv='base', include_empty=False,
                   include_pat=None, exclude_pat=None, cachedir=None):
@@ -236,15 +242,16 @@ class Client(object):
         )
         # go through the list of all files finding ones that are in
         # the target directory and caching them
+        paths = []
         for fn_ in self.file_list(saltenv):
             fn_ = salt.utils.data.decode(fn_)
             if fn_.strip() and fn_.startswith(path):
                 if salt.utils.stringutils.check_include_exclude(
                         fn_, include_pat, exclude_pat):
-                    fn_ = self.cache_file(
-                        salt.utils.url.create(fn_), saltenv, cachedir=cachedir)
-                    if fn_:
-                        ret.append(fn_)
+                    paths.append(fn_)
+        for fn_ in self._cache_many(paths, saltenv, cachedir=cachedir):
+            if fn_:
+                ret.append(fn_)
 
         if include_empty:
             # Break up the path into a list containing the bottom-level
@@ -1054,6 +1061,8 @@ class RemoteClient(Client):
             self.auth = self.channel.auth
         else:
             self.auth = ''
+        # saltenv -> manifest fetched by this client
+        self._manifests = {}
 
     def _refresh_channel(self):
         '''
@@ -1141,6 +1150,12 @@ class RemoteClient(Client):
             if hash_local == hash_server:
                 return dest2check
 
+            if self.opts.get('file_delta', False):
+                ret = self._get_file_delta(
+                    path, dest2check, saltenv, gzip, hash_server)
+                if ret:
+                    return ret
+
         log.debug(
             'Fetching file from saltenv \'%s\', ** attempting ** \'%s\'',
             saltenv, path
@@ -1154,6 +1169,8 @@ class RemoteClient(Client):
         if gzip:
             gzip = int(gzip)
             load['gzip'] = gzip
+        if self.opts.get('file_transfer_chunks', 1) > 1:
+            load['chunks'] = self.opts['file_transfer_chunks']
 
         fn_ = None
         if dest:
@@ -1262,10 +1279,252 @@ class RemoteClient(Client):
 
         return dest
 
+    def _manifest_path(self, saltenv):
+        return os.path.join(self.opts['cachedir'], 'file_manifests',
+                            '{0}.p'.format(saltenv))
+
+    def _load_manifest(self, saltenv):
+        '''
+        Load the manifest of an environment stored by the last sync
+        '''
+        path = self._manifest_path(saltenv)
+        try:
+            with salt.utils.files.fopen(path, 'rb') as fp_:
+                return salt.utils.data.decode(self.serial.load(fp_))
+        except (IOError, OSError):
+            pass
+        except Exception as exc:
+            log.warning('Unable to read file manifest %s: %s', path, exc)
+        return {'version': None, 'files': {}, 'cached': {}}
+
+    def _save_manifest(self, saltenv, manifest):
+        path = self._manifest_path(saltenv)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with salt.utils.files.set_umask(0o077):
+                with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                    fp_.write(self.serial.dumps(manifest))
+        except (IOError, OSError) as exc:
+            log.warning('Unable to write file manifest %s: %s', path, exc)
+
+    def _manifest(self, saltenv):
+        '''
+        Return the manifest of an environment, after fetching the changes to it
+        from the master. The manifest also records the hashes of the files
+        cached from it. Return None if the master cannot serve manifests.
+        '''
+        manifest = self._load_manifest(saltenv)
+        load = {'saltenv': saltenv,
+                'version': manifest['version'],
+                'cmd': '_file_manifest'}
+        data = self.channel.send(load)
+        if not isinstance(data, dict) or not data.get('version'):
+            # Masters which cannot serve manifests return False
+            log.debug('The master cannot serve file manifests')
+            return None
+        if six.PY2:
+            data = salt.utils.data.decode(data)
+        if data['full']:
+            manifest['files'] = data['files']
+        else:
+            manifest['files'].update(data['files'])
+            for path in data['removed']:
+                manifest['files'].pop(path, None)
+        if data['full'] or data['version'] != manifest['version']:
+            manifest['version'] = data['version']
+            self._save_manifest(saltenv, manifest)
+        self._manifests[saltenv] = manifest
+        return manifest
+
+    def _cache_many(self, paths, saltenv='base', cachedir=None):
+        '''
+        Cache a list of files from the master. With file_manifest, the files
+        which did not change since they were cached, according to the manifest
+        fetched by the last call to file_list, are not requested again.
+        '''
+        manifest = self._manifests.get(saltenv) \
+            if self.opts.get('file_manifest', False) else None
+        if manifest is None:
+            return self._fetch_many(paths, saltenv, cachedir=cachedir)
+        ret = {}
+        fetch = []
+        for path in paths:
+            with self._cache_loc(path, saltenv, cachedir=cachedir) as dest:
+                pass
+            entry = manifest['files'].get(path)
+            try:
+                st_ = os.stat(dest)
+                cached = [st_.st_mtime, st_.st_size]
+            except OSError:
+                cached = None
+            if entry and cached \
+                    and manifest['cached'].get(dest) == [entry[0]] + cached:
+                ret[path] = dest
+            else:
+                fetch.append(path)
+        for path, dest in zip(fetch, self._fetch_many(fetch, saltenv, cachedir=cachedir)):
+            ret[path] = dest
+            entry = manifest['files'].get(path)
+            if not dest or not entry:
+                continue
+            # Record the hash of what was actually fetched
+            try:
+                hsum = salt.utils.hashutils.get_hash(
+                    dest, salt.utils.stringutils.to_str(entry[1]))
+                st_ = os.stat(dest)
+            except (IOError, OSError):
+                continue
+            manifest['cached'][dest] = [hsum, st_.st_mtime, st_.st_size]
+        if fetch:
+            self._save_manifest(saltenv, manifest)
+        return [ret[path] for path in paths]
+
+    def _fetch_many(self, paths, saltenv='base', cachedir=None):
+        '''
+        Fetch a list of files from the master. With file_bulk_fetch, the files
+        are requested in batches and the master sends all the small files of a
+        batch which changed in one reply.
+        '''
+        if not self.opts.get('file_bulk_fetch', False):
+            return super(RemoteClient, self)._cache_many(
+                paths, saltenv, cachedir=cachedir)
+        ret = {}
+        pending = list(paths)
+        hash_type = self.opts.get('hash_type', 'md5')
+        size = self.opts['file_buffer_size'] * max(self.opts.get('file_transfer_chunks', 1), 1)
+        while pending:
+            batch = pending[:BULK_BATCH_SIZE]
+            pending = pending[BULK_BATCH_SIZE:]
+            dests = []
+            hashes = []
+            for path in batch:
+                with self._cache_loc(path, saltenv, cachedir=cachedir) as dest:
+                    dests.append(dest)
+                    hashes.append(
+                        salt.utils.hashutils.get_hash(dest, hash_type)
+                        if os.path.isfile(dest) else None)
+            load = {'paths': batch,
+                    'hashes': hashes,
+                    'hash_type': hash_type,
+                    'size': size,
+                    'saltenv': saltenv,
+                    'cmd': '_serve_files'}
+            data = self.channel.send(load, raw=True)
+            if not isinstance(data, dict):
+                # Masters which cannot serve batches of files return False
+                log.debug('The master cannot serve batches of files')
+                for path, dest in zip(batch + pending, super(RemoteClient, self)._cache_many(
+                        batch + pending, saltenv, cachedir=cachedir)):
+                    ret[path] = dest
+                break
+            if six.PY3:
+                data = decode_dict_keys_to_str(data)
+            retry = []
+            for path, dest, local_hash, entry in zip(batch, dests, hashes, data['files']):
+                if six.PY3:
+                    entry = decode_dict_keys_to_str(entry)
+                if not entry:
+                    ret[path] = False
+                    continue
+                hash_type = salt.utils.stringutils.to_str(entry['hash_type'])
+                if 'data' in entry:
+                    if entry.get('gzip', None):
+                        entry['data'] = salt.utils.gzip_util.uncompress(entry['data'])
+                    if os.path.isdir(dest):
+                        salt.utils.files.rm_rf(dest)
+                    with salt.utils.atomicfile.atomic_open(dest, 'wb+') as fp_:
+                        fp_.write(salt.utils.stringutils.to_bytes(entry['data']))
+                    ret[path] = dest
+                elif local_hash == salt.utils.stringutils.to_unicode(entry['hsum']):
+                    ret[path] = dest
+                elif entry.get('large', False):
+                    ret[path] = self.cache_file(
+                        salt.utils.url.create(path), saltenv, cachedir=cachedir)
+                else:
+                    # Did not fit in the reply
+                    retry.append(path)
+            pending = retry + pending
+        return [ret[path] for path in paths]
+
+    def _get_file_delta(self, path, local, saltenv, gzip, hash_server):
+        '''
+        Update the local copy of a file with the changes to it from the master,
+        instead of downloading the whole file again. Return the path of the
+        file, or False if the file has to be downloaded.
+        '''
+        try:
+            size = os.path.getsize(local)
+        except OSError:
+            return False
+        if size < salt.utils.filedelta.MIN_FILE_SIZE:
+            return False
+        block_size = salt.utils.filedelta.block_size(size)
+        load = {'path': self._check_proto(path),
+                'saltenv': saltenv,
+                'cmd': '_serve_file_delta',
+                'block_size': block_size,
+                'sigs': salt.utils.filedelta.signatures(local, block_size),
+                'loc': 0}
+        if gzip:
+            load['gzip'] = int(gzip)
+        log.debug(
+            'Fetching the changes to file \'%s\' from saltenv \'%s\'',
+            path, saltenv
+        )
+        try:
+            with salt.utils.files.fopen(local, 'rb') as src, \
+                    salt.utils.atomicfile.atomic_open(local, 'wb') as dest:
+                while True:
+                    data = self.channel.send(load, raw=True)
+                    if not isinstance(data, dict):
+                        # Masters which cannot serve the changes return False
+                        raise MinionError('changes not served by the master')
+                    if six.PY3:
+                        data = decode_dict_keys_to_str(data)
+                    if 'ops' not in data or not data['dest']:
+                        raise MinionError('changes not served by the master')
+                    ops = data['ops']
+                    if data.get('gzip', None):
+                        ops = [op_ if isinstance(op_, list)
+                               else salt.utils.gzip_util.uncompress(op_)
+                               for op_ in ops]
+                    salt.utils.filedelta.patch(src, ops, block_size, dest)
+                    if data['loc'] is None:
+                        break
+                    load['loc'] = data['loc']
+                dest.flush()
+                # The last chunk has the hash of the file, in case it changed
+                # since it was hashed
+                expected = data if 'hsum' in data else hash_server
+                hsum = salt.utils.hashutils.get_hash(
+                    dest.name,
+                    salt.utils.stringutils.to_str(expected.get('hash_type', 'md5')))
+                if hsum != salt.utils.stringutils.to_unicode(expected.get('hsum')):
+                    raise MinionError('hash mismatch')
+        except (MinionError, IOError, OSError, TypeError, KeyError) as exc:
+            log.warning(
+                'Unable to apply the changes to file \'%s\' from saltenv '
+                '\'%s\' (%s), downloading the whole file',
+                path, saltenv, exc
+            )
+            return False
+        log.info(
+            'Fetching the changes to file from saltenv \'%s\', ** done ** '
+            '\'%s\'', saltenv, path
+        )
+        return local
+
     def file_list(self, saltenv='base', prefix=''):
         '''
         List the files on the master
         '''
+        if self.opts.get('file_manifest', False):
+            manifest = self._manifest(saltenv)
+            if manifest is not None:
+                prefix = prefix.strip('/')
+                return sorted(path for path in manifest['files']
+                              if path.startswith(prefix))
         load = {'saltenv': saltenv,
                 'prefix': prefix,
                 'cmd': '_file_list'}
@@ -1415,6 +1674,19 @@ class FSClient(RemoteClient):
         Client.__init__(self, opts)  # pylint: disable=W0233
         self.channel = salt.fileserver.FSChan(opts)
         self.auth = DumbAuth()
+        self._manifests = {}
+
+    def _get_file_delta(self, path, local, saltenv, gzip, hash_server):
+        '''
+        The files are local, copying them is cheaper than diffing them
+        '''
+        return False
+
+    def _manifest(self, saltenv):
+        '''
+        The files are local, listing them is cheap
+        '''
+        return None
 
 
 class DumbAuth(object):
@@ -6,6 +6,7 @@ File server pluggable modules and generic backend functions
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
 
+import binascii
 import errno
 import fnmatch
 import logging
@@ -16,9 +17,14 @@ import time
 
 # Import salt libs
 import salt.loader
+import salt.payload
+import salt.utils.atomicfile
 import salt.utils.data
+import salt.utils.filedelta
 import salt.utils.files
+import salt.utils.gzip_util
 import salt.utils.path
+import salt.utils.stringutils
 import salt.utils.url
 import salt.utils.versions
 from salt.utils.args import get_function_argspec as _argspec
@@ -35,6 +41,10 @@ from salt.ext import six
 
 log = logging.getLogger(__name__)
 
+# The number of removed files a manifest remembers, clients with an older
+# manifest get the whole manifest again
+MANIFEST_MAX_REMOVED = 10000
+
 
 def _unlock_cache(w_lock):
     '''
@@ -634,9 +644,156 @@ class Fileserver(object):
             return ret
         fstr = '{0}.serve_file'.format(fnd['back'])
         if fstr in self.servers:
+            try:
+                chunks = min(int(load.get('chunks', 1)),
+                             self.opts['file_transfer_max_chunks'])
+            except (TypeError, ValueError):
+                chunks = 1
+            if chunks > 1:
+                return self._serve_chunks(fstr, load, fnd, chunks)
             return self.servers[fstr](load, fnd)
         return ret
 
+    def _serve_chunks(self, fstr, load, fnd, chunks):
+        '''
+        Serve several consecutive chunks of a file at once
+        '''
+        load = dict(load)
+        gzip = load.pop('gzip', None)
+        ret = {}
+        data = []
+        for _ in range(chunks):
+            chunk = self.servers[fstr](load, fnd)
+            ret.update(chunk)
+            if not chunk.get('data'):
+                break
+            data.append(salt.utils.stringutils.to_bytes(chunk['data']))
+            load['loc'] += len(data[-1])
+            if len(data[-1]) < self.opts['file_buffer_size']:
+                # End of the file
+                break
+        ret['data'] = b''.join(data)
+        if gzip and ret['data']:
+            ret['data'] = salt.utils.gzip_util.compress(ret['data'], gzip)
+            ret['gzip'] = gzip
+        return ret
+
+    def serve_files(self, load):
+        '''
+        Serve a batch of whole files. ``hashes`` holds the hashes of the copies
+        of the files the client has, files with the same hash are not sent
+        again. The data of the files sent in one reply is limited to ``size``
+        bytes, files which are bigger than that are flagged as ``large`` and
+        have to be served with serve_file.
+        '''
+        ret = {'files': []}
+
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        if 'paths' not in load or 'saltenv' not in load:
+            return ret
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        hashes = load.get('hashes') or [None] * len(load['paths'])
+        max_size = self.opts['file_buffer_size'] * self.opts['file_transfer_max_chunks']
+        try:
+            size = min(int(load.get('size', max_size)), max_size)
+        except (TypeError, ValueError):
+            size = self.opts['file_buffer_size']
+        remaining = size
+        gzip = load.get('gzip', None)
+
+        for path, local_hash in zip(load['paths'], hashes):
+            fnd = self.find_file(path, load['saltenv'])
+            fstr = '{0}.file_hash'.format(fnd.get('back'))
+            if not fnd.get('path') or fstr not in self.servers:
+                ret['files'].append({})
+                continue
+            entry = self.servers[fstr]({'path': path, 'saltenv': load['saltenv']}, fnd)
+            if not entry:
+                ret['files'].append({})
+                continue
+            entry['dest'] = fnd['rel']
+            try:
+                entry['size'] = os.path.getsize(fnd['path'])
+            except OSError:
+                ret['files'].append({})
+                continue
+            if local_hash == entry['hsum'] \
+                    and load.get('hash_type') == entry['hash_type']:
+                ret['files'].append(entry)
+                continue
+            if entry['size'] > size:
+                entry['large'] = True
+            elif entry['size'] <= remaining:
+                with salt.utils.files.fopen(fnd['path'], 'rb') as fp_:
+                    data = fp_.read()
+                remaining -= len(data)
+                if gzip and data:
+                    data = salt.utils.gzip_util.compress(data, gzip)
+                    entry['gzip'] = gzip
+                entry['data'] = data
+            ret['files'].append(entry)
+        return ret
+
+    def serve_file_delta(self, load):
+        '''
+        Serve the changes needed to turn the client's copy of a file, described
+        by the signatures of its blocks, into the file on the fileserver. The
+        changes are served in chunks, ``loc`` is where the next chunk starts
+        and is None in the last chunk, which also carries the hash of the file.
+        '''
+        ret = {'ops': [],
+               'loc': None,
+               'dest': ''}
+
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        if any(key not in load for key in ('path', 'loc', 'saltenv', 'sigs', 'block_size')):
+            return ret
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        try:
+            block_size = int(load['block_size'])
+            loc = int(load['loc'])
+        except (TypeError, ValueError):
+            return ret
+        if block_size < salt.utils.filedelta.MIN_BLOCK_SIZE \
+                or block_size > self.opts['file_buffer_size'] * 64 \
+                or loc < 0:
+            return ret
+
+        fnd = self.find_file(load['path'], load['saltenv'])
+        if not fnd.get('back') or not os.path.isfile(fnd.get('path', '')):
+            return ret
+        ret['dest'] = fnd['rel']
+        try:
+            with salt.utils.files.fopen(fnd['path'], 'rb') as fp_:
+                ret['ops'], ret['loc'] = salt.utils.filedelta.delta(
+                    fp_,
+                    load['sigs'],
+                    block_size,
+                    loc,
+                    self.opts['file_buffer_size'])
+        except (IndexError, TypeError, ValueError) as exc:
+            log.error('Invalid block signatures for %s: %s', load['path'], exc)
+            return {'ops': [], 'loc': None, 'dest': ''}
+        gzip = load.get('gzip', None)
+        if gzip:
+            ret['ops'] = [op_ if isinstance(op_, list)
+                          else salt.utils.gzip_util.compress(op_, gzip)
+                          for op_ in ret['ops']]
+            ret['gzip'] = gzip
+        if ret['loc'] is None:
+            hsum = self.file_hash(load)
+            if hsum:
+                ret.update(hsum)
+        return ret
+
     def __file_hash_and_stat(self, load):
         '''
         Common code for hashing and stating files
@@ -780,6 +937,147 @@ class Fileserver(object):
             ret = [f for f in ret if f.startswith(prefix)]
         return sorted(ret)
 
+    def file_manifest(self, load):
+        '''
+        Return the manifest of an environment, a dict with the
+        ``[hsum, hash_type, mode]`` of every file, and its version. If the
+        client passes the ``version`` of the manifest it has, only the files
+        which changed since then are returned, along with the list of the
+        files which were removed. ``full`` is True when the whole manifest is
+        returned.
+        '''
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        ret = {'version': None, 'full': True, 'files': {}, 'removed': []}
+        if 'saltenv' not in load:
+            return ret
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+        if load['saltenv'] not in self.envs():
+            # The saltenv names the manifest file, only store the known ones
+            return ret
+        manifest = self._get_manifest(load['saltenv'])
+        ret['version'] = '{0}:{1}'.format(manifest['epoch'], manifest['seq'])
+        try:
+            epoch, seq = load.get('version').split(':')
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            epoch = seq = None
+        if epoch == manifest['epoch'] and manifest['oldest'] <= seq <= manifest['seq']:
+            ret['full'] = False
+            ret['files'] = dict((path, entry[:3])
+                                for path, entry in six.iteritems(manifest['files'])
+                                if entry[3] > seq)
+            ret['removed'] = [path for path, removed in six.iteritems(manifest['removed'])
+                              if removed > seq]
+        else:
+            ret['files'] = dict((path, entry[:3])
+                                for path, entry in six.iteritems(manifest['files']))
+        return ret
+
+    def _get_manifest(self, saltenv):
+        '''
+        Return the stored manifest of an environment, refreshed if it is older
+        than fileserver_list_cache_time. Every file in it is stored with the
+        sequence number of the manifest it last changed in.
+        '''
+        manifest_dir = os.path.join(self.opts['cachedir'], 'file_manifests')
+        name = salt.utils.files.safe_filename_leaf(saltenv)
+        path = os.path.join(manifest_dir, '{0}.p'.format(name))
+        w_lock = os.path.join(manifest_dir, '.{0}.w'.format(name))
+        serial = salt.payload.Serial(self.opts)
+
+        def _load():
+            try:
+                with salt.utils.files.fopen(path, 'rb') as fp_:
+                    return salt.utils.data.decode(serial.load(fp_))
+            except (IOError, OSError):
+                return None
+            except Exception as exc:
+                log.error('Unable to read file manifest %s: %s', path, exc)
+                return None
+
+        manifest = _load()
+        max_age = self.opts.get('fileserver_list_cache_time', 20)
+        if manifest is not None and 0 <= time.time() - manifest['time'] < max_age:
+            return manifest
+        if not os.path.isdir(manifest_dir):
+            try:
+                os.makedirs(manifest_dir)
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+        wait_lock(w_lock, path, 5 * 60)
+        if not _lock_cache(w_lock):
+            # Another process is refreshing it
+            wait_lock(w_lock, path, 5 * 60)
+            manifest = _load()
+            if manifest is not None:
+                return manifest
+        try:
+            # Refreshed while waiting for the lock
+            latest = _load()
+            if latest is not None and 0 <= time.time() - latest['time'] < max_age:
+                return latest
+            manifest = self._refresh_manifest(saltenv, latest)
+            with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+                fp_.write(serial.dumps(manifest))
+        finally:
+            _unlock_cache(w_lock)
+        return manifest
+
+    def _refresh_manifest(self, saltenv, manifest=None):
+        '''
+        Hash the files of an environment and update a manifest with the files
+        which changed
+        '''
+        if manifest is None:
+            manifest = {'epoch': salt.utils.stringutils.to_unicode(
+                            binascii.hexlify(os.urandom(8))),
+                        'seq': 0,
+                        'oldest': 0,
+                        'files': {},
+                        'removed': {}}
+        seq = manifest['seq'] + 1
+        files = {}
+        for path in self.file_list({'saltenv': saltenv}):
+            fnd = self.find_file(path, saltenv)
+            fstr = '{0}.file_hash'.format(fnd.get('back'))
+            if not fnd.get('path') or fstr not in self.servers:
+                continue
+            hsum = self.servers[fstr]({'path': path, 'saltenv': saltenv}, fnd)
+            if not hsum:
+                continue
+            try:
+                mode = fnd['stat'][0]
+            except (KeyError, IndexError, TypeError):
+                mode = None
+            files[path] = [hsum['hsum'], hsum['hash_type'], mode]
+
+        changed = False
+        for path, entry in six.iteritems(files):
+            old = manifest['files'].get(path)
+            if old is None or old[:3] != entry:
+                manifest['files'][path] = entry + [seq]
+                manifest['removed'].pop(path, None)
+                changed = True
+        for path in set(manifest['files']) - set(files):
+            del manifest['files'][path]
+            manifest['removed'][path] = seq
+            changed = True
+        if len(manifest['removed']) > MANIFEST_MAX_REMOVED:
+            removed = sorted(manifest['removed'].items(), key=lambda item: item[1])
+            cut = len(removed) - MANIFEST_MAX_REMOVED
+            # The changes since these versions cannot be told anymore
+            manifest['oldest'] = removed[cut - 1][1]
+            manifest['removed'] = dict(removed[cut:])
+        if changed:
+            manifest['seq'] = seq
+        manifest['time'] = time.time()
+        return manifest
+
     @ensure_unicode_args
     def file_list_emptydirs(self, load):
         '''
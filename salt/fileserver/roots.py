@@ -14,6 +14,11 @@ be in the :conf_master:`fileserver_backend` list to enable this backend.
 
 Fileserver environments are defined using the :conf_master:`file_roots`
 configuration option.
+
+When :conf_master:`roots_index` is enabled, the update of this backend keeps an
+index of the files in every environment, along with their mtime, size and
+hash. The file lists, file lookups and file hashes are then served from that
+index instead of walking the file_roots and hashing the files on demand.
 '''
 from __future__ import absolute_import, print_function, unicode_literals
 
@@ -21,9 +26,13 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import errno
 import logging
+import stat
 
 # Import salt libs
 import salt.fileserver
+import salt.payload
+import salt.utils.atomicfile
+import salt.utils.data
 import salt.utils.event
 import salt.utils.files
 import salt.utils.gzip_util
@@ -36,6 +45,164 @@ from salt.ext import six
 
 log = logging.getLogger(__name__)
 
+# Bumped whenever the layout of the index changes
+INDEX_VERSION = 1
+
+# Index file path -> (stat of the index file, index), per process
+_INDEXES = {}
+
+
+def _index_path(saltenv):
+    '''
+    Return the path of the index file of an environment
+    '''
+    return os.path.join(__opts__['cachedir'], 'roots', 'index',
+                        '{0}.p'.format(saltenv))
+
+
+def _index_config(saltenv):
+    '''
+    Return the settings an index was built with, an index built with other
+    settings is not used
+    '''
+    return {'version': INDEX_VERSION,
+            'roots': list(__opts__['file_roots'][saltenv]),
+            'hash_type': __opts__['hash_type'],
+            'followsymlinks': __opts__['fileserver_followsymlinks'],
+            'ignoresymlinks': __opts__['fileserver_ignoresymlinks'],
+            'file_ignore_regex': list(__opts__['file_ignore_regex'] or []),
+            'file_ignore_glob': list(__opts__['file_ignore_glob'] or [])}
+
+
+def _read_index(path):
+    '''
+    Load an index file, return None if it cannot be read
+    '''
+    serial = salt.payload.Serial(__opts__)
+    try:
+        with salt.utils.files.fopen(path, 'rb') as fp_:
+            return salt.utils.data.decode(serial.load(fp_))
+    except (IOError, OSError) as exc:
+        if exc.errno != errno.ENOENT:
+            log.error('Unable to read roots index %s: %s', path, exc)
+    except Exception as exc:
+        log.error('Unable to read roots index %s: %s', path, exc)
+    return None
+
+
+def _get_index(saltenv):
+    '''
+    Return the index of an environment, None if the index is disabled, was not
+    built yet or was built with other settings. The index is loaded again
+    whenever the update writes a new one.
+    '''
+    if not __opts__.get('roots_index', False) \
+            or saltenv not in __opts__['file_roots']:
+        return None
+    path = _index_path(saltenv)
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return None
+    key = (st_.st_ino, st_.st_mtime, st_.st_size)
+    cached = _INDEXES.get(path)
+    if cached is None or cached[0] != key:
+        cached = (key, _read_index(path))
+        _INDEXES[path] = cached
+    index = cached[1]
+    if index is None or index.get('config') != _index_config(saltenv):
+        return None
+    return index
+
+
+def _update_index(saltenv):
+    '''
+    Walk the file_roots of an environment and write its index. Only the files
+    which changed since the last update are hashed again.
+    '''
+    path = _index_path(saltenv)
+    config = _index_config(saltenv)
+    old = _read_index(path) or {}
+    old_files = {}
+    if old.get('config', {}).get('hash_type') == config['hash_type']:
+        for root in old.get('roots', []):
+            old_files[root['path']] = root['files']
+
+    index_roots = [{'path': root, 'dirs': {}, 'files': {}}
+                   for root in config['roots']]
+    lists = _walk_env(saltenv, index_roots)
+    for root in index_roots:
+        prev = old_files.get(root['path'], {})
+        failed = []
+        for rel, entry in six.iteritems(root['files']):
+            prev_entry = prev.get(rel)
+            if prev_entry and prev_entry[:2] == entry[:2]:
+                entry[2] = prev_entry[2]
+                continue
+            try:
+                entry[2] = salt.utils.hashutils.get_hash(
+                    os.path.join(root['path'], rel), config['hash_type'])
+            except (IOError, OSError) as exc:
+                log.debug('roots: Unable to hash %s: %s', rel, exc)
+                failed.append(rel)
+        for rel in failed:
+            del root['files'][rel]
+
+    index = {'config': config, 'roots': index_roots, 'lists': lists}
+    if index != old:
+        index_dir = os.path.dirname(path)
+        try:
+            os.makedirs(index_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        serial = salt.payload.Serial(__opts__)
+        with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+            fp_.write(serial.dumps(index))
+    return index
+
+
+def _find_indexed(index, path):
+    '''
+    Look up a relative path in an index. Return the full path of the file, an
+    empty string if there is no such file, or None if a directory the file
+    could have been added to changed since the index was built.
+    '''
+    rel_dir = os.path.dirname(path)
+    for root in index['roots']:
+        if path in root['files']:
+            return os.path.join(root['path'], path)
+        # Adding a file changes the mtime of its directory
+        try:
+            mtime = os.stat(os.path.join(root['path'], rel_dir)).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != root['dirs'].get(rel_dir):
+            return None
+    return ''
+
+
+def _hash_indexed(index, fnd):
+    '''
+    Return the hash of a file found by find_file from an index, None if the
+    file is not in the index or changed since the index was built
+    '''
+    for root in index['roots']:
+        if os.path.join(root['path'], fnd['rel']) == fnd['path']:
+            entry = root['files'].get(fnd['rel'])
+            break
+    else:
+        return None
+    if entry is None:
+        return None
+    try:
+        st_ = os.stat(fnd['path'])
+    except OSError:
+        return None
+    if [st_.st_mtime, st_.st_size] != entry[:2]:
+        return None
+    return entry[2]
+
 
 def find_file(path, saltenv='base', **kwargs):
     '''
@@ -78,6 +245,18 @@ def find_file(path, saltenv='base', **kwargs):
             pass
         return fnd
 
+    if 'index' not in kwargs:
+        index = _get_index(saltenv)
+        if index is not None:
+            full = _find_indexed(index, path)
+            if full == '':
+                return fnd
+            if full is not None and os.path.isfile(full):
+                fnd['path'] = full
+                fnd['rel'] = path
+                return _add_file_stat(fnd)
+            # Something changed since the index was built, look for the file
+
     if 'index' in kwargs:
         try:
             root = __opts__['file_roots'][saltenv][int(kwargs['index'])]
@@ -156,7 +335,17 @@ def update():
             'backend': 'roots'}
 
     # generate the new map
-    new_mtime_map = salt.fileserver.generate_mtime_map(__opts__, __opts__['file_roots'])
+    if __opts__.get('roots_index', False):
+        # Update the index and get the mtimes out of it, instead of walking
+        # the file_roots twice
+        new_mtime_map = {}
+        for saltenv in __opts__['file_roots']:
+            index = _update_index(saltenv)
+            for root in index['roots']:
+                for rel, entry in six.iteritems(root['files']):
+                    new_mtime_map[os.path.join(root['path'], rel)] = entry[0]
+    else:
+        new_mtime_map = salt.fileserver.generate_mtime_map(__opts__, __opts__['file_roots'])
 
     old_mtime_map = {}
     # if you have an old map, load that
@@ -229,6 +418,13 @@ def file_hash(load, fnd):
     # set the hash_type as it is determined by config-- so mechanism won't change that
     ret['hash_type'] = __opts__['hash_type']
 
+    index = _get_index(load['saltenv'])
+    if index is not None:
+        hsum = _hash_indexed(index, fnd)
+        if hsum:
+            ret['hsum'] = hsum
+            return ret
+
     # check if the hash is cached
     # cache file's contents should be "hash:mtime"
     cache_path = os.path.join(__opts__['cachedir'],
@@ -285,6 +481,131 @@ def file_hash(load, fnd):
     return ret
 
 
+def _walk_env(saltenv, index_roots=None):
+    '''
+    Walk the file_roots of an environment and return a dict containing the
+    file lists for files, dirs, empty_dirs and links. If index_roots is passed,
+    it is a list with a dict for every root, which gets filled with the mtimes
+    of the directories and the mtime and size of the files in that root.
+    '''
+    ret = {
+        'files': set(),
+        'dirs': set(),
+        'empty_dirs': set(),
+        'links': {}
+    }
+
+    def _add_to(tgt, fs_root, parent_dir, items):
+        '''
+        Add the files to the target set
+        '''
+        def _translate_sep(path):
+            '''
+            Translate path separators for Windows masterless minions
+            '''
+            return path.replace('\\', '/') if os.path.sep == '\\' else path
+
+        for item in items:
+            abs_path = os.path.join(parent_dir, item)
+            log.trace('roots: Processing %s', abs_path)
+            is_link = salt.utils.path.islink(abs_path)
+            log.trace(
+                'roots: %s is %sa link',
+                abs_path, 'not ' if not is_link else ''
+            )
+            if is_link and __opts__['fileserver_ignoresymlinks']:
+                continue
+            rel_path = _translate_sep(os.path.relpath(abs_path, fs_root))
+            log.trace('roots: %s relative path is %s', abs_path, rel_path)
+            if salt.fileserver.is_file_ignored(__opts__, rel_path):
+                continue
+            tgt.add(rel_path)
+            try:
+                if not os.listdir(abs_path):
+                    ret['empty_dirs'].add(rel_path)
+            except Exception:
+                # Generic exception because running os.listdir() on a
+                # non-directory path raises an OSError on *NIX and a
+                # WindowsError on Windows.
+                pass
+            if is_link:
+                link_dest = salt.utils.path.readlink(abs_path)
+                log.trace(
+                    'roots: %s symlink destination is %s',
+                    abs_path, link_dest
+                )
+                if salt.utils.platform.is_windows() \
+                        and link_dest.startswith('\\\\'):
+                    # Symlink points to a network path. Since you can't
+                    # join UNC and non-UNC paths, just assume the original
+                    # path.
+                    log.trace(
+                        'roots: %s is a UNC path, using %s instead',
+                        link_dest, abs_path
+                    )
+                    link_dest = abs_path
+                if link_dest.startswith('..'):
+                    joined = os.path.join(abs_path, link_dest)
+                else:
+                    joined = os.path.join(
+                        os.path.dirname(abs_path), link_dest
+                    )
+                rel_dest = _translate_sep(
+                    os.path.relpath(
+                        os.path.realpath(os.path.normpath(joined)),
+                        fs_root
+                    )
+                )
+                log.trace(
+                    'roots: %s relative path is %s',
+                    abs_path, rel_dest
+                )
+                if not rel_dest.startswith('..'):
+                    # Only count the link if it does not point
+                    # outside of the root dir of the fileserver
+                    # (i.e. the "path" variable)
+                    ret['links'][rel_path] = link_dest
+
+    def _add_to_index(index_root, fs_root, parent_dir, items):
+        '''
+        Add a directory and the files in it which find_file would serve to
+        the index of a root
+        '''
+        rel_dir = os.path.relpath(parent_dir, fs_root)
+        if rel_dir == os.curdir:
+            rel_dir = ''
+        try:
+            index_root['dirs'][rel_dir] = os.stat(parent_dir).st_mtime
+        except OSError:
+            return
+        for item in items:
+            abs_path = os.path.join(parent_dir, item)
+            if salt.fileserver.is_file_ignored(__opts__, abs_path):
+                continue
+            try:
+                st_ = os.stat(abs_path)
+            except OSError:
+                # Dangling symlink
+                continue
+            if stat.S_ISREG(st_.st_mode):
+                index_root['files'][os.path.join(rel_dir, item)] = \
+                    [st_.st_mtime, st_.st_size, None]
+
+    for idx, path in enumerate(__opts__['file_roots'][saltenv]):
+        for root, dirs, files in salt.utils.path.os_walk(
+                path,
+                followlinks=__opts__['fileserver_followsymlinks']):
+            _add_to(ret['dirs'], path, root, dirs)
+            _add_to(ret['files'], path, root, files)
+            if index_roots is not None:
+                _add_to_index(index_roots[idx], path, root, files)
+
+    ret['files'] = sorted(ret['files'])
+    ret['dirs'] = sorted(ret['dirs'])
+    ret['empty_dirs'] = sorted(ret['empty_dirs'])
+    return ret
+
+
 def _file_lists(load, form):
     '''
     Return a dict containing the file lists for files, dirs, emtydirs and symlinks
@@ -296,6 +617,10 @@ def _file_lists(load, form):
     if load['saltenv'] not in __opts__['file_roots']:
         return []
 
+    index = _get_index(load['saltenv'])
+    if index is not None:
+        return index['lists'].get(form, [])
+
     list_cachedir = os.path.join(__opts__['cachedir'], 'file_lists', 'roots')
     if not os.path.isdir(list_cachedir):
         try:
@@ -312,94 +637,7 @@ def _file_lists(load, form):
     if cache_match is not None:
         return cache_match
     if refresh_cache:
-        ret = {
-            'files': set(),
-            'dirs': set(),
-            'empty_dirs': set(),
-            'links': {}
-        }
-
-        def _add_to(tgt, fs_root, parent_dir, items):
-            '''
-            Add the files to the target set
-            '''
-            def _translate_sep(path):
-                '''
-                Translate path separators for Windows masterless minions
-                '''
-                return path.replace('\\', '/') if os.path.sep == '\\' else path
-
-            for item in items:
-                abs_path = os.path.join(parent_dir, item)
-                log.trace('roots: Processing %s', abs_path)
-                is_link = salt.utils.path.islink(abs_path)
-                log.trace(
-                    'roots: %s is %sa link',
-                    abs_path, 'not ' if not is_link else ''
-                )
-                if is_link and __opts__['fileserver_ignoresymlinks']:
-                    continue
-                rel_path = _translate_sep(os.path.relpath(abs_path, fs_root))
-                log.trace('roots: %s relative path is %s', abs_path, rel_path)
-                if salt.fileserver.is_file_ignored(__opts__, rel_path):
-                    continue
-                tgt.add(rel_path)
-                try:
-                    if not os.listdir(abs_path):
-                        ret['empty_dirs'].add(rel_path)
-                except Exception:
-                    # Generic exception because running os.listdir() on a
-                    # non-directory path raises an OSError on *NIX and a
-                    # WindowsError on Windows.
-                    pass
-                if is_link:
-                    link_dest = salt.utils.path.readlink(abs_path)
-                    log.trace(
-                        'roots: %s symlink destination is %s',
-                        abs_path, link_dest
-                    )
-                    if salt.utils.platform.is_windows() \
-                            and link_dest.startswith('\\\\'):
-                        # Symlink points to a network path. Since you can't
-                        # join UNC and non-UNC paths, just assume the original
-                        # path.
-                        log.trace(
-                            'roots: %s is a UNC path, using %s instead',
-                            link_dest, abs_path
-                        )
-                        link_dest = abs_path
-                    if link_dest.startswith('..'):
-                        joined = os.path.join(abs_path, link_dest)
-                    else:
-                        joined = os.path.join(
-                            os.path.dirname(abs_path), link_dest
-                        )
-                    rel_dest = _translate_sep(
-                        os.path.relpath(
-                            os.path.realpath(os.path.normpath(joined)),
-                            fs_root
-                        )
-                    )
-                    log.trace(
-                        'roots: %s relative path is %s',
-                        abs_path, rel_dest
-                    )
-                    if not rel_dest.startswith('..'):
-                        # Only count the link if it does not point
-                        # outside of the root dir of the fileserver
-                        # (i.e. the "path" variable)
-                        ret['links'][rel_path] = link_dest
-
-        for path in __opts__['file_roots'][load['saltenv']]:
-            for root, dirs, files in salt.utils.path.os_walk(
-                    path,
-                    followlinks=__opts__['fileserver_followsymlinks']):
-                _add_to(ret['dirs'], path, root, dirs)
-                _add_to(ret['files'], path, root, files)
-
-        ret['files'] = sorted(ret['files'])
-        ret['dirs'] = sorted(ret['dirs'])
-        ret['empty_dirs'] = sorted(ret['empty_dirs'])
+        ret = _walk_env(load['saltenv'])
 
         if save_cache:
             try:
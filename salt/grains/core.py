@@ -49,6 +49,7 @@ except ImportError:
 # Import salt libs
 import salt.exceptions
 import salt.log
+import salt.utils.decorators
 import salt.utils.dns
 import salt.utils.files
 import salt.utils.network
@@ -2099,6 +2100,7 @@ def append_domain():
     return grain
 
 
+@salt.utils.decorators.grains_ttl(300)
 def fqdns():
     '''
     Return all known FQDNs for the system by enumerating all interfaces and
@@ -10,6 +10,7 @@ import logging
 import re
 
 # Import salt libs
+import salt.utils.decorators
 import salt.utils.files
 import salt.utils.path
 import salt.utils.platform
@@ -26,6 +27,7 @@ __salt__ = {
 log = logging.getLogger(__name__)
 
 
+@salt.utils.decorators.grains_ttl(300)
 def disks():
     '''
     Return list of disk devices
@@ -23,6 +23,7 @@ import socket
 # Import salt libs
 import salt.ext.six as six
 import salt.utils.data
+import salt.utils.decorators
 import salt.utils.http as http
 import salt.utils.json
 import salt.utils.stringutils
@@ -84,5 +85,6 @@ def _search(prefix="latest/"):
     return salt.utils.data.decode(ret)
 
 
+@salt.utils.decorators.grains_ttl(300)
 def metadata():
     return _search()
@@ -10,7 +10,9 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import re
 import sys
+import copy
 import time
+import fnmatch
 import logging
 import inspect
 import tempfile
@@ -18,6 +20,7 @@ import functools
 import threading
 import traceback
 import types
+from multiprocessing.pool import ThreadPool
 from zipimport import zipimporter
 
 # Import salt libs
@@ -676,6 +679,152 @@ def _load_cached_grains(opts, cfn):
         return None
 
 
+# The last run of each grains function, per minion cachedir
+_GRAINS_RUNS = {}
+
+
+def _grains_runs(opts):
+    '''
+    Return the last runs of the grains functions of the minion
+    '''
+    return _GRAINS_RUNS.setdefault(opts.get('cachedir'), {})
+
+
+def _grains_func_ttl(opts, key, func):
+    '''
+    Return how many seconds the result of a grains function can be reused,
+    from the grains_ttl option or else the grains_ttl decorator
+    '''
+    grains_ttl = opts.get('grains_ttl') or {}
+    if key in grains_ttl:
+        return grains_ttl[key]
+    for pattern in sorted(grains_ttl):
+        if fnmatch.fnmatch(key, pattern):
+            return grains_ttl[pattern]
+    return getattr(func, 'grains_ttl', 0)
+
+
+def _run_grains_func(opts, key, func, **kwargs):
+    '''
+    Run a grains function, unless the result of its last run has not expired
+    yet, and record how long it took
+    '''
+    runs = _grains_runs(opts)
+    ttl = _grains_func_ttl(opts, key, func)
+    last_run = runs.get(key)
+    start = time.time()
+    if ttl and last_run is not None and last_run['expires'] > start:
+        log.trace('Reusing %s grain until %s', key, last_run['expires'])
+        return copy.deepcopy(last_run['ret'])
+
+    log.trace('Loading %s grain', key)
+    ret = func(**kwargs)
+    duration = time.time() - start
+    log.trace('Loaded %s grain in %.3f seconds', key, duration)
+    runs[key] = {'time': start,
+                 'duration': duration,
+                 'expires': start + ttl if ttl else None,
+                 'grains': sorted(ret) if isinstance(ret, dict) else [],
+                 # The grains are merged and may be changed in place
+                 'ret': copy.deepcopy(ret)}
+    return ret
+
+
+def _last_grains(opts, key):
+    '''
+    Return the result of the last successful run of a grains function
+    '''
+    last_run = _grains_runs(opts).get(key)
+    if last_run is None:
+        return None
+    log.warning('Keeping the grains of the last run of %s', key)
+    return copy.deepcopy(last_run['ret'])
+
+
+def _run_grains_funcs(opts, funcs):
+    '''
+    Run the grains functions, which must not depend on each other, on a pool
+    of grains_workers threads and return their results. A function failing or
+    running longer than grains_timeout seconds returns the grains of its last
+    run, and is left running in the background when it hangs.
+    '''
+    timeout = opts.get('grains_timeout') or None
+    started = {}
+
+    def run(key, func):
+        started[key] = time.time()
+        return _run_grains_func(opts, key, func)
+
+    pool = ThreadPool(min(opts['grains_workers'], len(funcs)))
+    results = [(key, pool.apply_async(run, (key, func)))
+               for key, func in funcs]
+    pool.close()
+
+    rets = {}
+    for key, result in results:
+        # The time spent queued for a worker does not count
+        waited = time.time()
+        while timeout and not result.ready():
+            remaining = started.get(key, waited) + timeout - time.time()
+            if remaining <= 0:
+                break
+            result.wait(remaining)
+        if timeout and not result.ready():
+            log.error(
+                'The %s grains function did not return within %s seconds',
+                key, timeout
+            )
+            rets[key] = _last_grains(opts, key)
+            continue
+        try:
+            rets[key] = result.get()
+        except Exception:
+            log.critical(
+                'Failed to load grains defined in grain file %s, error:\n',
+                key, exc_info=True
+            )
+            rets[key] = _last_grains(opts, key)
+    return rets
+
+
+def invalidate_grains(opts, names=None):
+    '''
+    Run the grains functions again on the next grains refresh, even though
+    their results have not expired. ``names`` is a list of grains functions,
+    like ``core.fqdns``, or of grains, like ``fqdns``, and may contain globs.
+    All the grains functions run again when ``names`` is ``None``.
+
+    .. versionadded:: Neon
+    '''
+    runs = _grains_runs(opts)
+    if names is None:
+        runs.clear()
+        return
+    if isinstance(names, six.string_types):
+        names = [names]
+    for key in list(runs):
+        for name in names:
+            if fnmatch.fnmatch(key, name) or \
+                    fnmatch.filter(runs[key]['grains'], name):
+                log.debug('Invalidating the %s grain', key)
+                del runs[key]
+                break
+
+
+def grains_timing(opts):
+    '''
+    Return the last run of each grains function: when it ran, how many
+    seconds it took, when its result expires and the grains it returned
+
+    .. versionadded:: Neon
+    '''
+    return dict(
+        (key, dict((item, value) for item, value in six.iteritems(last_run)
+                   if item != 'ret'))
+        for key, last_run in six.iteritems(_grains_runs(opts))
+    )
+
+
 def grains(opts, force_refresh=False, proxy=None):
     '''
     Return the functions for the dynamic grains and the values for the static
@@ -739,12 +888,35 @@ def grains(opts, force_refresh=False, proxy=None):
     funcs = grain_funcs(opts, proxy=proxy)
     if force_refresh:  # if we refresh, lets reload grain modules
         funcs.clear()
+        invalidate_grains(opts)
+
+    # Run the grains functions which take neither the other grains nor the
+    # proxy concurrently, their results are merged in order below
+    rets = {}
+    if opts.get('grains_workers'):
+        independent = []
+        for key in funcs:
+            if key == '_errors':
+                continue
+            if not key.startswith('core.'):
+                try:
+                    parameters = salt.utils.args.get_function_argspec(funcs[key]).args
+                except TypeError:
+                    continue
+                if 'proxy' in parameters or 'grains' in parameters:
+                    continue
+            independent.append((key, funcs[key]))
+        if independent:
+            rets = _run_grains_funcs(opts, independent)
+
     # Run core grains
     for key in funcs:
         if not key.startswith('core.'):
             continue
-        log.trace('Loading %s grain', key)
-        ret = funcs[key]()
+        if key in rets:
+            ret = rets[key]
+        else:
+            ret = _run_grains_func(opts, key, funcs[key])
         if not isinstance(ret, dict):
             continue
         if grains_deep_merge:
@@ -763,14 +935,16 @@ def grains(opts, force_refresh=False, proxy=None):
             # one parameter.  Then the grains can have access to the
             # proxymodule for retrieving information from the connected
             # device.
-            log.trace('Loading %s grain', key)
-            parameters = salt.utils.args.get_function_argspec(funcs[key]).args
-            kwargs = {}
-            if 'proxy' in parameters:
-                kwargs['proxy'] = proxy
-            if 'grains' in parameters:
-                kwargs['grains'] = grains_data
-            ret = funcs[key](**kwargs)
+            if key in rets:
+                ret = rets[key]
+            else:
+                parameters = salt.utils.args.get_function_argspec(funcs[key]).args
+                kwargs = {}
+                if 'proxy' in parameters:
+                    kwargs['proxy'] = proxy
+                if 'grains' in parameters:
+                    kwargs['grains'] = grains_data
+                ret = _run_grains_func(opts, key, funcs[key], **kwargs)
         except Exception:
             if salt.utils.platform.is_proxy():
                 log.info('The following CRITICAL message may not be an error; the proxy may not be completely established yet.')
@@ -779,7 +953,7 @@ def grains(opts, force_refresh=False, proxy=None):
                 'function %s, error:\n', key, funcs[key],
                 exc_info=True
             )
-            continue
+            ret = _last_grains(opts, key)
         if not isinstance(ret, dict):
             continue
         if grains_deep_merge:
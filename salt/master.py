@@ -67,6 +67,7 @@ import salt.utils.ssdp
 import salt.utils.stringutils
 import salt.utils.user
 import salt.utils.verify
+import salt.utils.workerpools
 import salt.utils.zeromq
 from salt.config import DEFAULT_INTERVAL
 from salt.defaults import DEFAULT_TARGET_DELIM
@@ -928,6 +929,27 @@ class ReqServer(salt.utils.process.SignalHandlingMultiprocessingProcess):
                                                        name),
                                                  kwargs=kwargs,
                                                  name=name)
+            pool_channels = [chan for chan in req_channels
+                             if chan.supports_worker_pools]
+            pools = salt.utils.workerpools.get_pools(self.opts)
+            if len(pools) > 1 and not pool_channels:
+                log.warning('worker_pools is only supported by the zeromq '
+                            'transport, ignoring it')
+                pool_channels = None
+            for pool_name, pool in six.iteritems(pools):
+                if not pool_channels or pool_name == salt.utils.workerpools.DEFAULT_POOL:
+                    continue
+                for ind in range(pool['worker_threads']):
+                    name = 'MWorker-{0}-{1}'.format(pool_name, ind)
+                    pool_kwargs = dict(kwargs, pool=pool_name)
+                    self.process_manager.add_process(MWorker,
+                                                     args=(self.opts,
+                                                           self.master_key,
+                                                           self.key,
+                                                           pool_channels,
+                                                           name),
+                                                     kwargs=pool_kwargs,
+                                                     name=name)
         self.process_manager.run()
 
     def run(self):
@@ -957,6 +979,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
                  key,
                  req_channels,
                  name,
+                 pool=salt.utils.workerpools.DEFAULT_POOL,
                  **kwargs):
         '''
         Create a salt master worker process
@@ -964,6 +987,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         :param dict opts: The salt options
         :param dict mkey: The user running the salt master and the AES key
         :param dict key: The user running the salt master and the RSA key
+        :param str pool: The worker pool the worker handles the requests of
 
         :rtype: MWorker
         :return: Master worker
@@ -973,6 +997,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         super(MWorker, self).__init__(**kwargs)
         self.opts = opts
         self.req_channels = req_channels
+        self.pool = pool
 
         self.mkey = mkey
         self.key = key
@@ -993,6 +1018,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         )
         self.opts = state['opts']
         self.req_channels = state['req_channels']
+        self.pool = state['pool']
         self.mkey = state['mkey']
         self.key = state['key']
         self.k_mtime = state['k_mtime']
@@ -1002,6 +1028,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         return {
             'opts': self.opts,
             'req_channels': self.req_channels,
+            'pool': self.pool,
             'mkey': self.mkey,
             'key': self.key,
             'k_mtime': self.k_mtime,
@@ -1024,6 +1051,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.io_loop = ZMQDefaultLoop()
         self.io_loop.make_current()
         for req_channel in self.req_channels:
+            req_channel.worker_pool = self.pool
             req_channel.post_fork(self._handle_payload, io_loop=self.io_loop)  # TODO: cleaner? Maybe lazily?
         try:
             self.io_loop.start()
@@ -1068,7 +1096,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.stats[cmd]['mean'] = (self.stats[cmd]['mean'] * (self.stats[cmd]['runs'] - 1) + duration) / self.stats[cmd]['runs']
         if end - self.stat_clock > self.opts['master_stats_event_iter']:
             # Fire the event with the stats and wipe the tracker
-            self.aes_funcs.event.fire_event({'time': end - self.stat_clock, 'worker': self.name, 'stats': self.stats}, tagify(self.name, 'stats'))
+            self.aes_funcs.event.fire_event({'time': end - self.stat_clock, 'worker': self.name, 'pool': self.pool, 'stats': self.stats}, tagify(self.name, 'stats'))
             self.stats = collections.defaultdict(lambda: {'mean': 0, 'runs': 0})
             self.stat_clock = end
 
@@ -1177,6 +1205,9 @@ class AESFuncs(object):
         import salt.fileserver
         self.fs_ = salt.fileserver.Fileserver(self.opts)
         self._serve_file = self.fs_.serve_file
+        self._serve_file_delta = self.fs_.serve_file_delta
+        self._serve_files = self.fs_.serve_files
+        self._file_manifest = self.fs_.file_manifest
         self._file_find = self.fs_._find_file
         self._file_hash = self.fs_.file_hash
         self._file_hash_and_stat = self.fs_.file_hash_and_stat
@@ -1540,6 +1571,7 @@ class AESFuncs(object):
                                        'data',
                                        {'grains': load['grains'],
                                         'pillar': data})
+            salt.utils.minions.minion_data_updated(self.opts, load['id'])
             if self.opts.get('minion_data_cache_events') is True:
                 self.event.fire_event({'Minion data cache refresh': load['id']}, tagify(load['id'], 'refresh', 'minion'))
         return data
@@ -1600,6 +1632,45 @@ class AESFuncs(object):
 
         :param dict load: The minion payload
         '''
+        if not self._verify_return_sig(load):
+            return False
+
+        try:
+            salt.utils.job.store_job(
+                self.opts, load, event=self.event, mminion=self.mminion)
+        except salt.exceptions.SaltCacheError:
+            log.error('Could not store job information for load: %s', load)
+
+    def _return_multi(self, load):
+        '''
+        Handle a batch of return data sent by a minion in one request.
+
+        The returns are stored with a single call to the returner_multi
+        function of the master job cache, when it has one.
+
+        :param dict load: The minion payload, holding the returns in 'load'
+        '''
+        if not self._verify_return_sig(load):
+            return False
+
+        rets = []
+        for ret in load.get('load') or []:
+            # A minion can only return for itself
+            if not isinstance(ret, dict) or ret.get('id') != load.get('id'):
+                log.warning('Dropping invalid return in batch from %s', load.get('id'))
+                continue
+            rets.append(ret)
+        try:
+            salt.utils.job.store_jobs(
+                self.opts, rets, event=self.event, mminion=self.mminion)
+        except salt.exceptions.SaltCacheError:
+            log.error('Could not store job information for loads: %s', rets)
+
+    def _verify_return_sig(self, load):
+        '''
+        Verify the signature of a return load, if the master requires or the
+        minion sent one. Return False if the load should be dropped.
+        '''
         if self.opts['require_minion_sign_messages'] and 'sig' not in load:
             log.critical(
                 '_return: Master is requiring minions to sign their '
@@ -1624,12 +1695,7 @@ class AESFuncs(object):
                 else:
                     log.info('But \'drop_message_signature_fail\' is disabled, so message is still accepted.')
             load['sig'] = sig
-
-        try:
-            salt.utils.job.store_job(
-                self.opts, load, event=self.event, mminion=self.mminion)
-        except salt.exceptions.SaltCacheError:
-            log.error('Could not store job information for load: %s', load)
+        return True
 
     def _syndic_return(self, load):
         '''
@@ -2185,12 +2251,24 @@ class ClearFuncs(object):
             return {'error': msg}
         return jid
 
+    @property
+    def pub_channels(self):
+        '''
+        The publisher channels of this worker, which are kept across
+        publications
+        '''
+        if not hasattr(self, '_pub_channels'):
+            self._pub_channels = []
+            for transport, opts in iter_transport_opts(self.opts):
+                self._pub_channels.append(
+                    salt.transport.server.PubServerChannel.factory(opts))
+        return self._pub_channels
+
     def _send_pub(self, load):
         '''
         Take a load and send it across the network to connected minions
         '''
-        for transport, opts in iter_transport_opts(self.opts):
-            chan = salt.transport.server.PubServerChannel.factory(opts)
+        for chan in self.pub_channels:
             chan.publish(load)
 
     @property
@@ -4,6 +4,7 @@ Routines to set up a minion
 '''
 # Import python libs
 from __future__ import absolute_import, print_function, with_statement, unicode_literals
+import errno
 import functools
 import os
 import re
@@ -91,6 +92,7 @@ import salt.utils.error
 import salt.utils.event
 import salt.utils.files
 import salt.utils.jid
+import salt.utils.jobworkers
 import salt.utils.minion
 import salt.utils.minions
 import salt.utils.network
@@ -1086,6 +1088,12 @@ class Minion(MinionBase):
         self.ready = False
         self.jid_queue = [] if jid_queue is None else jid_queue
         self.periodic_callbacks = {}
+        self.job_workers = None
+        self.job_registry = None
+        # Whether this is a copy of the minion running in a job worker
+        self.job_worker = False
+        self._return_batch = []
+        self._return_batch_timer = None
 
         if io_loop is None:
             install_zmq()
@@ -1236,6 +1244,8 @@ class Minion(MinionBase):
             if hasattr(self, 'schedule'):
                 self.schedule.functions = self.functions
                 self.schedule.returners = self.returners
+            if self.job_workers is not None:
+                self.job_workers.recycle()
 
         if not hasattr(self, 'schedule'):
             self.schedule = salt.utils.schedule.Schedule(
@@ -1466,6 +1476,8 @@ class Minion(MinionBase):
                 self.functions, self.returners, self.function_errors, self.executors = self._load_modules()
                 self.schedule.functions = self.functions
                 self.schedule.returners = self.returners
+                if self.job_workers is not None:
+                    self.job_workers.recycle()
 
         process_count_max = self.opts.get('process_count_max')
         if process_count_max > 0:
@@ -1475,6 +1487,12 @@ class Minion(MinionBase):
                 yield tornado.gen.sleep(10)
                 process_count = len(salt.utils.minion.running(self.opts))
 
+        if self.job_registry is not None and self._handle_job_query(data):
+            return
+
+        if self.job_workers is not None and self.job_workers.dispatch(data, self.connected):
+            return
+
         # We stash an instance references to allow for the socket
         # communication in Windows. You can't pickle functions, and thus
         # python needs to be able to reconstruct the reference on the other
@@ -1512,6 +1530,48 @@ class Minion(MinionBase):
         else:
             self.win_proc.append(process)
 
+    def _handle_job_query(self, data):
+        '''
+        Answer saltutil.running and saltutil.find_job from the job registry
+        rather than in a new job. Return False for the other jobs, and for the
+        queries which have to go through the usual execution, for returners or
+        the blackout checks.
+        '''
+        if data['fun'] not in ('saltutil.running', 'saltutil.find_job') \
+                or data['fun'] not in self.functions \
+                or data.get('ret') or self.opts.get('return') \
+                or self.opts['pillar'].get('minion_blackout', False) \
+                or self.opts['grains'].get('minion_blackout', False):
+            return False
+        try:
+            args, kwargs = load_args_and_kwargs(
+                self.functions[data['fun']],
+                data['arg'],
+                data)
+            if data['fun'] == 'saltutil.running':
+                return_data = self.job_registry.running()
+            else:
+                jid = args[0] if args else kwargs['jid']
+                return_data = self.job_registry.get(six.text_type(jid)) or {}
+        except (KeyError, IndexError, SaltInvocationError):
+            return False
+        ret = {'return': return_data,
+               'retcode': salt.defaults.exitcodes.EX_OK,
+               'success': True,
+               'jid': data['jid'],
+               'fun': data['fun'],
+               'fun_args': data['arg']}
+        if 'master_id' in data:
+            ret['master_id'] = data['master_id']
+        if isinstance(data.get('metadata'), dict):
+            ret['metadata'] = data['metadata']
+        if self.connected:
+            if self.opts.get('return_batch_window', 0) > 0:
+                self._queue_return(ret)
+            else:
+                self._return_pub(ret, sync=False)
+        return True
+
     def ctx(self):
         '''
         Return a single context manager for the minion's data
@@ -1561,6 +1621,23 @@ class Minion(MinionBase):
             with tornado.stack_context.StackContext(minion_instance.ctx):
                 run_func(minion_instance, opts, data)
 
+    def _run_pooled_job(self, data, connected):
+        '''
+        Run a job in a job worker, a copy of this minion forked before the job
+        was published which keeps running once the job is done
+        '''
+        self.job_worker = True
+        self.connected = connected
+        try:
+            self._target(self, self.opts, data, connected)
+        finally:
+            try:
+                os.remove(os.path.join(self.proc_dir, data['jid']))
+            except OSError as exc:
+                if exc.errno != errno.ENOENT:
+                    log.error('Failed to remove the proc file of job %s: %s',
+                              data['jid'], exc)
+
     @classmethod
     def _thread_return(cls, minion_instance, opts, data):
         '''
@@ -1569,22 +1646,25 @@ class Minion(MinionBase):
         '''
         fn_ = os.path.join(minion_instance.proc_dir, data['jid'])
 
-        if opts['multiprocessing'] and not salt.utils.platform.is_windows():
-            # Shutdown the multiprocessing before daemonizing
-            salt.log.setup.shutdown_multiprocessing_logging()
+        # Job workers are long-lived children of the minion running many jobs
+        if not minion_instance.job_worker:
+            if opts['multiprocessing'] and not salt.utils.platform.is_windows():
+                # Shutdown the multiprocessing before daemonizing
+                salt.log.setup.shutdown_multiprocessing_logging()
 
-            salt.utils.process.daemonize_if(opts)
+                salt.utils.process.daemonize_if(opts)
 
-            # Reconfigure multiprocessing logging after daemonizing
-            salt.log.setup.setup_multiprocessing_logging()
+                # Reconfigure multiprocessing logging after daemonizing
+                salt.log.setup.setup_multiprocessing_logging()
 
-        salt.utils.process.appendproctitle('{0}._thread_return {1}'.format(cls.__name__, data['jid']))
+            salt.utils.process.appendproctitle('{0}._thread_return {1}'.format(cls.__name__, data['jid']))
 
         sdata = {'pid': os.getpid()}
         sdata.update(data)
         log.info('Starting a new job with PID %s', sdata['pid'])
         with salt.utils.files.fopen(fn_, 'w+b') as fp_:
             fp_.write(minion_instance.serial.dumps(sdata))
+        salt.utils.minion.job_started(opts, sdata)
         ret = {'success': False}
         function_name = data['fun']
         executors = data.get('module_executors') or \
@@ -1747,10 +1827,7 @@ class Minion(MinionBase):
             else:
                 log.warning('The metadata parameter must be a dictionary. Ignoring.')
         if minion_instance.connected:
-            minion_instance._return_pub(
-                ret,
-                timeout=minion_instance._return_retry_timer()
-            )
+            minion_instance._send_return(ret)
 
         # Add default returners from minion config
         # Should have been coverted to comma-delimited string already
@@ -1783,6 +1860,7 @@ class Minion(MinionBase):
                     log.exception(
                         'The return failed for job %s: %s', data['jid'], exc
                     )
+        salt.utils.minion.job_finished(opts, fn_)
 
     @classmethod
     def _thread_multi_return(cls, minion_instance, opts, data):
@@ -1792,22 +1870,25 @@ class Minion(MinionBase):
         '''
         fn_ = os.path.join(minion_instance.proc_dir, data['jid'])
 
-        if opts['multiprocessing'] and not salt.utils.platform.is_windows():
-            # Shutdown the multiprocessing before daemonizing
-            salt.log.setup.shutdown_multiprocessing_logging()
+        # Job workers are long-lived children of the minion running many jobs
+        if not minion_instance.job_worker:
+            if opts['multiprocessing'] and not salt.utils.platform.is_windows():
+                # Shutdown the multiprocessing before daemonizing
+                salt.log.setup.shutdown_multiprocessing_logging()
 
-            salt.utils.process.daemonize_if(opts)
+                salt.utils.process.daemonize_if(opts)
 
-            # Reconfigure multiprocessing logging after daemonizing
-            salt.log.setup.setup_multiprocessing_logging()
+                # Reconfigure multiprocessing logging after daemonizing
+                salt.log.setup.setup_multiprocessing_logging()
 
-        salt.utils.process.appendproctitle('{0}._thread_multi_return {1}'.format(cls.__name__, data['jid']))
+            salt.utils.process.appendproctitle('{0}._thread_multi_return {1}'.format(cls.__name__, data['jid']))
 
         sdata = {'pid': os.getpid()}
         sdata.update(data)
         log.info('Starting a new job with PID %s', sdata['pid'])
         with salt.utils.files.fopen(fn_, 'w+b') as fp_:
             fp_.write(minion_instance.serial.dumps(sdata))
+        salt.utils.minion.job_started(opts, sdata)
 
         multifunc_ordered = opts.get('multifunc_ordered', False)
         num_funcs = len(data['fun'])
@@ -1883,10 +1964,7 @@ class Minion(MinionBase):
         if 'metadata' in data:
             ret['metadata'] = data['metadata']
         if minion_instance.connected:
-            minion_instance._return_pub(
-                ret,
-                timeout=minion_instance._return_retry_timer()
-            )
+            minion_instance._send_return(ret)
         if data['ret']:
             if 'ret_config' in data:
                 ret['ret_config'] = data['ret_config']
@@ -1903,6 +1981,59 @@ class Minion(MinionBase):
                         'The return failed for job %s: %s',
                         data['jid'], exc
                     )
+        salt.utils.minion.job_finished(opts, fn_)
+
+    def _send_return(self, ret):
+        '''
+        Send the return of a job to the master. When returns are batched, hand
+        the return over to the minion process, which sends the returns which
+        finish within :conf_minion:`return_batch_window` seconds in one request.
+        '''
+        # Events get trimmed down to max_event_size, bigger returns are sent
+        # on their own
+        if self.opts.get('return_batch_window', 0) > 0 \
+                and len(self.serial.dumps(ret)) < self.opts['max_event_size']:
+            event = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
+            try:
+                if event.fire_event(ret, self._return_batch_tag()):
+                    return
+            finally:
+                event.destroy()
+            log.warning('Unable to queue the return of job %s, sending it now',
+                        ret.get('jid'))
+        self._return_pub(ret, timeout=self._return_retry_timer())
+
+    def _return_batch_tag(self):
+        '''
+        The tag of the events handing returns over to the minion process. With
+        several masters, only the Minion connected to the master which sent
+        the job sends its return.
+        '''
+        return '__return_batch/{0}'.format(self.opts['master'])
+
+    def _queue_return(self, ret):
+        '''
+        Add a return to the batch sent to the master
+        '''
+        self._return_batch.append(ret)
+        if len(self._return_batch) >= self.opts.get('return_batch_size', 100):
+            self._flush_returns()
+        elif self._return_batch_timer is None:
+            self._return_batch_timer = self.io_loop.call_later(
+                self.opts['return_batch_window'], self._flush_returns)
+
+    def _flush_returns(self):
+        '''
+        Send the batched returns to the master
+        '''
+        if self._return_batch_timer is not None:
+            self.io_loop.remove_timeout(self._return_batch_timer)
+            self._return_batch_timer = None
+        rets, self._return_batch = self._return_batch, []
+        if rets:
+            self._return_pub_multi(rets, ret_cmd='_return_multi',
+                                   timeout=self._return_retry_timer(),
+                                   sync=False)
 
     def _return_pub(self, ret, ret_cmd='_return', timeout=60, sync=True):
         '''
@@ -1995,7 +2126,10 @@ class Minion(MinionBase):
         '''
         if not isinstance(rets, list):
             rets = [rets]
+        # The returns of a syndic are merged by job, the scheduled jobs of a
+        # minion all share the same jid so its returns are sent one by one
         jids = {}
+        loads = []
         for ret in rets:
             jid = ret.get('jid', ret.get('__jid__'))
             fun = ret.get('fun', ret.get('__fun__'))
@@ -2008,9 +2142,11 @@ class Minion(MinionBase):
                         # The file is gone already
                         pass
             log.info('Returning information for job: %s', jid)
-            load = jids.setdefault(jid, {})
             if ret_cmd == '_syndic_return':
-                if not load:
+                load = jids.get(jid)
+                if load is None:
+                    load = jids[jid] = {}
+                    loads.append(load)
                     load.update({'id': self.opts['id'],
                                  'jid': jid,
                                  'fun': fun,
@@ -2026,7 +2162,8 @@ class Minion(MinionBase):
                         continue
                     load['return'][key] = value
             else:
-                load.update({'id': self.opts['id']})
+                load = {'id': self.opts['id']}
+                loads.append(load)
                 for key, value in six.iteritems(ret):
                     load[key] = value
 
@@ -2051,7 +2188,11 @@ class Minion(MinionBase):
                 salt.utils.minion.cache_jobs(self.opts, load['jid'], ret)
 
         load = {'cmd': ret_cmd,
-                'load': list(six.itervalues(jids))}
+                'id': self.opts['id'],
+                'load': loads}
+
+        if not self.opts['pub_ret']:
+            return ''
 
         def timeout_handler(*_):
             log.warning(
@@ -2148,6 +2289,10 @@ class Minion(MinionBase):
         self.schedule.functions = self.functions
         self.schedule.returners = self.returners
 
+        # The workers were forked with the previous modules
+        if self.job_workers is not None:
+            self.job_workers.recycle()
+
     def beacons_refresh(self):
         '''
         Refresh the functions and returners.
@@ -2335,6 +2480,8 @@ class Minion(MinionBase):
             self.manage_schedule(tag, data)
         elif tag.startswith('manage_beacons'):
             self.manage_beacons(tag, data)
+        elif tag.startswith('grains_invalidate'):
+            salt.loader.invalidate_grains(self.opts, data.get('names'))
         elif tag.startswith('grains_refresh'):
             if (data.get('force_refresh', False) or
                     self.grains_cache != self.opts['grains']):
@@ -2424,6 +2571,9 @@ class Minion(MinionBase):
                         self.functions, self.returners, self.function_errors, self.executors = self._load_modules()
                         # make the schedule to use the new 'functions' loader
                         self.schedule.functions = self.functions
+                        # The workers were forked with the previous master
+                        if self.job_workers is not None:
+                            self.job_workers.recycle()
                         self.pub_channel.on_recv(self._handle_payload)
                         self._fire_master_minion_start()
                         log.info('Minion is ready to receive requests!')
@@ -2495,7 +2645,21 @@ class Minion(MinionBase):
                         'Connected to master %s',
                         data['schedule'].split(master_event(type='alive', master=''))[1]
                     )
-            self._return_pub(data, ret_cmd='_return', sync=False)
+            if self.opts.get('return_batch_window', 0) > 0:
+                self._queue_return(data)
+            else:
+                self._return_pub(data, ret_cmd='_return', sync=False)
+        elif tag.startswith('__return_batch'):
+            if tag == self._return_batch_tag():
+                data.pop('_stamp', None)
+                self._queue_return(data)
+        elif tag.startswith('__job_start'):
+            if self.job_registry is not None:
+                data.pop('_stamp', None)
+                self.job_registry.add(data)
+        elif tag.startswith('__job_finish'):
+            if self.job_registry is not None:
+                self.job_registry.remove(data['jid'])
         elif tag.startswith('_salt_error'):
             if self.connected:
                 log.debug('Forwarding salt error event tag=%s', tag)
@@ -2541,6 +2705,8 @@ class Minion(MinionBase):
             self.beacons = salt.beacons.Beacon(self.opts, self.functions)
             uid = salt.utils.user.get_uid(user=self.opts.get('user', None))
             self.proc_dir = get_proc_dir(self.opts['cachedir'], uid=uid)
+            if self.opts.get('job_registry'):
+                self.job_registry = salt.utils.minion.start_job_registry(self.opts)
             self.grains_cache = self.opts['grains']
             self.ready = True
 
@@ -2644,6 +2810,27 @@ class Minion(MinionBase):
 
         self.periodic_callbacks.update(new_periodic_callbacks)
 
+    def setup_job_workers(self):
+        '''
+        Fork the job workers, if enabled.
+        This is safe to call multiple times.
+        '''
+        if self.job_workers is not None or self.opts.get('job_workers', 0) <= 0:
+            return
+        if not self.opts['multiprocessing'] or salt.utils.platform.is_windows():
+            log.warning('Job workers are only available with multiprocessing '
+                        'on platforms which fork processes, running each job '
+                        'in a new process')
+            return
+        self._setup_core()
+        self.job_workers = salt.utils.jobworkers.JobWorkerPool(
+            self._run_pooled_job,
+            self.io_loop,
+            self.opts['job_workers'],
+            max_jobs=self.opts.get('job_worker_max_jobs', 0),
+            functions=self.opts.get('job_worker_functions'))
+        self.job_workers.start()
+
     # Main Minion Tune In
     def tune_in(self, start=True):
         '''
@@ -2676,6 +2863,7 @@ class Minion(MinionBase):
 
         self.setup_beacons()
         self.setup_scheduler()
+        self.setup_job_workers()
 
         # schedule the stuff that runs every interval
         ping_interval = self.opts.get('ping_interval', 0) * 60
@@ -2759,6 +2947,9 @@ class Minion(MinionBase):
         Tear down the minion
         '''
         self._running = False
+        if getattr(self, 'job_workers', None) is not None:
+            self.job_workers.close()
+            self.job_workers = None
         if hasattr(self, 'schedule'):
             del self.schedule
         if hasattr(self, 'pub_channel') and self.pub_channel is not None:
@@ -3456,75 +3647,31 @@ class Matcher(object):
         if HAS_RANGE:
             ref['R'] = 'range'
 
-        results = []
-        opers = ['and', 'or', 'not', '(', ')']
-
-        if isinstance(tgt, six.string_types):
-            words = tgt.split()
-        else:
-            # we make a shallow copy in order to not affect the passed in arg
-            words = tgt[:]
-
-        while words:
-            word = words.pop(0)
-            target_info = salt.utils.minions.parse_target(word)
-
-            # Easy check first
-            if word in opers:
-                if results:
-                    if results[-1] == '(' and word in ('and', 'or'):
-                        log.error('Invalid beginning operator after "(": %s', word)
-                        return False
-                    if word == 'not':
-                        if not results[-1] in ('and', 'or', '('):
-                            results.append('and')
-                    results.append(word)
-                else:
-                    # seq start with binary oper, fail
-                    if word not in ['(', 'not']:
-                        log.error('Invalid beginning operator: %s', word)
-                        return False
-                    results.append(word)
-
-            elif target_info and target_info['engine']:
-                if 'N' == target_info['engine']:
-                    # if we encounter a node group, just evaluate it in-place
-                    decomposed = salt.utils.minions.nodegroup_comp(target_info['pattern'], nodegroups)
-                    if decomposed:
-                        words = decomposed + words
-                    continue
-
-                engine = ref.get(target_info['engine'])
-                if not engine:
-                    # If an unknown engine is called at any time, fail out
-                    log.error(
-                        'Unrecognized target engine "%s" for target '
-                        'expression "%s"', target_info['engine'], word
-                    )
-                    return False
-
-                engine_args = [target_info['pattern']]
-                engine_kwargs = {}
-                if target_info['delimiter']:
-                    engine_kwargs['delimiter'] = target_info['delimiter']
-
-                results.append(
-                    six.text_type(getattr(self, '{0}_match'.format(engine))(*engine_args, **engine_kwargs))
-                )
-
-            else:
+        def _match_term(term):
+            engine, delimiter, pattern, word = term[1:]
+            if not engine:
                 # The match is not explicitly defined, evaluate it as a glob
-                results.append(six.text_type(self.glob_match(word)))
+                return bool(self.glob_match(word))
+            matcher = ref.get(engine)
+            if not matcher:
+                # If an unknown engine is called at any time, fail out
+                raise SaltInvocationError(
+                    'unrecognized target engine "{0}" for target '
+                    'expression "{1}"'.format(engine, word))
+            engine_kwargs = {}
+            if delimiter:
+                engine_kwargs['delimiter'] = delimiter
+            return bool(getattr(self, '{0}_match'.format(matcher))(pattern, **engine_kwargs))
 
-        results = ' '.join(results)
-        log.debug('compound_match %s ? "%s" => "%s"', self.opts['id'], tgt, results)
         try:
-            return eval(results)  # pylint: disable=W0123
-        except Exception:
-            log.error(
-                'Invalid compound target: %s for results: %s', tgt, results)
+            ret = salt.utils.minions.evaluate_compound(
+                salt.utils.minions.compile_compound(tgt, nodegroups),
+                _match_term)
+        except SaltInvocationError as exc:
+            log.error('Invalid compound target %s: %s', tgt, exc)
             return False
-        return False
+        log.debug('compound_match %s ? "%s" => %s', self.opts['id'], tgt, ret)
+        return ret
 
     def nodegroup_match(self, tgt, nodegroups):
         '''
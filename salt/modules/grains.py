@@ -22,6 +22,7 @@ from functools import reduce  # pylint: disable=redefined-builtin
 
 # Import Salt libs
 from salt.ext import six
+import salt.loader
 import salt.utils.compat
 import salt.utils.data
 import salt.utils.files
@@ -787,6 +788,23 @@ def set(key,
     return ret
 
 
+def timing():
+    '''
+    Return how long each grains function took to run on the last grains
+    refresh of the minion, when it ran, when its result expires according to
+    :conf_minion:`grains_ttl` and the grains it returned.
+
+    .. versionadded:: Neon
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' grains.timing
+    '''
+    return salt.loader.grains_timing(__opts__)
+
+
 def equals(key, value):
     '''
     Used to make sure the minion's grain key/value matches.
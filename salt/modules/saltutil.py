@@ -370,16 +370,32 @@ def refresh_grains(**kwargs):
     refresh_pillar : True
         Set to ``False`` to keep pillar data from being refreshed.
 
+    invalidate
+        .. versionadded:: Neon
+
+        The grains, or grains functions like ``core.fqdns``, to load again
+        even though their :conf_minion:`grains_ttl` has not expired, as a
+        comma-separated list which may contain globs. Set to ``True`` to run
+        every grains function again.
+
     CLI Examples:
 
     .. code-block:: bash
 
         salt '*' saltutil.refresh_grains
+        salt '*' saltutil.refresh_grains invalidate=fqdns,disks
     '''
     kwargs = salt.utils.args.clean_kwargs(**kwargs)
     _refresh_pillar = kwargs.pop('refresh_pillar', True)
+    _invalidate = kwargs.pop('invalidate', None)
     if kwargs:
         salt.utils.args.invalid_kwargs(kwargs)
+    if _invalidate:
+        if _invalidate is True:
+            _invalidate = None
+        elif isinstance(_invalidate, six.string_types):
+            _invalidate = _invalidate.split(',')
+        __salt__['event.fire']({'names': _invalidate}, 'grains_invalidate')
     # Modules and pillar need to be refreshed in case grains changes affected
     # them, and the module refresh process reloads the grains and assigns the
     # newly-reloaded grains to each execution module's __grains__ dunder.
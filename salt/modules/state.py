@@ -2107,6 +2107,42 @@ def clear_cache():
                 continue
             os.remove(path)
             ret.append(fn_)
+    render_cache = os.path.join(__opts__['cachedir'], 'state_render_cache')
+    if os.path.isdir(render_cache):
+        shutil.rmtree(render_cache)
+        ret.append('state_render_cache')
+    return ret
+
+
+def show_cache_stats():
+    '''
+    .. versionadded:: Neon
+
+    Show the number of SLS files which were served from the state render
+    cache, see :conf_minion:`state_render_cache`. ``hits`` and ``misses``
+    count the lookups of cacheable SLS files, ``skipped`` counts the SLS
+    files which cannot be cached.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' state.show_cache_stats
+    '''
+    ret = salt.state.render_cache_stats(__opts__)
+    ret['enabled'] = __opts__.get('state_render_cache', False)
+    entries = 0
+    size = 0
+    cache_dir = os.path.join(__opts__['cachedir'], 'state_render_cache')
+    if os.path.isdir(cache_dir):
+        for fn_ in os.listdir(cache_dir):
+            if fn_.endswith('.p'):
+                entries += 1
+                size += os.path.getsize(os.path.join(cache_dir, fn_))
+    ret['entries'] = entries
+    ret['size'] = size
+    lookups = ret['hits'] + ret['misses']
+    ret['hit_ratio'] = float(ret['hits']) / lookups if lookups else 0.0
     return ret
 
 
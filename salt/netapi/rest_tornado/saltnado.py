@@ -376,7 +376,9 @@ class EventListener(object):
         '''
         Callback for events on the event sub socket
         '''
-        mtag, data = self.event.unpack(raw, self.event.serial)
+        # The data is only decoded once a future needs it
+        mtag, mdata = self.event.unpack_tag(raw)
+        data = None
 
         # see if we have any futures that need this info:
         for (tag, matcher), futures in six.iteritems(self.tag_map):
@@ -389,6 +391,8 @@ class EventListener(object):
             if not is_matched:
                 continue
 
+            if data is None:
+                data = self.event.unpack_data(mdata, self.event.serial)
             for future in futures:
                 if future.done():
                     continue
@@ -19,6 +19,7 @@ import salt.payload
 import salt.utils.atomicfile
 import salt.utils.files
 import salt.utils.jid
+import salt.utils.job_segments
 import salt.utils.minions
 import salt.utils.stringutils
 import salt.exceptions
@@ -53,6 +54,15 @@ def _job_dir():
     return os.path.join(__opts__['cachedir'], 'jobs')
 
 
+def _segments():
+    '''
+    Return the segment store if the job cache is kept in segments, else None
+    '''
+    if __opts__.get('job_cache_segments', False):
+        return salt.utils.job_segments.get_store(__opts__)
+    return None
+
+
 def _walk_through(job_dir):
     '''
     Walk though the jid dir and look for jobs
@@ -81,6 +91,22 @@ def _walk_through(job_dir):
                 yield jid, job, t_path, final
 
 
+def _walk_jobs():
+    '''
+    Yield the jid and load of all jobs, along with the path of the job
+    directory when the job cache is not kept in segments
+    '''
+    store = _segments()
+    if store is None:
+        for item in _walk_through(_job_dir()):
+            yield item
+        return
+    for jid in store.jids():
+        job = store.last(jid, salt.utils.job_segments.LOAD)
+        if job is not None:
+            yield jid, job, None, None
+
+
 #TODO: add to returner docs-- this is a new one
 def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
     '''
@@ -99,6 +125,20 @@ def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
     else:
         jid = passed_jid
 
+    store = _segments()
+    if store is not None:
+        if passed_jid is None:
+            if not store.create(jid, {'nocache': nocache}):
+                # Another master process got the same jid
+                time.sleep(0.01)
+                return prep_jid(nocache=nocache, recurse_count=recurse_count+1)
+            return jid
+        if not nocache and salt.utils.job_segments.JID in store.job(jid):
+            # Already stored, as it is for every return
+            return jid
+        store.append(salt.utils.job_segments.JID, jid, {'nocache': nocache})
+        return jid
+
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
 
     # Make sure we create the jid dir, otherwise someone else is using it,
@@ -137,6 +177,10 @@ def returner(load):
     if load['jid'] == 'req':
         load['jid'] = prep_jid(nocache=load.get('nocache', False))
 
+    store = _segments()
+    if store is not None:
+        return _segments_returner(store, load)
+
     jid_dir = salt.utils.jid.jid_dir(load['jid'], _job_dir(), __opts__['hash_type'])
     if os.path.exists(os.path.join(jid_dir, 'nocache')):
         return
@@ -181,6 +225,78 @@ def returner(load):
         )
 
 
+def _extra_return(minion):
+    '''
+    Log a return from a minion which already returned, and return False
+    '''
+    log.error(
+        'An extra return was detected from minion %s, please verify '
+        'the minion, this could be a replay attack', minion
+    )
+    return False
+
+
+def _segments_return_record(store, load, seen=()):
+    '''
+    Return the record to append to the job cache segments for a minion
+    return, None if the job is not cached and False if the minion already
+    returned
+    '''
+    if store.nocache(load['jid']):
+        return None
+    if load['id'] in store.job(load['jid']).get(salt.utils.job_segments.RETURN, {}) \
+            or (load['jid'], load['id']) in seen:
+        return _extra_return(load['id'])
+    data = dict((key, load[key]) for key in ['return', 'retcode', 'success', 'out'] if key in load)
+    return (salt.utils.job_segments.RETURN, load['jid'], data, load['id'])
+
+
+def _segments_stored(store, record, ref):
+    '''
+    Check that an appended return is the one stored for its minion, another
+    master process may have appended one at the same time
+    '''
+    _, jid, _, minion = record
+    if store.job(jid)[salt.utils.job_segments.RETURN][minion] != ref:
+        return _extra_return(minion)
+    return True
+
+
+def _segments_returner(store, load):
+    '''
+    Append a minion return to the job cache segments
+    '''
+    record = _segments_return_record(store, load)
+    if not record:
+        return record
+    if not _segments_stored(store, record, store.append_many([record])[0]):
+        return False
+
+
+def returner_multi(loads):
+    '''
+    Return the data of several minion returns to the local job cache at once
+    '''
+    store = _segments()
+    if store is None:
+        for load in loads:
+            returner(load)
+        return
+
+    records = []
+    seen = set()
+    for load in loads:
+        if load['jid'] == 'req':
+            load['jid'] = prep_jid(nocache=load.get('nocache', False))
+        record = _segments_return_record(store, load, seen)
+        if record:
+            records.append(record)
+            seen.add((load['jid'], load['id']))
+    if records:
+        for record, ref in zip(records, store.append_many(records)):
+            _segments_stored(store, record, ref)
+
+
 def save_load(jid, clear_load, minions=None, recurse_count=0):
     '''
     Save the load to the specified jid
@@ -195,31 +311,35 @@ def save_load(jid, clear_load, minions=None, recurse_count=0):
         log.error(err)
         raise salt.exceptions.SaltCacheError(err)
 
-    jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
+    store = _segments()
+    if store is not None:
+        store.append(salt.utils.job_segments.LOAD, jid, clear_load)
+    else:
+        jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
 
-    serial = salt.payload.Serial(__opts__)
+        serial = salt.payload.Serial(__opts__)
 
-    # Save the invocation information
-    try:
-        if not os.path.exists(jid_dir):
-            os.makedirs(jid_dir)
-    except OSError as exc:
-        if exc.errno == errno.EEXIST:
-            # rarely, the directory can be already concurrently created between
-            # the os.path.exists and the os.makedirs lines above
-            pass
-        else:
-            raise
-    try:
-        with salt.utils.files.fopen(os.path.join(jid_dir, LOAD_P), 'w+b') as wfh:
-            serial.dump(clear_load, wfh)
-    except IOError as exc:
-        log.warning(
-            'Could not write job invocation cache file: %s', exc
-        )
-        time.sleep(0.1)
-        return save_load(jid=jid, clear_load=clear_load,
-                         recurse_count=recurse_count+1)
+        # Save the invocation information
+        try:
+            if not os.path.exists(jid_dir):
+                os.makedirs(jid_dir)
+        except OSError as exc:
+            if exc.errno == errno.EEXIST:
+                # rarely, the directory can be already concurrently created between
+                # the os.path.exists and the os.makedirs lines above
+                pass
+            else:
+                raise
+        try:
+            with salt.utils.files.fopen(os.path.join(jid_dir, LOAD_P), 'w+b') as wfh:
+                serial.dump(clear_load, wfh)
+        except IOError as exc:
+            log.warning(
+                'Could not write job invocation cache file: %s', exc
+            )
+            time.sleep(0.1)
+            return save_load(jid=jid, clear_load=clear_load,
+                             recurse_count=recurse_count+1)
 
     # if you have a tgt, save that for the UI etc
     if 'tgt' in clear_load and clear_load['tgt'] != '':
@@ -248,6 +368,11 @@ def save_minions(jid, minions, syndic_id=None):
         ' from syndic master \'{0}\''.format(syndic_id) if syndic_id else '',
         minions
     )
+    store = _segments()
+    if store is not None:
+        store.append(salt.utils.job_segments.MINIONS, jid, minions, minion=syndic_id)
+        return
+
     serial = salt.payload.Serial(__opts__)
 
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
@@ -290,6 +415,10 @@ def get_load(jid):
     '''
     Return the load data that marks a specified jid
     '''
+    store = _segments()
+    if store is not None:
+        return _segments_get_load(store, jid)
+
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
     load_fn = os.path.join(jid_dir, LOAD_P)
     if not os.path.exists(jid_dir) or not os.path.exists(load_fn):
@@ -330,10 +459,35 @@ def get_load(jid):
     return ret
 
 
+def _segments_get_load(store, jid):
+    '''
+    Return the load data of a jid from the job cache segments
+    '''
+    job = store.job(jid)
+    if salt.utils.job_segments.LOAD not in job:
+        return {}
+    ret = store.read(job[salt.utils.job_segments.LOAD][-1]) or {}
+    all_minions = set()
+    for ref in job.get(salt.utils.job_segments.MINIONS, []):
+        all_minions.update(store.read(ref) or [])
+    if all_minions:
+        ret['Minions'] = sorted(all_minions)
+    return ret
+
+
 def get_jid(jid):
     '''
     Return the information returned when the specified job id was executed
     '''
+    store = _segments()
+    if store is not None:
+        ret = {}
+        for minion, ref in six.iteritems(store.job(jid).get(salt.utils.job_segments.RETURN, {})):
+            ret_data = store.read(ref)
+            if ret_data is not None:
+                ret[minion] = ret_data
+        return ret
+
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
     serial = salt.payload.Serial(__opts__)
 
@@ -373,7 +527,7 @@ def get_jids():
     Return a dict mapping all job ids to job information
     '''
     ret = {}
-    for jid, job, _, _ in _walk_through(_job_dir()):
+    for jid, job, _, _ in _walk_jobs():
         ret[jid] = salt.utils.jid.format_jid_instance(jid, job)
 
         if __opts__.get('job_cache_store_endtime'):
@@ -390,6 +544,22 @@ def get_jids_filter(count, filter_find_job=True):
     :param int count: show not more than the count of most recent jobs
     :param bool filter_find_jobs: filter out 'saltutil.find_job' jobs
     '''
+    store = _segments()
+    if store is not None:
+        # The jids sort by time, only read the loads of the most recent jobs
+        ret = []
+        for jid in reversed(store.jids()):
+            if len(ret) >= count:
+                break
+            job = store.last(jid, salt.utils.job_segments.LOAD)
+            if job is None:
+                continue
+            job = salt.utils.jid.format_jid_instance_ext(jid, job)
+            if filter_find_job and job['Function'] == 'saltutil.find_job':
+                continue
+            ret.insert(0, job)
+        return ret
+
     keys = []
     ret = []
     for jid, job, _, _ in _walk_through(_job_dir()):
@@ -412,6 +582,11 @@ def clean_old_jobs():
     Clean out the old jobs from the job cache
     '''
     if __opts__['keep_jobs'] != 0:
+        store = _segments()
+        if store is not None:
+            store.clean(__opts__['keep_jobs'])
+            return
+
         jid_root = _job_dir()
 
         if not os.path.exists(jid_root):
@@ -469,6 +644,11 @@ def update_endtime(jid, time):
 
     Endtime is stored as a plain text string
     '''
+    store = _segments()
+    if store is not None:
+        store.append(salt.utils.job_segments.ENDTIME, jid, time)
+        return
+
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
     try:
         if not os.path.exists(jid_dir):
@@ -485,6 +665,11 @@ def get_endtime(jid):
 
     Returns False if no endtime is present
     '''
+    store = _segments()
+    if store is not None:
+        endtime = store.last(jid, salt.utils.job_segments.ENDTIME)
+        return endtime if endtime is not None else False
+
     jid_dir = salt.utils.jid.jid_dir(jid, _job_dir(), __opts__['hash_type'])
     etpath = os.path.join(jid_dir, ENDTIME)
     if not os.path.exists(etpath):
@@ -19,7 +19,10 @@ import sys
 import copy
 import site
 import fnmatch
+import hashlib
 import logging
+import multiprocessing
+import select
 import datetime
 import traceback
 import re
@@ -32,15 +35,18 @@ import salt.minion
 import salt.pillar
 import salt.fileclient
 import salt.utils.args
+import salt.utils.atomicfile
 import salt.utils.crypt
 import salt.utils.data
 import salt.utils.decorators.state
 import salt.utils.dictupdate
 import salt.utils.event
 import salt.utils.files
+import salt.utils.json
 import salt.utils.immutabletypes as immutabletypes
 import salt.utils.platform
 import salt.utils.process
+import salt.utils.stringutils
 import salt.utils.url
 import salt.syspaths as syspaths
 from salt.serializers.msgpack import serialize as msgpack_serialize, deserialize as msgpack_deserialize
@@ -49,6 +55,7 @@ from salt.exceptions import (
     SaltRenderError,
     SaltReqTimeoutError
 )
+from salt.serializers import DeserializationError, SerializationError
 from salt.utils.odict import OrderedDict, DefaultOrderedDict
 # Explicit late import to avoid circular import. DO NOT MOVE THIS.
 import salt.utils.yamlloader as yamlloader
@@ -255,6 +262,25 @@ def find_name(name, state, high):
     return ext_id
 
 
+def find_names(high):
+    '''
+    Scan the high data once and return a dict mapping each ``name`` argument
+    to the first ``{state: id}`` which declares it
+    '''
+    ret = {}
+    for nid, item in six.iteritems(high):
+        if not isinstance(item, dict):
+            continue
+        for state, run in six.iteritems(item):
+            if state.startswith('__') or not isinstance(run, list):
+                continue
+            for arg in run:
+                if isinstance(arg, dict) and 'name' in arg:
+                    if ishashable(arg['name']) and arg['name'] not in ret:
+                        ret[arg['name']] = {state: nid}
+    return ret
+
+
 def find_sls_ids(sls, high):
     '''
     Scan for all ids in the given sls and return them in a dict; {name: state}
@@ -279,6 +305,66 @@ def find_sls_ids(sls, high):
     return ret
 
 
+def _has_glob(pattern):
+    '''
+    Return True if the passed pattern contains fnmatch wildcard characters
+    '''
+    return any(char in pattern for char in '*?[')
+
+
+def build_chunk_index(chunks):
+    '''
+    Build a lookup table for the passed low chunks so that requisites can be
+    resolved without scanning the full chunk list for every requisite of
+    every chunk.
+
+    The index maps the ``__sls__``, ``name`` and ``__id__`` of each chunk to
+    the positions of the matching chunks in the list. Keys are normalized
+    with ``os.path.normcase`` to keep the same semantics as ``fnmatch``.
+    '''
+    index = {'sls': {}, 'name': {}, 'id': {}}
+    for pos, chunk in enumerate(chunks):
+        for field, key in (('sls', '__sls__'), ('name', 'name'), ('id', '__id__')):
+            val = chunk.get(key)
+            if not isinstance(val, six.string_types):
+                continue
+            index[field].setdefault(os.path.normcase(val), []).append(pos)
+    return index
+
+
+def _chunk_index_positions(table, pattern):
+    '''
+    Return the set of chunk positions in the index table matching pattern
+    '''
+    if not _has_glob(pattern):
+        return set(table.get(os.path.normcase(pattern), ()))
+    ret = set()
+    for key, positions in six.iteritems(table):
+        if fnmatch.fnmatch(key, pattern):
+            ret.update(positions)
+    return ret
+
+
+def find_requisite_chunks(req_key, req_val, chunks, index=None):
+    '''
+    Return the chunks, in execution order, which match the requisite
+    ``{req_key: req_val}``. ``index`` is the result of ``build_chunk_index``
+    for ``chunks``, and will be generated if it is not passed.
+    '''
+    if index is None:
+        index = build_chunk_index(chunks)
+    if req_key == 'sls':
+        # Allow requisite tracking of entire sls files
+        positions = _chunk_index_positions(index['sls'], req_val)
+    else:
+        positions = _chunk_index_positions(index['name'], req_val)
+        positions.update(_chunk_index_positions(index['id'], req_val))
+        if req_key != 'id':
+            positions = [pos for pos in positions
+                         if chunks[pos]['state'] == req_key]
+    return [chunks[pos] for pos in sorted(positions)]
+
+
 def format_log(ret):
     '''
     Format the state into a log message
@@ -750,6 +836,9 @@ class State(object):
         self.mod_init = set()
         self.pre = {}
         self.__run_num = 0
+        self._chunk_index = None
+        self._chunk_index_src = None
+        self._pending_procs = 0
         self.jid = jid
         self.instance_id = six.text_type(id(self))
         self.inject_globals = {}
@@ -1521,6 +1610,8 @@ class State(object):
         req_in_all = req_in.union({'require', 'watch', 'onfail', 'onfail_stop', 'onchanges'})
         extend = {}
         errors = []
+        # Lazily built map of name arguments to their state and ID
+        names = None
         for id_, body in six.iteritems(high):
             if not isinstance(body, dict):
                 continue
@@ -1594,18 +1685,11 @@ class State(object):
                                                      if not x.startswith('__')]
                                         ind = {_ind_high[0]: ind}
                                     else:
-                                        found = False
-                                        for _id in iter(high):
-                                            for state in [state for state
-                                                          in iter(high[_id])
-                                                          if not state.startswith('__')]:
-                                                for j in iter(high[_id][state]):
-                                                    if isinstance(j, dict) and 'name' in j:
-                                                        if j['name'] == ind:
-                                                            ind = {state: _id}
-                                                            found = True
-                                        if not found:
+                                        if names is None:
+                                            names = find_names(high)
+                                        if ind not in names:
                                             continue
+                                        ind = names[ind]
                                 if len(ind) < 1:
                                     continue
                                 pstate = next(iter(ind))
@@ -1791,6 +1875,7 @@ class State(object):
                 target=self._call_parallel_target,
                 args=(name, cdata, low))
         proc.start()
+        self._pending_procs += 1
         ret = {'name': name,
                 'result': None,
                 'changes': {},
@@ -2141,20 +2226,25 @@ class State(object):
                         chunks.remove(low)
                         break
         running = {}
-        for low in chunks:
-            if '__FAILHARD__' in running:
-                running.pop('__FAILHARD__')
+        if self._use_state_workers():
+            running, halted = self.call_chunks_workers(chunks)
+            if halted:
                 return running
-            tag = _gen_tag(low)
-            if tag not in running:
-                # Check if this low chunk is paused
-                action = self.check_pause(low)
-                if action == 'kill':
-                    break
-                running = self.call_chunk(low, running, chunks)
-                if self.check_failhard(low, running):
+        else:
+            for low in chunks:
+                if '__FAILHARD__' in running:
+                    running.pop('__FAILHARD__')
                     return running
-            self.active = set()
+                tag = _gen_tag(low)
+                if tag not in running:
+                    # Check if this low chunk is paused
+                    action = self.check_pause(low)
+                    if action == 'kill':
+                        break
+                    running = self.call_chunk(low, running, chunks)
+                    if self.check_failhard(low, running):
+                        return running
+                self.active = set()
         while True:
             if self.reconcile_procs(running):
                 break
@@ -2162,6 +2252,346 @@ class State(object):
         ret = dict(list(disabled.items()) + list(running.items()))
         return ret
 
+    def _use_state_workers(self):
+        '''
+        Return True if the chunks should be executed by the state_workers
+        executor rather than one after another
+        '''
+        try:
+            workers = int(self.opts.get('state_workers') or 0)
+        except (TypeError, ValueError):
+            log.error('Invalid value for state_workers: %s',
+                      self.opts.get('state_workers'))
+            return False
+        if workers < 2:
+            return False
+        if salt.utils.platform.is_windows():
+            log.warning('The state_workers option is not supported on '
+                        'Windows, executing states sequentially')
+            return False
+        return True
+
+    def _chunk_tier(self, low):
+        '''
+        Return the ordering tier of a chunk. Chunks in different tiers are
+        never run at the same time, orders assigned by state_auto_order all
+        share one tier so that only requisites constrain them.
+        '''
+        order = low.get('order')
+        if self.opts.get('state_auto_order', True) \
+                and isinstance(order, (int, float)) \
+                and 10000 <= order < 1000000:
+            return 'auto'
+        return order
+
+    def _chunk_worker_safe(self, low):
+        '''
+        Return True if the chunk can be executed in a state worker. Chunks
+        which take part in prereqs, aggregation or manage their own parallel
+        process are always run in the main process.
+        '''
+        for key in ('prereq', 'prerequired', '__prereq__', 'parallel', 'aggregate'):
+            if low.get(key):
+                return False
+        agg_opt = self.opts.get('state_aggregate', False)
+        if agg_opt is True or (isinstance(agg_opt, list) and low['state'] in agg_opt):
+            return False
+        return True
+
+    def _chunk_deps(self, low, chunks):
+        '''
+        Return the set of tags the passed chunk depends on, or None if the
+        requisites cannot be resolved and the chunk needs to go through
+        call_chunk to generate the proper error
+        '''
+        deps = set()
+        for r_state in ('require', 'require_any', 'watch', 'watch_any',
+                        'onfail', 'onfail_any', 'onchanges', 'onchanges_any'):
+            for req in low.get(r_state) or []:
+                if isinstance(req, six.string_types):
+                    req = {'id': req}
+                if not isinstance(req, dict) or not req:
+                    return None
+                req = trim_req(req)
+                req_key = next(iter(req))
+                req_val = req[req_key]
+                if not isinstance(req_val, six.string_types):
+                    return None
+                found = self._find_requisite_chunks(req_key, req_val, chunks)
+                if not found:
+                    return None
+                deps.update(_gen_tag(chunk) for chunk in found)
+        deps.discard(_gen_tag(low))
+        return deps
+
+    def _call_chunk_worker(self, low, running, chunks):
+        '''
+        Run a single chunk inside of a state worker and return the new
+        entries of the running dict
+        '''
+        before = set(running)
+        try:
+            running = self.call_chunk(low, running, chunks)
+            return dict((key, val) for key, val in six.iteritems(running)
+                        if key not in before)
+        except Exception:
+            return {_gen_tag(low): {
+                'result': False,
+                'name': low.get('name', low.get('__id__')),
+                'changes': {},
+                'comment': 'An exception occurred in this state: {0}'.format(
+                    traceback.format_exc()),
+                '__sls__': low.get('__sls__')}}
+
+    def _state_worker(self, conn, chunks):
+        '''
+        Run the chunks sent over conn by the main process and send the new
+        entries of the running dict back, until the main process stops the
+        worker or exits
+        '''
+        salt.utils.process.appendproctitle('StateWorker')
+        # Events, module refreshes and parallel states are handled by the
+        # main process once the results have been collected
+        self.event = lambda *args, **kwargs: None
+        self.check_refresh = lambda *args, **kwargs: None
+        self._pending_procs = 0
+        ppid = os.getppid()
+        while True:
+            try:
+                # The other state workers may hold the main process end of
+                # the pipe, exit when the main process is gone
+                if not conn.poll(5):
+                    if os.getppid() != ppid:
+                        break
+                    continue
+                job = conn.recv()
+            except (EOFError, IOError, OSError):
+                break
+            if job is None:
+                break
+            low, running, mod_init = job
+            # Do not run the mod_init functions the main process already ran
+            self.mod_init.update(mod_init)
+            self.active = set()
+            ret = self._call_chunk_worker(low, running, chunks)
+            try:
+                conn.send(ret)
+            except (IOError, OSError):
+                break
+        conn.close()
+
+    def _spawn_state_worker(self, chunks):
+        '''
+        Fork a state worker and return its entry in the pool
+        '''
+        parent_conn, child_conn = multiprocessing.Pipe()
+        proc = salt.utils.process.MultiprocessingProcess(
+            target=self._state_worker,
+            args=(child_conn, chunks))
+        proc.start()
+        # Only the worker holds the other end of the pipe now, reading from
+        # parent_conn fails when it exits
+        child_conn.close()
+        return {'process': proc, 'conn': parent_conn, 'low': None, 'stale': False}
+
+    def _stop_state_worker(self, worker):
+        '''
+        Stop an idle state worker
+        '''
+        try:
+            worker['conn'].send(None)
+        except (IOError, OSError):
+            pass
+        worker['conn'].close()
+        worker['process'].join(1)
+
+    def _collect_chunk_worker(self, worker, running, chunks):
+        '''
+        Merge the results of the chunk a state worker is done with into the
+        running dict. Returns False if the worker exited instead.
+        '''
+        low = worker['low']
+        worker['low'] = None
+        tag = _gen_tag(low)
+        alive = True
+        try:
+            rets = worker['conn'].recv()
+        except (EOFError, IOError, OSError):
+            alive = False
+            worker['conn'].close()
+            worker['process'].join(1)
+            start_time, duration = _calculate_fake_duration()
+            rets = {tag: {'result': False,
+                          'name': low.get('name', low.get('__id__')),
+                          'changes': {},
+                          'comment': 'State worker failed to return, '
+                                     'exit code: {0}'.format(worker['process'].exitcode),
+                          'duration': duration,
+                          'start_time': start_time,
+                          '__sls__': low.get('__sls__')}}
+        for ret_tag, ret in six.iteritems(rets):
+            if ret_tag in running:
+                continue
+            ret['__run_num__'] = self.__run_num
+            self.__run_num += 1
+            running[ret_tag] = ret
+        if tag in running:
+            self.check_refresh(low, running[tag])
+            self.event(running[tag], len(chunks), fire_event=low.get('fire_event'))
+        return alive
+
+    def call_chunks_workers(self, chunks):
+        '''
+        Execute the chunks on a bounded pool of state worker processes. A
+        chunk is started as soon as all of the chunks it depends on have
+        returned, so independent chunks run at the same time. Returns the
+        running dict and whether execution was halted by failhard.
+        '''
+        workers = int(self.opts['state_workers'])
+        pool = []
+        try:
+            return self._call_chunks_pool(chunks, workers, pool)
+        finally:
+            for worker in pool:
+                self._stop_state_worker(worker)
+
+    def _call_chunks_pool(self, chunks, workers, pool):
+        '''
+        Run the chunks for call_chunks_workers, forking up to workers state
+        workers into pool as they are needed
+        '''
+        running = {}
+        deps = {}
+        for low in chunks:
+            if self._chunk_worker_safe(low):
+                deps[_gen_tag(low)] = self._chunk_deps(low, chunks)
+            else:
+                deps[_gen_tag(low)] = None
+        pending = list(chunks)
+        halted = False
+        while True:
+            busy = [worker for worker in pool if worker['low'] is not None]
+            if not pending and not busy:
+                break
+            # Collect the finished chunks
+            for worker in busy:
+                if not worker['conn'].poll():
+                    continue
+                low = worker['low']
+                functions = self.functions
+                if not self._collect_chunk_worker(worker, running, chunks):
+                    pool.remove(worker)
+                if self.functions is not functions:
+                    # The modules were refreshed, the workers forked before
+                    # have to be replaced
+                    for other in pool:
+                        other['stale'] = True
+                if self.check_failhard(low, running):
+                    halted = True
+            for worker in list(pool):
+                if worker['stale'] and worker['low'] is None:
+                    pool.remove(worker)
+                    self._stop_state_worker(worker)
+            inflight = dict((_gen_tag(worker['low']), worker)
+                            for worker in pool if worker['low'] is not None)
+            if halted:
+                if not inflight:
+                    break
+                self._wait_state_workers(inflight)
+                continue
+            pending = [low for low in pending if _gen_tag(low) not in running]
+            if not pending:
+                if inflight:
+                    self._wait_state_workers(inflight)
+                continue
+            self.reconcile_procs(running)
+            # Only chunks in the first ordering tier which is not done yet
+            # may be started
+            tier = self._chunk_tier(pending[0])
+            started = False
+            for low in pending:
+                if len(inflight) >= workers:
+                    break
+                if self._chunk_tier(low) != tier:
+                    break
+                tag = _gen_tag(low)
+                if tag in inflight or deps[tag] is None:
+                    continue
+                if any(dep not in running or running[dep].get('proc')
+                       for dep in deps[tag]):
+                    continue
+                # Check if this low chunk is paused
+                if self.check_pause(low) == 'kill':
+                    pending = []
+                    break
+                self._mod_init(low)
+                worker = self._dispatch_chunk_worker(
+                    low,
+                    dict((dep, running[dep]) for dep in deps[tag]),
+                    chunks,
+                    pool)
+                inflight[tag] = worker
+                started = True
+            if started or not pending:
+                continue
+            if inflight:
+                self._wait_state_workers(inflight)
+                continue
+            # Nothing can be started and nothing is running, the first
+            # chunk is either not safe to run in a worker or depends on
+            # chunks which are not available yet, so run it in the main
+            # process where call_chunk resolves its requisites
+            low = pending.pop(0)
+            if self.check_pause(low) == 'kill':
+                break
+            functions = self.functions
+            running = self.call_chunk(low, running, chunks)
+            self.active = set()
+            if self.functions is not functions:
+                for worker in pool:
+                    worker['stale'] = True
+            if '__FAILHARD__' in running:
+                running.pop('__FAILHARD__')
+                halted = True
+            elif self.check_failhard(low, running):
+                halted = True
+            if halted:
+                break
+        return running, halted
+
+    def _dispatch_chunk_worker(self, low, running, chunks, pool):
+        '''
+        Send a chunk and the entries of the running dict it depends on to an
+        idle state worker, forking one if none is idle. Returns the worker.
+        '''
+        for worker in list(pool):
+            if worker['low'] is not None or worker['stale']:
+                continue
+            try:
+                worker['conn'].send((low, running, self.mod_init))
+            except (IOError, OSError):
+                # The worker is gone
+                pool.remove(worker)
+                worker['conn'].close()
+                worker['process'].join(1)
+                continue
+            worker['low'] = low
+            return worker
+        # Less than workers chunks are in flight and the idle stale workers
+        # have been stopped, so the pool has room for another worker
+        worker = self._spawn_state_worker(chunks)
+        pool.append(worker)
+        worker['conn'].send((low, running, self.mod_init))
+        worker['low'] = low
+        return worker
+
+    def _wait_state_workers(self, inflight):
+        '''
+        Wait for one of the busy state workers to return, or for a short while
+        so that the parallel states can be reconciled
+        '''
+        select.select([worker['conn'] for worker in six.itervalues(inflight)], [], [], 0.01)
+
     def check_failhard(self, low, running):
         '''
         Check if the low data chunk should send a failhard signal
@@ -2224,6 +2654,9 @@ class State(object):
         '''
         Check the running dict for processes and resolve them
         '''
+        if not self._pending_procs:
+            # No parallel states are in flight, skip scanning the running dict
+            return True
         retset = set()
         for tag in running:
             proc = running[tag].get('proc')
@@ -2245,10 +2678,23 @@ class State(object):
                                'changes': {}}
                     running[tag].update(ret)
                     running[tag].pop('proc')
+                    self._pending_procs -= 1
                 else:
                     retset.add(False)
         return False not in retset
 
+    def _find_requisite_chunks(self, req_key, req_val, chunks):
+        '''
+        Return the chunks matching the given requisite, using an index of the
+        chunk list which is only rebuilt when a different list is passed in
+        '''
+        if self._chunk_index_src is not chunks \
+                or self._chunk_index[0] != len(chunks):
+            self._chunk_index = (len(chunks), build_chunk_index(chunks))
+            self._chunk_index_src = chunks
+        return find_requisite_chunks(
+            req_key, req_val, chunks, index=self._chunk_index[1])
+
     def check_requisite(self, low, running, chunks, pre=False):
         '''
         Look into the running data to check the status of all requisite
@@ -2309,40 +2755,18 @@ class State(object):
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
-                    for chunk in chunks:
-                        req_key = next(iter(req))
-                        req_val = req[req_key]
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                found = True
-                                reqs[r_state].append(chunk)
-                            continue
-                        try:
-                            if isinstance(req_val, six.string_types):
-                                if (fnmatch.fnmatch(chunk['name'], req_val) or
-                                    fnmatch.fnmatch(chunk['__id__'], req_val)):
-                                    if req_key == 'id' or chunk['state'] == req_key:
-                                        found = True
-                                        reqs[r_state].append(chunk)
-                            else:
-                                raise KeyError
-                        except KeyError as exc:
-                            raise SaltRenderError(
-                                'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
-                        except TypeError:
-                            # On Python 2, the above req_val, being an OrderedDict, will raise a KeyError,
-                            # however on Python 3 it will raise a TypeError
-                            # This was found when running tests.unit.test_state.StateCompilerTestCase.test_render_error_on_invalid_requisite
-                            raise SaltRenderError(
-                                'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
+                    req_key = next(iter(req))
+                    req_val = req[req_key]
+                    if req_val is None or not chunks:
+                        return 'unmet', ()
+                    if req_key != 'sls' and not isinstance(req_val, six.string_types):
+                        raise SaltRenderError(
+                            'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
+                                req_key, chunks[0]['name']))
+                    found = self._find_requisite_chunks(req_key, req_val, chunks)
                     if not found:
                         return 'unmet', ()
+                    reqs[r_state].extend(found)
         fun_stats = set()
         for r_state, chunks in six.iteritems(reqs):
             req_stats = set()
@@ -2498,26 +2922,14 @@ class State(object):
                     found = False
                     req_key = next(iter(req))
                     req_val = req[req_key]
-                    for chunk in chunks:
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                reqs.append(chunk)
-                                found = True
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                elif requisite == 'prerequired':
-                                    chunk['__prerequired__'] = True
-                                reqs.append(chunk)
-                                found = True
+                    if req_val is not None:
+                        for chunk in self._find_requisite_chunks(req_key, req_val, chunks):
+                            if requisite == 'prereq':
+                                chunk['__prereq__'] = True
+                            elif requisite == 'prerequired' and req_key != 'sls':
+                                chunk['__prerequired__'] = True
+                            reqs.append(chunk)
+                            found = True
                     if not found:
                         lost[requisite].append(req)
             if lost['require'] or lost['watch'] or lost['prereq'] \
@@ -2923,6 +3335,168 @@ class State(object):
         return self.call_high(high)
 
 
+class StateRenderCache(object):
+    '''
+    Persistent cache of the rendered data of SLS files.
+
+    An entry is keyed on the hash of the cached SLS file, the renderer
+    configuration and a digest of the pillar and grains, so a cached SLS is
+    only rendered again when one of them changes. SLS files which use
+    Python based renderers or load other templates or files, including with
+    the ``import_yaml``, ``import_json`` and ``import_text`` tags, are never
+    cached since their output cannot be derived from this key.
+    '''
+    SKIP_RENDERERS = frozenset(['py', 'pydsl', 'pyobjects', 'stateconf'])
+    SKIP_RE = re.compile(
+        r'{%[-+]?\s*(?:import(?:_yaml|_json|_text)?|include|from|extends)\s')
+    # Grains which change every time the minion starts
+    VOLATILE_GRAINS = frozenset(['pid'])
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.cache_dir = os.path.join(opts['cachedir'], 'state_render_cache')
+        self.stats = {'hits': 0, 'misses': 0, 'skipped': 0}
+        self._context = None
+
+    def _context_digest(self, pillar):
+        '''
+        Return the digest of the data which is passed to the renderers,
+        computed once for the life of the cache object
+        '''
+        if self._context is None:
+            try:
+                data = salt.utils.json.dumps(
+                    {'grains': dict(
+                        (key, val)
+                        for key, val in six.iteritems(self.opts.get('grains', {}))
+                        if key not in self.VOLATILE_GRAINS),
+                     'pillar': pillar,
+                     'renderer': self.opts['renderer'],
+                     'renderer_blacklist': self.opts['renderer_blacklist'],
+                     'renderer_whitelist': self.opts['renderer_whitelist'],
+                     'id': self.opts.get('id')},
+                    sort_keys=True,
+                    default=repr)
+            except (TypeError, ValueError) as exc:
+                log.debug('Unable to digest pillar and grains, the state '
+                          'render cache is disabled for this run: %s', exc)
+                self._context = ''
+            else:
+                self._context = hashlib.sha256(
+                    salt.utils.stringutils.to_bytes(data)).hexdigest()
+        return self._context
+
+    def key(self, fn_, saltenv, sls, pillar):
+        '''
+        Return the cache key for the given SLS file, or None if the file
+        cannot be cached
+        '''
+        context = self._context_digest(pillar)
+        if not context:
+            return None
+        try:
+            with salt.utils.files.fopen(fn_, 'rb') as fp_:
+                data = fp_.read()
+        except (OSError, IOError):
+            return None
+        text = salt.utils.stringutils.to_unicode(data, errors='replace')
+        if text.startswith('#!'):
+            pipe = text.splitlines()[0][2:]
+        else:
+            pipe = self.opts['renderer']
+        renderers = set(rend.strip().split(' ')[0] for rend in pipe.split('|'))
+        if renderers & self.SKIP_RENDERERS or self.SKIP_RE.search(text):
+            return None
+        return hashlib.sha256(
+            salt.utils.stringutils.to_bytes(
+                '\0'.join([context, saltenv, sls, fn_]))
+            + hashlib.sha256(data).digest()).hexdigest()
+
+    def _path(self, saltenv, sls):
+        name = hashlib.sha256(
+            salt.utils.stringutils.to_bytes('{0}:{1}'.format(saltenv, sls))
+        ).hexdigest()
+        return os.path.join(self.cache_dir, '{0}.p'.format(name))
+
+    def get(self, saltenv, sls, key):
+        '''
+        Return the cached render of the SLS, or None on a cache miss
+        '''
+        if key is None:
+            self.stats['skipped'] += 1
+            return None
+        try:
+            with salt.utils.files.fopen(self._path(saltenv, sls), 'rb') as fp_:
+                data = msgpack_deserialize(fp_.read(),
+                                           object_pairs_hook=OrderedDict)
+        except (OSError, IOError, DeserializationError):
+            data = {}
+        if isinstance(data, dict) and data.get('key') == key:
+            self.stats['hits'] += 1
+            log.debug('Using cached render of SLS %s:%s', saltenv, sls)
+            return data['state']
+        self.stats['misses'] += 1
+        return None
+
+    def store(self, saltenv, sls, key, state):
+        '''
+        Store the rendered data of the SLS in the cache
+        '''
+        if key is None or not isinstance(state, dict):
+            return
+        try:
+            data = msgpack_serialize({'key': key, 'state': state},
+                                     use_bin_type=True)
+        except SerializationError as exc:
+            log.debug('Unable to cache the render of SLS %s:%s: %s',
+                      saltenv, sls, exc)
+            return
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with salt.utils.atomicfile.atomic_open(
+                    self._path(saltenv, sls), 'wb') as fp_:
+                fp_.write(data)
+        except (OSError, IOError) as exc:
+            log.error('Unable to write the state render cache: %s', exc)
+
+    def flush_stats(self):
+        '''
+        Add the hit and miss counts of this run to the persisted totals
+        '''
+        if not any(six.itervalues(self.stats)):
+            return
+        totals = render_cache_stats(self.opts)
+        for key in self.stats:
+            totals[key] = totals.get(key, 0) + self.stats[key]
+            self.stats[key] = 0
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with salt.utils.atomicfile.atomic_open(
+                    os.path.join(self.cache_dir, 'stats'), 'wb') as fp_:
+                fp_.write(msgpack_serialize(totals))
+        except (OSError, IOError) as exc:
+            log.error('Unable to write the state render cache stats: %s', exc)
+
+
+def render_cache_stats(opts):
+    '''
+    Return the persisted hit and miss counts of the state render cache
+    '''
+    path = os.path.join(opts['cachedir'], 'state_render_cache', 'stats')
+    try:
+        with salt.utils.files.fopen(path, 'rb') as fp_:
+            stats = msgpack_deserialize(fp_.read())
+    except (OSError, IOError, DeserializationError):
+        stats = {}
+    if not isinstance(stats, dict):
+        stats = {}
+    for key in ('hits', 'misses', 'skipped'):
+        stats.setdefault(key, 0)
+    return stats
+
+
 class BaseHighState(object):
     '''
     The BaseHighState is an abstract base class that is the foundation of
@@ -2937,6 +3511,10 @@ class BaseHighState(object):
         self.avail = self.__gather_avail()
         self.serial = salt.payload.Serial(self.opts)
         self.building_highstate = OrderedDict()
+        if self.opts.get('state_render_cache', False):
+            self.render_cache = StateRenderCache(self.opts)
+        else:
+            self.render_cache = None
 
     def __gather_avail(self):
         '''
@@ -3471,15 +4049,23 @@ class BaseHighState(object):
             )
         else:
             try:
-                state = compile_template(fn_,
-                                         self.state.rend,
-                                         self.state.opts['renderer'],
-                                         self.state.opts['renderer_blacklist'],
-                                         self.state.opts['renderer_whitelist'],
-                                         saltenv,
-                                         sls,
-                                         rendered_sls=mods
-                                         )
+                cache_key = None
+                if self.render_cache is not None:
+                    cache_key = self.render_cache.key(
+                        fn_, saltenv, sls, self.state.opts.get('pillar', {}))
+                    state = self.render_cache.get(saltenv, sls, cache_key)
+                if state is None:
+                    state = compile_template(fn_,
+                                             self.state.rend,
+                                             self.state.opts['renderer'],
+                                             self.state.opts['renderer_blacklist'],
+                                             self.state.opts['renderer_whitelist'],
+                                             saltenv,
+                                             sls,
+                                             rendered_sls=mods
+                                             )
+                    if self.render_cache is not None:
+                        self.render_cache.store(saltenv, sls, cache_key, state)
             except SaltRenderError as exc:
                 msg = 'Rendering SLS \'{0}:{1}\' failed: {2}'.format(
                     saltenv, sls, exc
@@ -3816,6 +4402,8 @@ class BaseHighState(object):
                     all_errors.extend(errors)
 
         self.clean_duplicate_extends(highstate)
+        if self.render_cache is not None:
+            self.render_cache.flush_stats()
         return highstate, all_errors
 
     def clean_duplicate_extends(self, highstate):
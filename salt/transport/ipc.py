@@ -5,7 +5,9 @@ IPC transport classes
 
 # Import Python libs
 from __future__ import absolute_import, print_function, unicode_literals
+import fnmatch
 import logging
+import re
 import socket
 import weakref
 import time
@@ -82,6 +84,23 @@ class FutureWithTimeout(tornado.concurrent.Future):
             self.set_exception(exc)
 
 
+def compile_tag_filter(tags):
+    '''
+    Return a compiled regex matching the tags which start with one of the
+    prefixes or match one of the globs in tags
+    '''
+    patterns = []
+    for tag in tags:
+        if any(char in tag for char in '*?['):
+            patterns.append(fnmatch.translate(tag))
+        else:
+            patterns.append(re.escape(tag))
+    if not patterns:
+        # Match nothing
+        patterns.append('(?!)')
+    return re.compile('|'.join(patterns))
+
+
 class IPCServer(object):
     '''
     A Tornado IPC server very similar to Tornado's TCPServer class
@@ -491,6 +510,8 @@ class IPCMessagePublisher(object):
         self.io_loop = io_loop or IOLoop.current()
         self._closing = False
         self.streams = set()
+        # The tag filters the subscribers sent, by stream
+        self.filters = {}
 
     def start(self):
         '''
@@ -530,9 +551,12 @@ class IPCMessagePublisher(object):
                 stream.close()
             self.streams.discard(stream)
 
-    def publish(self, msg):
+    def publish(self, msg, tag=None):
         '''
         Send message to all connected sockets
+
+        If the tag of the message is passed, the subscribers which sent a tag
+        filter only get the message if its tag matches it.
         '''
         if not len(self.streams):
             return
@@ -540,8 +564,41 @@ class IPCMessagePublisher(object):
         pack = salt.transport.frame.frame_msg_ipc(msg, raw_body=True)
 
         for stream in self.streams:
+            if tag is not None:
+                tag_filter = self.filters.get(stream)
+                if tag_filter is not None and not tag_filter.match(tag):
+                    continue
             self.io_loop.spawn_callback(self._write, stream, pack)
 
+    @tornado.gen.coroutine
+    def _read_filters(self, stream):
+        '''
+        Read the tag filters a subscriber sends, a message with a list of
+        tags replaces its filter, an empty message removes it
+        '''
+        if six.PY2:
+            encoding = None
+        else:
+            encoding = 'utf-8'
+        unpacker = msgpack.Unpacker(encoding=encoding)
+        while not stream.closed():
+            try:
+                wire_bytes = yield stream.read_bytes(4096, partial=True)
+                unpacker.feed(wire_bytes)
+                for framed_msg in unpacker:
+                    tags = framed_msg['body'].get('tags')
+                    if tags is None:
+                        self.filters.pop(stream, None)
+                    else:
+                        self.filters[stream] = compile_tag_filter(tags)
+            except tornado.iostream.StreamClosedError:
+                break
+            except Exception as exc:
+                log.error('Exception occurred while reading the tag filter '
+                          'of a subscriber: %s', exc)
+                self.filters.pop(stream, None)
+                break
+
     def handle_connection(self, connection, address):
         log.trace('IPCServer: Handling connection to address: %s', address)
         try:
@@ -558,8 +615,10 @@ class IPCMessagePublisher(object):
 
             def discard_after_closed():
                 self.streams.discard(stream)
+                self.filters.pop(stream, None)
 
             stream.set_close_callback(discard_after_closed)
+            self.io_loop.spawn_callback(self._read_filters, stream)
         except Exception as exc:
             log.error('IPC streaming error: %s', exc)
 
@@ -575,6 +634,7 @@ class IPCMessagePublisher(object):
         for stream in self.streams:
             stream.close()
         self.streams.clear()
+        self.filters.clear()
         if hasattr(self.sock, 'close'):
             self.sock.close()
 
@@ -623,6 +683,51 @@ class IPCMessageSubscriber(IPCClient):
         self._sync_ioloop_running = False
         self.saved_data = []
         self._sync_read_in_progress = Semaphore()
+        # The tag filters of the users of the subscriber, and the stream and
+        # filter last sent to the publisher
+        self._filters = weakref.WeakKeyDictionary()
+        self._filter_sent = (None, None)
+
+    def set_filter(self, owner, tags=None):
+        '''
+        Ask the publisher to only send the messages whose tag starts with one
+        of the prefixes or matches one of the globs in tags. The subscriber is
+        shared by the users of the same socket and IO Loop, so each of them
+        passes itself as owner and gets the messages matching any of the
+        filters. A tags of None means all messages.
+        '''
+        self._filters[owner] = tags
+        if self.connected():
+            self.io_loop.spawn_callback(self._send_filter)
+
+    def _get_filter(self):
+        tags = set()
+        for owner_tags in list(self._filters.values()):
+            if owner_tags is None:
+                return None
+            tags.update(owner_tags)
+        return sorted(tags) if self._filters else None
+
+    @tornado.gen.coroutine
+    def _send_filter(self):
+        '''
+        Send the tag filter to the publisher if it changed, or if it is not
+        the publisher this stream is connected to which got it
+        '''
+        if not self.connected():
+            return
+        tags = self._get_filter()
+        sent_stream, sent_tags = self._filter_sent
+        if sent_stream is not self.stream:
+            sent_tags = None
+        if tags == sent_tags:
+            return
+        self._filter_sent = (self.stream, tags)
+        pack = salt.transport.frame.frame_msg_ipc({'tags': tags})
+        try:
+            yield self.stream.write(pack)
+        except tornado.iostream.StreamClosedError:
+            pass
 
     @tornado.gen.coroutine
     def _read_sync(self, timeout):
@@ -631,6 +736,7 @@ class IPCMessageSubscriber(IPCClient):
         ret = None
 
         try:
+            yield self._send_filter()
             while True:
                 if self._read_stream_future is None:
                     self._read_stream_future = self.stream.read_bytes(4096, partial=True)
@@ -707,6 +813,7 @@ class IPCMessageSubscriber(IPCClient):
 
     @tornado.gen.coroutine
     def _read_async(self, callback):
+        yield self._send_filter()
         while not self.stream.closed():
             try:
                 self._read_stream_future = self.stream.read_bytes(4096, partial=True)
@@ -9,6 +9,7 @@ import os
 import hashlib
 import shutil
 import binascii
+import time
 
 # Import Salt Libs
 import salt.crypt
@@ -20,6 +21,7 @@ import salt.utils.files
 import salt.utils.minions
 import salt.utils.stringutils
 import salt.utils.verify
+import salt.utils.workerpools
 from salt.utils.cache import CacheCli
 
 # Import Third Party Libs
@@ -39,6 +41,65 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 
+class AuthAdmission(object):
+    '''
+    Token bucket limiting the rate of the sign-ins a master worker handles
+
+    The minions signing in beyond that rate are told when to try again, each
+    of them at a different time, so that they come back at the rate the
+    worker handles instead of all at once.
+    '''
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.stamp = time.time()
+        # The time up to which retries have been scheduled
+        self.next_free = self.stamp
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self):
+        '''
+        Return 0 if a sign-in can be handled now, or else the number of
+        seconds after which the minion has to try again
+        '''
+        if self.rate <= 0:
+            self.admitted += 1
+            return 0
+        now = time.time()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.admitted += 1
+            return 0
+        self.rejected += 1
+        self.next_free = max(self.next_free, now) + 1 / self.rate
+        return self.next_free - now
+
+    def queued(self):
+        '''
+        Return the number of minions which have been told to try again later
+        and are not due yet
+        '''
+        if self.rate <= 0:
+            return 0
+        return int(max(0, self.next_free - time.time()) * self.rate)
+
+    def stats(self):
+        '''
+        Return the counters of the sign-ins since the last call and reset them
+        '''
+        ret = {'admitted': self.admitted,
+               'rejected': self.rejected,
+               'queued': self.queued(),
+               'rate': self.rate}
+        self.admitted = self.rejected = 0
+        return ret
+
+
 # TODO: rename
 class AESPubClientMixin(object):
     def _verify_master_signature(self, payload):
@@ -106,26 +167,35 @@ class AESReqServerMixin(object):
             self.ckminions = salt.utils.minions.CkMinions(self.opts)
 
         self.master_key = salt.crypt.MasterKeys(self.opts)
+        self.key_cache = salt.crypt.MinionKeyCache(self.opts)
+        # Every worker handling sign-ins gets an even share of the rate
+        auth_workers = self.opts['worker_threads']
+        if getattr(self, 'supports_worker_pools', False):
+            pools = salt.utils.workerpools.get_pools(self.opts)
+            routes = salt.utils.workerpools.get_routes(pools)
+            auth_pool = routes.get('_auth', salt.utils.workerpools.DEFAULT_POOL)
+            auth_workers = pools[auth_pool]['worker_threads']
+        self.auth_admission = AuthAdmission(
+            float(self.opts.get('auth_rate_limit', 0)) / max(1, auth_workers))
+        self.auth_stat_clock = time.time()
 
     def _encrypt_private(self, ret, dictkey, target):
         '''
         The server equivalent of ReqChannel.crypted_transfer_decode_dictentry
         '''
         # encrypt with a specific AES key
-        pubfn = os.path.join(self.opts['pki_dir'],
-                             'minions',
-                             target)
         key = salt.crypt.Crypticle.generate_key_string()
         pcrypt = salt.crypt.Crypticle(
             self.opts,
             key)
+        pub = self.key_cache.get('minions', target)
+        if pub is None:
+            log.error('AES key not found')
+            return {'error': 'AES key not found'}
         try:
-            pub = salt.crypt.get_rsa_pub_key(pubfn)
+            pub = self.key_cache.rsa(pub)
         except (ValueError, IndexError, TypeError):
             return self.crypticle.dumps({})
-        except IOError:
-            log.error('AES key not found')
-            return {'error': 'AES key not found'}
 
         pret = {}
         if not six.PY2:
@@ -161,6 +231,21 @@ class AESReqServerMixin(object):
                 payload['load'] = self.crypticle.loads(payload['load'])
         return payload
 
+    def _post_auth_stats(self):
+        '''
+        Fire an event with the sign-in counters of this worker, every
+        master_stats_event_iter seconds when master_stats is enabled
+        '''
+        if not self.opts.get('master_stats'):
+            return
+        now = time.time()
+        if now - self.auth_stat_clock > self.opts['master_stats_event_iter']:
+            stats = self.auth_admission.stats()
+            stats['time'] = now - self.auth_stat_clock
+            stats['pid'] = os.getpid()
+            self.event.fire_event(stats, salt.utils.event.tagify('stats', 'auth'))
+            self.auth_stat_clock = now
+
     def _auth(self, load):
         '''
         Authenticate the client, use the sent public key to encrypt the AES key
@@ -181,6 +266,16 @@ class AESReqServerMixin(object):
             log.info('Authentication request from invalid id %s', load['id'])
             return {'enc': 'clear',
                     'load': {'ret': False}}
+
+        retry_after = self.auth_admission.admit()
+        self._post_auth_stats()
+        if retry_after:
+            log.debug('Too many authentication requests, %s has to retry '
+                      'in %.2f seconds', load['id'], retry_after)
+            # Older minions retry after their acceptance_wait_time
+            return {'enc': 'clear',
+                    'load': {'ret': 'busy',
+                             'retry_after': retry_after}}
         log.info('Authentication request from %s', load['id'])
 
         # 0 is default which should be 'unlimited'
@@ -230,11 +325,14 @@ class AESReqServerMixin(object):
         pubfn_denied = os.path.join(self.opts['pki_dir'],
                                     'minions_denied',
                                     load['id'])
+        # Keys are looked up in the cache of this worker, the files are only
+        # read again once they changed
+        key_cache = self.key_cache
         if self.opts['open_mode']:
             # open mode is turned on, nuts to checks and overwrite whatever
             # is there
             pass
-        elif os.path.isfile(pubfn_rejected):
+        elif key_cache.get('minions_rejected', load['id']) is not None:
             # The key has been rejected, don't place it in pending
             log.info('Public key rejected for %s. Key is present in '
                      'rejection key dir.', load['id'])
@@ -246,28 +344,27 @@ class AESReqServerMixin(object):
             return {'enc': 'clear',
                     'load': {'ret': False}}
 
-        elif os.path.isfile(pubfn):
+        elif key_cache.get('minions', load['id']) is not None:
             # The key has been accepted, check it
-            with salt.utils.files.fopen(pubfn, 'r') as pubfn_handle:
-                if pubfn_handle.read().strip() != load['pub'].strip():
-                    log.error(
-                        'Authentication attempt from %s failed, the public '
-                        'keys did not match. This may be an attempt to compromise '
-                        'the Salt cluster.', load['id']
-                    )
-                    # put denied minion key into minions_denied
-                    with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
-                        fp_.write(load['pub'])
-                    eload = {'result': False,
-                             'id': load['id'],
-                             'act': 'denied',
-                             'pub': load['pub']}
-                    if self.opts.get('auth_events') is True:
-                        self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-                    return {'enc': 'clear',
-                            'load': {'ret': False}}
+            if key_cache.get('minions', load['id']).strip() != load['pub'].strip():
+                log.error(
+                    'Authentication attempt from %s failed, the public '
+                    'keys did not match. This may be an attempt to compromise '
+                    'the Salt cluster.', load['id']
+                )
+                # put denied minion key into minions_denied
+                with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
+                    fp_.write(load['pub'])
+                eload = {'result': False,
+                         'id': load['id'],
+                         'act': 'denied',
+                         'pub': load['pub']}
+                if self.opts.get('auth_events') is True:
+                    self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
+                return {'enc': 'clear',
+                        'load': {'ret': False}}
 
-        elif not os.path.isfile(pubfn_pend):
+        elif key_cache.get('minions_pre', load['id']) is None:
             # The key has not been accepted, this is a new minion
             if os.path.isdir(pubfn_pend):
                 # The key path is a directory, error out
@@ -309,7 +406,7 @@ class AESReqServerMixin(object):
                     self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
                 return ret
 
-        elif os.path.isfile(pubfn_pend):
+        elif key_cache.get('minions_pre', load['id']) is not None:
             # This key is in the pending dir and is awaiting acceptance
             if auto_reject:
                 # We don't care if the keys match, this minion is being
@@ -336,62 +433,60 @@ class AESReqServerMixin(object):
                 # Check if the keys are the same and error out if this is the
                 # case. Otherwise log the fact that the minion is still
                 # pending.
-                with salt.utils.files.fopen(pubfn_pend, 'r') as pubfn_handle:
-                    if pubfn_handle.read() != load['pub']:
-                        log.error(
-                            'Authentication attempt from %s failed, the public '
-                            'key in pending did not match. This may be an '
-                            'attempt to compromise the Salt cluster.', load['id']
-                        )
-                        # put denied minion key into minions_denied
-                        with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
-                            fp_.write(load['pub'])
-                        eload = {'result': False,
-                                 'id': load['id'],
-                                 'act': 'denied',
-                                 'pub': load['pub']}
-                        if self.opts.get('auth_events') is True:
-                            self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-                        return {'enc': 'clear',
-                                'load': {'ret': False}}
-                    else:
-                        log.info(
-                            'Authentication failed from host %s, the key is in '
-                            'pending and needs to be accepted with salt-key '
-                            '-a %s', load['id'], load['id']
-                        )
-                        eload = {'result': True,
-                                 'act': 'pend',
-                                 'id': load['id'],
-                                 'pub': load['pub']}
-                        if self.opts.get('auth_events') is True:
-                            self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-                        return {'enc': 'clear',
-                                'load': {'ret': True}}
+                if key_cache.get('minions_pre', load['id']) != load['pub']:
+                    log.error(
+                        'Authentication attempt from %s failed, the public '
+                        'key in pending did not match. This may be an '
+                        'attempt to compromise the Salt cluster.', load['id']
+                    )
+                    # put denied minion key into minions_denied
+                    with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
+                        fp_.write(load['pub'])
+                    eload = {'result': False,
+                             'id': load['id'],
+                             'act': 'denied',
+                             'pub': load['pub']}
+                    if self.opts.get('auth_events') is True:
+                        self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
+                    return {'enc': 'clear',
+                            'load': {'ret': False}}
+                else:
+                    log.info(
+                        'Authentication failed from host %s, the key is in '
+                        'pending and needs to be accepted with salt-key '
+                        '-a %s', load['id'], load['id']
+                    )
+                    eload = {'result': True,
+                             'act': 'pend',
+                             'id': load['id'],
+                             'pub': load['pub']}
+                    if self.opts.get('auth_events') is True:
+                        self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
+                    return {'enc': 'clear',
+                            'load': {'ret': True}}
             else:
                 # This key is in pending and has been configured to be
                 # auto-signed. Check to see if it is the same key, and if
                 # so, pass on doing anything here, and let it get automatically
                 # accepted below.
-                with salt.utils.files.fopen(pubfn_pend, 'r') as pubfn_handle:
-                    if pubfn_handle.read() != load['pub']:
-                        log.error(
-                            'Authentication attempt from %s failed, the public '
-                            'keys in pending did not match. This may be an '
-                            'attempt to compromise the Salt cluster.', load['id']
-                        )
-                        # put denied minion key into minions_denied
-                        with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
-                            fp_.write(load['pub'])
-                        eload = {'result': False,
-                                 'id': load['id'],
-                                 'pub': load['pub']}
-                        if self.opts.get('auth_events') is True:
-                            self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
-                        return {'enc': 'clear',
-                                'load': {'ret': False}}
-                    else:
-                        os.remove(pubfn_pend)
+                if key_cache.get('minions_pre', load['id']) != load['pub']:
+                    log.error(
+                        'Authentication attempt from %s failed, the public '
+                        'keys in pending did not match. This may be an '
+                        'attempt to compromise the Salt cluster.', load['id']
+                    )
+                    # put denied minion key into minions_denied
+                    with salt.utils.files.fopen(pubfn_denied, 'w+') as fp_:
+                        fp_.write(load['pub'])
+                    eload = {'result': False,
+                             'id': load['id'],
+                             'pub': load['pub']}
+                    if self.opts.get('auth_events') is True:
+                        self.event.fire_event(eload, salt.utils.event.tagify(prefix='auth'))
+                    return {'enc': 'clear',
+                            'load': {'ret': False}}
+                else:
+                    os.remove(pubfn_pend)
 
         else:
             # Something happened that I have not accounted for, FAIL!
@@ -407,9 +502,10 @@ class AESReqServerMixin(object):
         log.info('Authentication accepted from %s', load['id'])
         # only write to disk if you are adding the file, and in open mode,
         # which implies we accept any key from a minion.
-        if not os.path.isfile(pubfn) and not self.opts['open_mode']:
+        if key_cache.get('minions', load['id']) is None and not self.opts['open_mode']:
             with salt.utils.files.fopen(pubfn, 'w+') as fp_:
                 fp_.write(load['pub'])
+            key_cache.set('minions', load['id'], load['pub'])
         elif self.opts['open_mode']:
             disk_key = ''
             if os.path.isfile(pubfn):
@@ -419,6 +515,7 @@ class AESReqServerMixin(object):
                 log.debug('Host key change detected in open mode.')
                 with salt.utils.files.fopen(pubfn, 'w+') as fp_:
                     fp_.write(load['pub'])
+                key_cache.set('minions', load['id'], load['pub'])
             elif not load['pub']:
                 log.error('Public key is empty: {0}'.format(load['id']))
                 return {'enc': 'clear',
@@ -433,7 +530,8 @@ class AESReqServerMixin(object):
         # The key payload may sometimes be corrupt when using auto-accept
         # and an empty request comes in
         try:
-            pub = salt.crypt.get_rsa_pub_key(pubfn)
+            # This is the key which is on disk by now
+            pub = key_cache.rsa(load['pub'])
         except (ValueError, IndexError, TypeError) as err:
             log.error('Corrupt public key "%s": %s', pubfn, err)
             return {'enc': 'clear',
@@ -444,6 +542,9 @@ class AESReqServerMixin(object):
         ret = {'enc': 'pub',
                'pub_key': self.master_key.get_pub_str(),
                'publish_port': self.opts['publish_port']}
+        if salt.crypt.HAS_AEAD:
+            # Minions may encrypt their requests with AES-GCM
+            ret['aead'] = True
 
         # sign the master's pubkey (if enabled) before it is
         # sent to the minion that was just authenticated
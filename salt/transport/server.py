@@ -8,6 +8,9 @@ This includes server side transport, for the ReqServer and the Publisher
 # Import Python Libs
 from __future__ import absolute_import, print_function, unicode_literals
 
+# Import Salt Libs
+import salt.utils.workerpools
+
 
 class ReqServerChannel(object):
     '''
@@ -44,6 +47,12 @@ class ReqServerChannel(object):
             raise Exception('Channels are only defined for ZeroMQ and raet')
             # return NewKindOfChannel(opts, **kwargs)
 
+    # Whether the channel routes requests to the worker pools of the
+    # worker_pools option, the other channels send them all to any worker
+    supports_worker_pools = False
+    # The pool of the worker the channel was forked to
+    worker_pool = salt.utils.workerpools.DEFAULT_POOL
+
     def pre_fork(self, process_manager):
         '''
         Do anything necessary pre-fork. Since this is on the master side this will
@@ -106,4 +115,12 @@ class PubServerChannel(object):
         '''
         raise NotImplementedError()
 
+    def publish_batch(self, loads):
+        '''
+        Publish several loads to minions. Nothing in salt calls this yet, it
+        is provided for the callers publishing many jobs at once.
+        '''
+        for load in loads:
+            self.publish(load)
+
 # EOF
@@ -295,10 +295,14 @@ class AsyncTCPReqChannel(salt.transport.client.ReqChannel):
         self.close()
 
     def _package_load(self, load):
-        return {
+        ret = {
             'enc': self.crypt,
             'load': load,
         }
+        if self.crypt == 'aes' and self.auth.crypticle.aead:
+            # The reply is encrypted with AES-GCM as well
+            ret['aead'] = True
+        return ret
 
     @tornado.gen.coroutine
     def crypted_transfer_decode_dictentry(self, load, dictkey=None, tries=3, timeout=60):
@@ -675,7 +679,7 @@ class TCPReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin, salt.tra
             if req_fun == 'send_clear':
                 stream.write(salt.transport.frame.frame_msg(ret, header=header))
             elif req_fun == 'send':
-                stream.write(salt.transport.frame.frame_msg(self.crypticle.dumps(ret), header=header))
+                stream.write(salt.transport.frame.frame_msg(self.crypticle.dumps(ret, aead=payload.get('aead', False)), header=header))
             elif req_fun == 'send_private':
                 stream.write(salt.transport.frame.frame_msg(self._encrypt_private(ret,
                                                              req_opts['key'],
@@ -1440,7 +1444,9 @@ class TCPPubServerChannel(salt.transport.server.PubServerChannel):
         '''
         payload = {'enc': 'aes'}
 
-        crypticle = salt.crypt.Crypticle(self.opts, salt.master.SMaster.secrets['aes']['secret'].value)
+        crypticle = salt.crypt.Crypticle(self.opts,
+                                         salt.master.SMaster.secrets['aes']['secret'].value,
+                                         aead=self.opts.get('aes_gcm', False))
         payload['load'] = crypticle.dumps(load)
         if self.opts['sign_pub_messages']:
             master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
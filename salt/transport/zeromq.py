@@ -8,10 +8,13 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import sys
 import copy
+import collections
 import errno
 import signal
 import hashlib
 import logging
+import threading
+import time
 import weakref
 from random import randint
 
@@ -24,11 +27,13 @@ import salt.utils.minions
 import salt.utils.process
 import salt.utils.stringutils
 import salt.utils.verify
+import salt.utils.workerpools
 import salt.utils.zeromq
 import salt.payload
 import salt.transport.client
 import salt.transport.server
 import salt.transport.mixins.auth
+from salt.defaults import DEFAULT_TARGET_DELIM
 from salt.ext import six
 from salt.exceptions import SaltReqTimeoutError
 
@@ -61,6 +66,22 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+# Target types the publisher resolves to minion ids with zmq_filtering
+MATCH_TARGETS = ('pcre', 'glob', 'list', 'compound', 'nodegroup')
+# Target types which can only be resolved with the minion data cache,
+# otherwise they match every minion
+CACHE_MATCH_TARGETS = ('grain', 'grain_pcre', 'pillar', 'pillar_pcre',
+                       'pillar_exact', 'compound_pillar_exact', 'ipcidr')
+
+
+def _get_cmd(load):
+    '''
+    Return the command of a load, which the master routes it with
+    '''
+    if isinstance(load, dict):
+        return load.get('cmd')
+    return None
+
 
 def _get_master_uri(master_ip,
                     master_port,
@@ -215,11 +236,18 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
                                    source_port=self.opts.get('source_ret_port'))
         return self.opts['master_uri']
 
-    def _package_load(self, load):
-        return {
+    def _package_load(self, load, cmd=None):
+        ret = {
             'enc': self.crypt,
             'load': load,
         }
+        if cmd is not None:
+            # Lets the master route the encrypted load to its worker pool
+            ret['cmd'] = cmd
+        if self.crypt == 'aes' and self.auth.crypticle.aead:
+            # The reply is encrypted with AES-GCM as well
+            ret['aead'] = True
+        return ret
 
     @tornado.gen.coroutine
     def crypted_transfer_decode_dictentry(self, load, dictkey=None, tries=3, timeout=60):
@@ -228,7 +256,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
             yield self.auth.authenticate()
         # Return control to the caller. When send() completes, resume by populating ret with the Future.result
         ret = yield self.message_client.send(
-            self._package_load(self.auth.crypticle.dumps(load)),
+            self._package_load(self.auth.crypticle.dumps(load), _get_cmd(load)),
             timeout=timeout,
             tries=tries,
         )
@@ -237,7 +265,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
             # Reauth in the case our key is deleted on the master side.
             yield self.auth.authenticate()
             ret = yield self.message_client.send(
-                self._package_load(self.auth.crypticle.dumps(load)),
+                self._package_load(self.auth.crypticle.dumps(load), _get_cmd(load)),
                 timeout=timeout,
                 tries=tries,
             )
@@ -272,7 +300,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
         def _do_transfer():
             # Yield control to the caller. When send() completes, resume by populating data with the Future.result
             data = yield self.message_client.send(
-                self._package_load(self.auth.crypticle.dumps(load)),
+                self._package_load(self.auth.crypticle.dumps(load), _get_cmd(load)),
                 timeout=timeout,
                 tries=tries,
             )
@@ -505,10 +533,28 @@ class AsyncZeroMQPubChannel(salt.transport.mixins.auth.AESPubClientMixin, salt.t
 class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
                              salt.transport.server.ReqServerChannel):
 
+    supports_worker_pools = True
+
     def __init__(self, opts):
         salt.transport.server.ReqServerChannel.__init__(self, opts)
         self._closing = False
 
+    def _worker_uri(self, pool=salt.utils.workerpools.DEFAULT_POOL):
+        '''
+        Return the uri the workers of a pool connect to
+        '''
+        if self.opts.get('ipc_mode', '') == 'tcp':
+            port = int(self.opts.get('tcp_master_workers', 4515))
+            if pool != salt.utils.workerpools.DEFAULT_POOL:
+                # The ports following tcp_master_workers, in the pool order
+                port += list(salt.utils.workerpools.get_pools(self.opts)).index(pool)
+            return 'tcp://127.0.0.1:{0}'.format(port)
+        if pool == salt.utils.workerpools.DEFAULT_POOL:
+            name = 'workers.ipc'
+        else:
+            name = 'workers-{0}.ipc'.format(pool)
+        return 'ipc://{0}'.format(os.path.join(self.opts['sock_dir'], name))
+
     def zmq_device(self):
         '''
         Multiprocessing target for the zmq queue device
@@ -525,20 +571,17 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         self.clients.setsockopt(zmq.BACKLOG, self.opts.get('zmq_backlog', 1000))
         self._start_zmq_monitor()
         self.workers = self.context.socket(zmq.DEALER)
-
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            self.w_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_workers', 4515)
-                )
-        else:
-            self.w_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'workers.ipc')
-                )
+        self.w_uri = self._worker_uri()
 
         log.info('Setting up the master communication server')
         self.clients.bind(self.uri)
         self.workers.bind(self.w_uri)
 
+        pools = salt.utils.workerpools.get_pools(self.opts)
+        if len(pools) > 1:
+            self._route_pools(pools)
+            return
+
         while True:
             if self.clients.closed or self.workers.closed:
                 break
@@ -551,6 +594,87 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
             except (KeyboardInterrupt, SystemExit):
                 break
 
+    def _route_pools(self, pools):
+        '''
+        Route the requests to the workers of their pool, and the replies back
+        to the clients. The requests which do not fit in the queue of their
+        pool are dropped, the minions send them again once they time out.
+        '''
+        routes = salt.utils.workerpools.get_routes(pools)
+        serial = salt.payload.Serial(self.opts)
+        self.pool_sockets = {salt.utils.workerpools.DEFAULT_POOL: self.workers}
+        for name, pool in six.iteritems(pools):
+            if name == salt.utils.workerpools.DEFAULT_POOL:
+                continue
+            sock = self.context.socket(zmq.DEALER)
+            # The queue depth is enforced by counting the requests in flight,
+            # the socket must not drop them before
+            sock.setsockopt(zmq.SNDHWM, max(1, pool['queue_depth']))
+            sock.bind(self._worker_uri(name))
+            self.pool_sockets[name] = sock
+            log.info('Routing %s to the %s worker pool',
+                     ', '.join(pool['commands']), name)
+        poller = zmq.Poller()
+        poller.register(self.clients, zmq.POLLIN)
+        for sock in six.itervalues(self.pool_sockets):
+            poller.register(sock, zmq.POLLIN)
+        dropped = dict((name, 0) for name in pools)
+        drop_clock = time.time()
+        # When the requests in flight in each pool were sent, the oldest first
+        inflight = dict((name, collections.deque()) for name in pools)
+
+        while True:
+            if self._closing or self.clients.closed:
+                break
+            try:
+                events = dict(poller.poll(1000))
+                for name, sock in six.iteritems(self.pool_sockets):
+                    if sock in events:
+                        # A reply, the envelope routes it to its client
+                        self.clients.send_multipart(sock.recv_multipart(zmq.NOBLOCK))
+                        if inflight[name]:
+                            inflight[name].popleft()
+                if self.clients not in events:
+                    continue
+                frames = self.clients.recv_multipart(zmq.NOBLOCK)
+                try:
+                    pool = salt.utils.workerpools.classify(
+                        serial.loads(frames[-1]), routes)
+                except Exception:
+                    pool = salt.utils.workerpools.DEFAULT_POOL
+                depth = pools[pool]['queue_depth']
+                if depth is not None:
+                    # Stop waiting for the replies a worker which died
+                    # while handling their request will never send
+                    expired = time.time() - salt.utils.workerpools.REQUEST_TIMEOUT
+                    while inflight[pool] and inflight[pool][0] < expired:
+                        inflight[pool].popleft()
+                if depth is not None and len(inflight[pool]) >= depth:
+                    dropped[pool] += 1
+                else:
+                    try:
+                        self.pool_sockets[pool].send_multipart(frames, zmq.NOBLOCK)
+                    except zmq.Again:
+                        dropped[pool] += 1
+                    else:
+                        if depth is not None:
+                            inflight[pool].append(time.time())
+            except zmq.Again:
+                continue
+            except zmq.ZMQError as exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                raise exc
+            except (KeyboardInterrupt, SystemExit):
+                break
+            if time.time() - drop_clock > 60 and any(six.itervalues(dropped)):
+                for name, count in six.iteritems(dropped):
+                    if count:
+                        log.warning('Dropped %s requests over the queue depth '
+                                    'of the %s worker pool', count, name)
+                dropped = dict((name, 0) for name in pools)
+                drop_clock = time.time()
+
     def close(self):
         '''
         Cleanly shutdown the router socket
@@ -570,6 +694,9 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
             self.clients.close()
         if hasattr(self, 'workers') and self.workers.closed is False:
             self.workers.close()
+        for sock in six.itervalues(getattr(self, 'pool_sockets', {})):
+            if sock.closed is False:
+                sock.close()
         if hasattr(self, 'stream'):
             self.stream.close()
         if hasattr(self, '_socket') and self._socket.closed is False:
@@ -618,14 +745,11 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         self._socket = self.context.socket(zmq.REP)
         self._start_zmq_monitor()
 
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            self.w_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_workers', 4515)
-                )
-        else:
-            self.w_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'workers.ipc')
-                )
+        if self.worker_pool != salt.utils.workerpools.DEFAULT_POOL:
+            # The requests wait in the router, where the queue depth of the
+            # pool is enforced, rather than in the socket of a worker
+            self._socket.setsockopt(zmq.RCVHWM, 1)
+        self.w_uri = self._worker_uri(self.worker_pool)
         log.info('Worker binding to socket %s', self.w_uri)
         self._socket.connect(self.w_uri)
 
@@ -699,7 +823,7 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         if req_fun == 'send_clear':
             stream.send(self.serial.dumps(ret))
         elif req_fun == 'send':
-            stream.send(self.serial.dumps(self.crypticle.dumps(ret)))
+            stream.send(self.serial.dumps(self.crypticle.dumps(ret, aead=payload.get('aead', False))))
         elif req_fun == 'send_private':
             stream.send(self.serial.dumps(self._encrypt_private(ret,
                                                                 req_opts['key'],
@@ -767,10 +891,31 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
         self.opts = opts
         self.serial = salt.payload.Serial(self.opts)  # TODO: in init?
         self.ckminions = salt.utils.minions.CkMinions(self.opts)
+        # The socket to the publisher daemon is kept open across publishes,
+        # by the process which opened it
+        self.context = None
+        self.pub_sock = None
+        self._sock_pid = None
+        self._sock_lock = threading.Lock()
+        self._crypticle = None
+        self._sign_key = None
 
     def connect(self):
         return tornado.gen.sleep(5)
 
+    @property
+    def pull_uri(self):
+        '''
+        The address the publisher daemon gets the payloads to publish on
+        '''
+        if self.opts.get('ipc_mode', '') == 'tcp':
+            return 'tcp://127.0.0.1:{0}'.format(
+                self.opts.get('tcp_master_publish_pull', 4514)
+                )
+        return 'ipc://{0}'.format(
+            os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
+            )
+
     def _publish_daemon(self):
         '''
         Bind to the interface specified in the configuration file
@@ -797,15 +942,7 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
         pub_uri = 'tcp://{interface}:{publish_port}'.format(**self.opts)
         # Prepare minion pull socket
         pull_sock = context.socket(zmq.PULL)
-
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            pull_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_publish_pull', 4514)
-                )
-        else:
-            pull_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
-                )
+        pull_uri = self.pull_uri
         salt.utils.zeromq.check_ipc_path_max_len(pull_uri)
 
         # Start the minion command publisher
@@ -823,41 +960,44 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
                 # SIGUSR1 gracefully so we don't choke and die horribly
                 try:
                     log.trace('Getting data from puller %s', pull_uri)
-                    package = pull_sock.recv()
-                    unpacked_package = salt.payload.unpackage(package)
-                    if six.PY3:
-                        unpacked_package = salt.transport.frame.decode_embedded_strs(unpacked_package)
-                    payload = unpacked_package['payload']
-                    log.trace('Accepted unpacked package from puller')
-                    if self.opts['zmq_filtering']:
-                        # if you have a specific topic list, use that
-                        if 'topic_lst' in unpacked_package:
-                            for topic in unpacked_package['topic_lst']:
-                                log.trace('Sending filtered data over publisher %s', pub_uri)
-                                # zmq filters are substring match, hash the topic
-                                # to avoid collisions
-                                htopic = salt.utils.stringutils.to_bytes(hashlib.sha1(topic).hexdigest())
-                                pub_sock.send(htopic, flags=zmq.SNDMORE)
+                    # Several payloads are sent as the frames of a single
+                    # message by publish_batch
+                    packages = pull_sock.recv_multipart()
+                    for package in packages:
+                        unpacked_package = salt.payload.unpackage(package)
+                        if six.PY3:
+                            unpacked_package = salt.transport.frame.decode_embedded_strs(unpacked_package)
+                        payload = unpacked_package['payload']
+                        log.trace('Accepted unpacked package from puller')
+                        if self.opts['zmq_filtering']:
+                            # if you have a specific topic list, use that
+                            if 'topic_lst' in unpacked_package:
+                                for topic in unpacked_package['topic_lst']:
+                                    log.trace('Sending filtered data over publisher %s', pub_uri)
+                                    # zmq filters are substring match, hash the topic
+                                    # to avoid collisions
+                                    htopic = salt.utils.stringutils.to_bytes(hashlib.sha1(topic).hexdigest())
+                                    pub_sock.send(htopic, flags=zmq.SNDMORE)
+                                    pub_sock.send(payload)
+                                    log.trace('Filtered data has been sent')
+
+                                # Syndic broadcast
+                                if self.opts.get('order_masters'):
+                                    log.trace('Sending filtered data to syndic')
+                                    pub_sock.send(b'syndic', flags=zmq.SNDMORE)
+                                    pub_sock.send(payload)
+                                    log.trace('Filtered data has been sent to syndic')
+                            # otherwise its a broadcast
+                            else:
+                                # TODO: constants file for "broadcast"
+                                log.trace('Sending broadcasted data over publisher %s', pub_uri)
+                                pub_sock.send(b'broadcast', flags=zmq.SNDMORE)
                                 pub_sock.send(payload)
-                                log.trace('Filtered data has been sent')
-
-                            # Syndic broadcast
-                            if self.opts.get('order_masters'):
-                                log.trace('Sending filtered data to syndic')
-                                pub_sock.send(b'syndic', flags=zmq.SNDMORE)
-                                pub_sock.send(payload)
-                                log.trace('Filtered data has been sent to syndic')
-                        # otherwise its a broadcast
+                                log.trace('Broadcasted data has been sent')
                         else:
-                            # TODO: constants file for "broadcast"
-                            log.trace('Sending broadcasted data over publisher %s', pub_uri)
-                            pub_sock.send(b'broadcast', flags=zmq.SNDMORE)
+                            log.trace('Sending ZMQ-unfiltered data over publisher %s', pub_uri)
                             pub_sock.send(payload)
-                            log.trace('Broadcasted data has been sent')
-                    else:
-                        log.trace('Sending ZMQ-unfiltered data over publisher %s', pub_uri)
-                        pub_sock.send(payload)
-                        log.trace('Unfiltered data has been sent')
+                            log.trace('Unfiltered data has been sent')
                 except zmq.ZMQError as exc:
                     if exc.errno == errno.EINTR:
                         continue
@@ -884,32 +1024,69 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
         '''
         process_manager.add_process(self._publish_daemon)
 
-    def publish(self, load):
+    def pub_connect(self):
         '''
-        Publish "load" to minions
+        Return the socket to the publisher daemon, connecting it on the first
+        publish of this process
+        '''
+        if self.pub_sock is not None and self._sock_pid != os.getpid():
+            # Forked, the socket belongs to the parent
+            self.context = self.pub_sock = None
+        if self.pub_sock is None:
+            self.context = zmq.Context(1)
+            self.pub_sock = self.context.socket(zmq.PUSH)
+            self.pub_sock.connect(self.pull_uri)
+            self._sock_pid = os.getpid()
+        return self.pub_sock
+
+    def pub_close(self):
+        '''
+        Close the socket to the publisher daemon
+        '''
+        with self._sock_lock:
+            if self.pub_sock is not None and self._sock_pid == os.getpid():
+                self.pub_sock.close()
+                self.context.term()
+            self.context = self.pub_sock = None
 
-        :param dict load: A load to be sent across the wire to minions
+    def __del__(self):
+        self.pub_close()
+
+    def _get_crypticle(self):
         '''
-        payload = {'enc': 'aes'}
+        Return the Crypticle for the current AES key, which is only built
+        again once the key was rotated
+        '''
+        key = salt.master.SMaster.secrets['aes']['secret'].value
+        if self._crypticle is None or self._crypticle.key_string != key:
+            self._crypticle = salt.crypt.Crypticle(
+                self.opts, key, aead=self.opts.get('aes_gcm', False))
+        return self._crypticle
+
+    def _sign(self, data):
+        if self._sign_key is None:
+            master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
+            self._sign_key = salt.crypt.get_rsa_key(master_pem_path, None)
+        log.debug("Signing data packet")
+        return salt.crypt.sign_message_with_key(self._sign_key, data)
+
+    def _match_target(self, tgt_type):
+        '''
+        Return whether minions targeted with tgt_type are resolved here, so
+        that the load is only sent to them
+        '''
+        if tgt_type in MATCH_TARGETS:
+            return True
+        return tgt_type in CACHE_MATCH_TARGETS and self.opts['minion_data_cache']
 
-        crypticle = salt.crypt.Crypticle(self.opts, salt.master.SMaster.secrets['aes']['secret'].value)
-        payload['load'] = crypticle.dumps(load)
+    def _package(self, load):
+        '''
+        Return the package to send to the publisher daemon for a load
+        '''
+        payload = {'enc': 'aes'}
+        payload['load'] = self._get_crypticle().dumps(load)
         if self.opts['sign_pub_messages']:
-            master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
-            log.debug("Signing data packet")
-            payload['sig'] = salt.crypt.sign_message(master_pem_path, payload['load'])
-        # Send 0MQ to the publisher
-        context = zmq.Context(1)
-        pub_sock = context.socket(zmq.PUSH)
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            pull_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_publish_pull', 4514)
-                )
-        else:
-            pull_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'publish_pull.ipc')
-                )
-        pub_sock.connect(pull_uri)
+            payload['sig'] = self._sign(payload['load'])
         int_payload = {'payload': self.serial.dumps(payload)}
 
         # add some targeting stuff for lists only (for now)
@@ -917,20 +1094,45 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
             int_payload['topic_lst'] = load['tgt']
 
         # If zmq_filtering is enabled, target matching has to happen master side
-        match_targets = ["pcre", "glob", "list"]
-        if self.opts['zmq_filtering'] and load['tgt_type'] in match_targets:
-            # Fetch a list of minions that match
-            _res = self.ckminions.check_minions(load['tgt'],
-                                                tgt_type=load['tgt_type'])
+        if self.opts['zmq_filtering'] and self._match_target(load['tgt_type']):
+            # Fetch a list of minions that match, minions which have no cached
+            # data to match against are sent the load as well
+            _res = self.ckminions.check_minions(
+                load['tgt'],
+                tgt_type=load['tgt_type'],
+                delimiter=load.get('delimiter', DEFAULT_TARGET_DELIM),
+                greedy=True)
             match_ids = _res['minions']
 
             log.debug("Publish Side Match: %s", match_ids)
             # Send list of miions thru so zmq can target them
             int_payload['topic_lst'] = match_ids
 
-        pub_sock.send(self.serial.dumps(int_payload))
-        pub_sock.close()
-        context.term()
+        return self.serial.dumps(int_payload)
+
+    def publish(self, load):
+        '''
+        Publish "load" to minions
+
+        :param dict load: A load to be sent across the wire to minions
+        '''
+        package = self._package(load)
+        # Send 0MQ to the publisher
+        with self._sock_lock:
+            self.pub_connect().send(package)
+
+    def publish_batch(self, loads):
+        '''
+        Publish several loads to minions, handing them to the publisher daemon
+        as a single message
+
+        :param list loads: The loads to be sent across the wire to minions
+        '''
+        packages = [self._package(load) for load in loads]
+        if not packages:
+            return
+        with self._sock_lock:
+            self.pub_connect().send_multipart(packages)
 
 
 class AsyncReqMessageClientPool(salt.transport.MessageClientPool):
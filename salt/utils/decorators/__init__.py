@@ -259,6 +259,28 @@ def memoize(func):
     return _memoize
 
 
+def grains_ttl(ttl):
+    '''
+    Declare how many seconds the result of a grains function can be reused
+    before the function runs again on a grains refresh.
+
+    .. versionadded:: Neon
+
+    .. code-block:: python
+
+        @salt.utils.decorators.grains_ttl(3600)
+        def slow_grains():
+            ...
+
+    The function is returned unchanged, so that the loader keeps passing it
+    the ``proxy`` and ``grains`` arguments it accepts.
+    '''
+    def _grains_ttl(func):
+        func.grains_ttl = ttl
+        return func
+    return _grains_ttl
+
+
 class _DeprecationDecorator(object):
     '''
     Base mix-in class for the deprecation decorator.
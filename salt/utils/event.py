@@ -55,11 +55,14 @@ from __future__ import absolute_import, unicode_literals, print_function
 # Import python libs
 import os
 import time
+import errno
 import fnmatch
 import hashlib
 import logging
 import datetime
 import sys
+import threading
+from collections import deque
 
 try:
     from collections.abc import MutableMapping
@@ -115,6 +118,20 @@ TAGS = {
 }
 
 
+def _get_tag(package):
+    '''
+    Return the tag of a packed event, None if it cannot be read
+    '''
+    try:
+        if isinstance(package, bytes):
+            package = package.partition(salt.utils.stringutils.to_bytes(TAGEND))[0]
+        else:
+            package = package.partition(TAGEND)[0]
+        return salt.utils.stringutils.to_str(package)
+    except Exception:
+        return None
+
+
 def get_event(
         node, sock_dir=None, transport='zeromq',
         opts=None, listen=True, io_loop=None, keep_loop=False, raise_errors=False):
@@ -245,6 +262,7 @@ class SaltEvent(object):
         self.subscriber = None
         self.pusher = None
         self.raise_errors = raise_errors
+        self.tag_filter = None
 
         if opts is None:
             opts = {}
@@ -342,6 +360,21 @@ class SaltEvent(object):
         match_func = self._get_match_func(match_type)
         self.pending_tags.append([tag, match_func])
 
+    def set_tag_filter(self, tags=None):
+        '''
+        Only receive the events whose tag starts with one of the prefixes or
+        matches one of the globs in tags, the others are not even sent by the
+        event publisher. Pass None to receive all the events again.
+
+        The events which do not match the filter are never returned, so the
+        filter has to cover the tags passed to get_event() and subscribe().
+
+        .. versionadded:: Neon
+        '''
+        self.tag_filter = list(tags) if tags is not None else None
+        if self.subscriber is not None:
+            self.subscriber.set_filter(self, self.tag_filter)
+
     def unsubscribe(self, tag, match_type=None):
         '''
         Un-subscribe to events matching the passed tag.
@@ -372,6 +405,7 @@ class SaltEvent(object):
                     self.puburi,
                     io_loop=self.io_loop
                 )
+                    self.subscriber.set_filter(self, self.tag_filter)
                 try:
                     self.io_loop.run_sync(
                         lambda: self.subscriber.connect(timeout=timeout))
@@ -384,6 +418,7 @@ class SaltEvent(object):
                 self.puburi,
                 io_loop=self.io_loop
             )
+                self.subscriber.set_filter(self, self.tag_filter)
 
             # For the asynchronous case, the connect will be defered to when
             # set_event_handler() is invoked.
@@ -436,17 +471,38 @@ class SaltEvent(object):
 
     @classmethod
     def unpack(cls, raw, serial=None):
-        if serial is None:
-            serial = salt.payload.Serial({'serial': 'msgpack'})
+        mtag, mdata = cls.unpack_tag(raw)
+        return mtag, cls.unpack_data(mdata, serial)
 
+    @classmethod
+    def unpack_tag(cls, raw):
+        '''
+        Split a raw event into its tag and its still packed data, so that the
+        data is only decoded for the events which are wanted
+        '''
         if six.PY2:
             mtag, sep, mdata = raw.partition(TAGEND)  # split tag from data
-            data = serial.loads(mdata, encoding='utf-8')
         else:
             mtag, sep, mdata = raw.partition(salt.utils.stringutils.to_bytes(TAGEND))  # split tag from data
             mtag = salt.utils.stringutils.to_str(mtag)
-            data = serial.loads(mdata, encoding='utf-8')
-        return mtag, data
+        return mtag, mdata
+
+    @classmethod
+    def unpack_data(cls, mdata, serial=None):
+        '''
+        Decode the packed data of an event split by unpack_tag()
+        '''
+        if serial is None:
+            serial = salt.payload.Serial({'serial': 'msgpack'})
+        return serial.loads(mdata, encoding='utf-8')
+
+    def _decode_event(self, evt):
+        '''
+        Decode the data of a cached event, once
+        '''
+        if 'raw' in evt:
+            evt['data'] = self.unpack_data(evt.pop('raw'), self.serial)
+        return evt
 
     def _get_match_func(self, match_type=None):
         if match_type is None:
@@ -470,7 +526,7 @@ class SaltEvent(object):
         for evt in old_events:
             if match_func(evt['tag'], tag):
                 if ret is None:
-                    ret = evt
+                    ret = self._decode_event(evt)
                     log.trace('get_event() returning cached event = %s', ret)
                 else:
                     self.pending_events.append(evt)
@@ -550,8 +606,9 @@ class SaltEvent(object):
                 raw = self.subscriber.read_sync(timeout=wait)
                 if raw is None:
                     break
-                mtag, data = self.unpack(raw, self.serial)
-                ret = {'data': data, 'tag': mtag}
+                # The data is only decoded once the tag matched
+                mtag, mdata = self.unpack_tag(raw)
+                ret = {'raw': mdata, 'tag': mtag}
             except KeyboardInterrupt:
                 return {'tag': 'salt/event/exit', 'data': {}}
             except tornado.iostream.StreamClosedError:
@@ -571,6 +628,7 @@ class SaltEvent(object):
                     wait = timeout_at - time.time()
                 continue
 
+            ret = self._decode_event(ret)
             log.trace('get_event() received = %s', ret)
             return ret
         log.trace('_get_event() waited %s seconds and received nothing', wait)
@@ -1036,7 +1094,9 @@ class AsyncEventPublisher(object):
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            # Only look for the tag when some subscribers filter on it
+            tag = _get_tag(package) if self.publisher.filters else None
+            self.publisher.publish(package, tag=tag)
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1139,7 +1199,9 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         Get something from epull, publish it out epub, and return the package (or None)
         '''
         try:
-            self.publisher.publish(package)
+            # Only look for the tag when some subscribers filter on it
+            tag = _get_tag(package) if self.publisher.filters else None
+            self.publisher.publish(package, tag=tag)
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1170,7 +1232,18 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
     '''
     A dedicated process which listens to the master event bus and queues
     and forwards events to the specified returner.
+
+    Events are gathered in batches, flushed once they hold
+    ``event_return_queue`` events or ``event_return_queue_max_bytes`` bytes of
+    event data, or once their oldest event is
+    ``event_return_queue_max_seconds`` old. A writer thread hands the flushed
+    batches to the returners, so that slow returners do not hold up the
+    reading of the event bus. Once more than ``event_return_backlog`` events
+    wait for the writer, batches are spilled to disk, up to
+    ``event_return_spill_size`` bytes, and dropped beyond that.
     '''
+    SPILL_DIR = 'event_return_spill'
+
     def __new__(cls, *args, **kwargs):
         if sys.platform.startswith('win'):
             # This is required for Windows.  On Linux, when a process is
@@ -1191,11 +1264,33 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
 
         self.opts = opts
         self.event_return_queue = self.opts['event_return_queue']
+        self.max_seconds = self.opts.get('event_return_queue_max_seconds', 0)
+        self.max_bytes = self.opts.get('event_return_queue_max_bytes', 0)
+        self.backlog = self.opts.get('event_return_backlog', 10000)
+        self.spill_size = self.opts.get('event_return_spill_size', 104857600)
+        self.spill_dir = os.path.join(self.opts['cachedir'], self.SPILL_DIR)
         local_minion_opts = self.opts.copy()
         local_minion_opts['file_client'] = 'local'
         self.minion = salt.minion.MasterMinion(local_minion_opts)
+        self.serial = salt.payload.Serial(self.opts)
         self.event_queue = []
+        self.event_queue_bytes = 0
+        self.event_queue_time = None
         self.stop = False
+        # The batches waiting for the writer, in memory and on disk, and the
+        # number of events in memory. Spilled batches are written after the
+        # ones in memory, and new batches are spilled as long as there are
+        # spilled batches left, so that the events are returned in order.
+        self.lock = threading.Condition()
+        self.batches = deque()
+        self.queued = 0
+        self.spill_files = deque()
+        self.spill_bytes = 0
+        self.writer = None
+        self.writer_stop = False
+        self._reset_stats()
+        self.stat_clock = time.time()
+        self.drop_log_clock = 0
 
     # __setstate__ and __getstate__ are only used on Windows.
     # We do this so that __init__ will be invoked on Windows in the child
@@ -1216,19 +1311,189 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
         }
 
     def _handle_signals(self, signum, sigframe):
-        # Flush and terminate
-        if self.event_queue:
-            self.flush_events()
+        # Flush and terminate, once run() exits
         self.stop = True
         super(EventReturn, self)._handle_signals(signum, sigframe)
 
+    def _reset_stats(self):
+        self.stats = {'flushes': 0,
+                      'flushed': 0,
+                      'dropped': 0,
+                      'flush_time': {'mean': 0, 'max': 0}}
+
+    def get_stats(self):
+        '''
+        Return the flush metrics gathered since the last call, along with the
+        number of events and spilled batches waiting for the writer
+        '''
+        with self.lock:
+            stats = self.stats
+            stats.update({'queue_depth': self.queued + len(self.event_queue),
+                          'spilled': len(self.spill_files),
+                          'spilled_bytes': self.spill_bytes})
+            self._reset_stats()
+        return stats
+
+    def _post_stats(self):
+        '''
+        Fire an event with the flush metrics every master_stats_event_iter
+        seconds, when master_stats is enabled
+        '''
+        if not self.opts.get('master_stats'):
+            return
+        now = time.time()
+        if now - self.stat_clock < self.opts['master_stats_event_iter']:
+            return
+        stats = self.get_stats()
+        stats['time'] = now - self.stat_clock
+        self.event.fire_event(stats, tagify('stats', 'event_return'))
+        self.stat_clock = now
+
+    def _batch_full(self):
+        if not self.event_queue:
+            return False
+        if len(self.event_queue) >= self.event_return_queue:
+            return True
+        if self.max_bytes and self.event_queue_bytes >= self.max_bytes:
+            return True
+        return bool(self.max_seconds) \
+            and time.time() - self.event_queue_time >= self.max_seconds
+
+    def _get_wait(self):
+        '''
+        Return how long to wait for the next event, to flush the batch and
+        post the stats on time
+        '''
+        wait = 5
+        now = time.time()
+        if self.max_seconds and self.event_queue:
+            wait = min(wait, self.event_queue_time + self.max_seconds - now)
+        if self.opts.get('master_stats'):
+            wait = min(wait, self.stat_clock + self.opts['master_stats_event_iter'] - now)
+        # A wait of 0 blocks until the next event
+        return max(wait, 0.01)
+
+    def add_event(self, event):
+        '''
+        Add an event to the current batch
+        '''
+        if not self.event_queue:
+            self.event_queue_time = time.time()
+        self.event_queue.append(event)
+        if self.max_bytes:
+            self.event_queue_bytes += len(self.serial.dumps(event))
+
     def flush_events(self):
+        '''
+        Hand the current batch over to the writer
+        '''
+        if not self.event_queue:
+            return
+        batch = self.event_queue
+        self.event_queue = []
+        self.event_queue_bytes = 0
+        self.event_queue_time = None
+        with self.lock:
+            if not self.spill_files and self.queued + len(batch) <= self.backlog:
+                self.batches.append(batch)
+                self.queued += len(batch)
+                self.lock.notify()
+                return
+        self._spill(batch)
+
+    def _drop(self, batch, reason):
+        with self.lock:
+            self.stats['dropped'] += len(batch)
+        now = time.time()
+        if now - self.drop_log_clock > 60:
+            log.warning('Dropping events for the event returners: %s', reason)
+            self.drop_log_clock = now
+
+    def _spill(self, batch):
+        '''
+        Write a batch to the spill directory, for the writer to return it
+        once it caught up
+        '''
+        if not self.spill_size:
+            self._drop(batch, 'the event returners are too slow')
+            return
+        data = self.serial.dumps(batch)
+        if self.spill_bytes + len(data) > self.spill_size:
+            self._drop(batch, 'event_return_spill_size is reached')
+            return
+        path = os.path.join(self.spill_dir, '{0:017.6f}-{1}.p'.format(
+            time.time(), len(batch)))
+        try:
+            if not os.path.isdir(self.spill_dir):
+                os.makedirs(self.spill_dir)
+            with salt.utils.files.fopen(path, 'wb') as fp_:
+                fp_.write(data)
+        except (IOError, OSError) as exc:
+            self._drop(batch, 'unable to spill them to {0}: {1}'.format(path, exc))
+            return
+        with self.lock:
+            self.spill_files.append(path)
+            self.spill_bytes += len(data)
+            self.lock.notify()
+
+    def _load_spill(self):
+        '''
+        Queue the batches spilled by an earlier run of the process
+        '''
+        try:
+            names = sorted(os.listdir(self.spill_dir))
+        except OSError:
+            return
+        with self.lock:
+            for name in names:
+                path = os.path.join(self.spill_dir, name)
+                self.spill_files.append(path)
+                self.spill_bytes += os.path.getsize(path)
+
+    def _read_spill(self, path):
+        try:
+            size = os.path.getsize(path)
+            with salt.utils.files.fopen(path, 'rb') as fp_:
+                batch = self.serial.loads(fp_.read())
+            os.remove(path)
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                log.error('Unable to read the spilled events %s: %s', path, exc)
+            return None
+        with self.lock:
+            self.spill_bytes -= size
+        return batch
+
+    def _write_batches(self):
+        '''
+        Target of the writer thread, hand the batches to the returners
+        '''
+        while True:
+            path = batch = None
+            with self.lock:
+                while not self.writer_stop and not self.batches and not self.spill_files:
+                    self.lock.wait()
+                if self.batches:
+                    batch = self.batches.popleft()
+                    self.queued -= len(batch)
+                elif self.spill_files and not self.writer_stop:
+                    path = self.spill_files.popleft()
+                else:
+                    # Stopping, the spilled batches are left for the next run
+                    return
+            if path is not None:
+                batch = self._read_spill(path)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        start = time.time()
         if isinstance(self.opts['event_return'], list):
             # Multiple event returners
             for r in self.opts['event_return']:
                 log.debug('Calling event returner {0}, one of many.'.format(r))
                 event_return = '{0}.event_return'.format(r)
-                self._flush_event_single(event_return)
+                self._flush_event_single(event_return, batch)
         else:
             # Only a single event returner
             log.debug('Calling event returner {0}, only one '
@@ -1236,13 +1501,20 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
             event_return = '{0}.event_return'.format(
                 self.opts['event_return']
                 )
-            self._flush_event_single(event_return)
-        del self.event_queue[:]
-
-    def _flush_event_single(self, event_return):
+            self._flush_event_single(event_return, batch)
+        duration = time.time() - start
+        with self.lock:
+            flush_time = self.stats['flush_time']
+            flush_time['mean'] = (flush_time['mean'] * self.stats['flushes'] + duration) \
+                / (self.stats['flushes'] + 1)
+            flush_time['max'] = max(flush_time['max'], duration)
+            self.stats['flushes'] += 1
+            self.stats['flushed'] += len(batch)
+
+    def _flush_event_single(self, event_return, batch):
         if event_return in self.minion.returners:
             try:
-                self.minion.returners[event_return](self.event_queue)
+                self.minion.returners[event_return](batch)
             except Exception as exc:
                 log.error('Could not store events - returner \'{0}\' raised '
                           'exception: {1}'.format(event_return, exc))
@@ -1250,32 +1522,67 @@ class EventReturn(salt.utils.process.SignalHandlingMultiprocessingProcess):
                 # potentially huge dataset to a string
                 if log.level <= logging.DEBUG:
                     log.debug('Event data that caused an exception: {0}'.format(
-                        self.event_queue))
+                        batch))
         else:
             log.error('Could not store return for event(s) - returner '
                       '\'%s\' not found.', event_return)
 
+    def start_writer(self):
+        '''
+        Start the writer thread
+        '''
+        self._load_spill()
+        self.writer = threading.Thread(target=self._write_batches,
+                                       name='EventReturnWriter')
+        self.writer.daemon = True
+        self.writer.start()
+
+    def stop_writer(self):
+        '''
+        Flush the current batch and wait for the writer to write the batches
+        in memory. If it was not running, they are spilled for the next run,
+        or written right away if spilling is disabled.
+        '''
+        self.flush_events()
+        with self.lock:
+            self.writer_stop = True
+            self.lock.notify_all()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        while self.batches:
+            batch = self.batches.popleft()
+            self.queued -= len(batch)
+            if self.spill_size:
+                self._spill(batch)
+            else:
+                self._write(batch)
+
     def run(self):
         '''
         Spin up the multiprocess event returner
         '''
         salt.utils.process.appendproctitle(self.__class__.__name__)
         self.event = get_event('master', opts=self.opts, listen=True)
-        events = self.event.iter_events(full=True)
+        if self.opts['event_return_whitelist']:
+            # Leave the other events out of the event bus
+            self.event.set_tag_filter(
+                list(self.opts['event_return_whitelist']) + ['salt/event/exit'])
+        self.start_writer()
         self.event.fire_event({}, 'salt/event_listen/start')
         try:
-            for event in events:
-                if event['tag'] == 'salt/event/exit':
-                    self.stop = True
-                if self._filter(event):
-                    self.event_queue.append(event)
-                if len(self.event_queue) >= self.event_return_queue:
+            while not self.stop:
+                event = self.event.get_event(wait=self._get_wait(), full=True)
+                if event is not None:
+                    if event['tag'] == 'salt/event/exit':
+                        self.stop = True
+                    if self._filter(event):
+                        self.add_event(event)
+                if self._batch_full():
                     self.flush_events()
-                if self.stop:
-                    break
+                self._post_stats()
         finally:  # flush all we have at this moment
-            if self.event_queue:
-                self.flush_events()
+            self.stop_writer()
 
     def _filter(self, event):
         '''
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+'''
+Rolling checksum deltas between two copies of a file
+
+The side holding the old copy of a file splits it in blocks and sends the
+signatures of the blocks, a weak adler32 checksum and a strong hash. The side
+holding the new copy scans it for data matching these blocks, at any offset,
+and describes it as a list of operations: ``[start, count]`` lists copy
+``count`` blocks of the old copy starting with block ``start``, and byte
+strings are new data. Applying the operations to the old copy rebuilds the new
+one.
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import hashlib
+import zlib
+
+# Import salt libs
+import salt.utils.files
+
+# The modulus of adler32
+_MOD_ADLER = 65521
+
+MIN_BLOCK_SIZE = 2048
+# Smaller files are cheaper to download again than to diff
+MIN_FILE_SIZE = 65536
+# The block size grows with the file so the signatures stay small
+MAX_BLOCKS = 4096
+
+# Size of the reads when scanning the new copy
+READ_SIZE = 1048576
+
+# In data which does not match, blocks are looked for at every offset of the
+# blocks 0, 1, 2, 4, 8... since the last match, and then of one block out of
+# that many
+ROLL_EVERY = 64
+
+
+def block_size(size):
+    '''
+    Return the block size to use for a file of the given size
+    '''
+    size = -(-size // MAX_BLOCKS)
+    # Round up to a multiple of the minimum block size
+    size = -(-size // MIN_BLOCK_SIZE) * MIN_BLOCK_SIZE
+    return max(MIN_BLOCK_SIZE, size)
+
+
+def _weak(block):
+    return zlib.adler32(block) & 0xffffffff
+
+
+def _strong(block):
+    return hashlib.sha256(block).hexdigest()[:16]
+
+
+def signatures(path, block_size_):
+    '''
+    Return the ``[weak, strong]`` signatures of the blocks of a file
+    '''
+    sigs = []
+    with salt.utils.files.fopen(path, 'rb') as fp_:
+        while True:
+            block = fp_.read(block_size_)
+            if not block:
+                break
+            sigs.append([_weak(block), _strong(block)])
+    return sigs
+
+
+def delta(fp_, sigs, block_size_, loc=0, max_literal=1048576):
+    '''
+    Scan an open file from the offset loc for the blocks described by sigs.
+
+    Return a tuple of the operations rebuilding the scanned part of the file,
+    and the offset the next scan has to start from, which is None once the
+    end of the file was reached. A scan stops once it collected max_literal
+    bytes of new data.
+
+    Looking for blocks at every offset is done in python, so in data which
+    does not match it only happens for exponentially spaced blocks and then
+    for one block out of ROLL_EVERY. The other blocks are only compared as a
+    whole.
+    '''
+    table = {}
+    for idx, sig in enumerate(sigs):
+        table.setdefault(sig[0], {}).setdefault(sig[1], idx)
+
+    def _match(block, weak=None):
+        if weak is None:
+            weak = _weak(block)
+        candidates = table.get(weak)
+        if candidates:
+            return candidates.get(_strong(block))
+        return None
+
+    ops = []
+    literal = bytearray()
+    literal_size = 0
+    # Bytes of new data since the last block which matched
+    unmatched = 0
+
+    def _copy(idx):
+        if literal:
+            ops.append(bytes(literal))
+            del literal[:]
+        if ops and isinstance(ops[-1], list) \
+                and ops[-1][0] + ops[-1][1] == idx:
+            ops[-1][1] += 1
+        else:
+            ops.append([idx, 1])
+
+    fp_.seek(loc)
+    buf = b''
+    # Offset of the data left to scan in buf, and in the file
+    cur = 0
+    pos = loc
+    eof = False
+    while True:
+        if not eof and len(buf) - cur < 2 * block_size_:
+            data = fp_.read(max(READ_SIZE, 2 * block_size_))
+            if len(data) < max(READ_SIZE, 2 * block_size_):
+                eof = True
+            buf = buf[cur:] + data
+            cur = 0
+        if cur == len(buf) or literal_size >= max_literal:
+            break
+        if len(buf) - cur < block_size_:
+            # The last block of the old copy may be shorter
+            block = buf[cur:]
+            idx = _match(block)
+            if idx is not None:
+                _copy(idx)
+            else:
+                literal.extend(block)
+                literal_size += len(block)
+            pos += len(block)
+            cur = len(buf)
+            continue
+        block = buf[cur:cur + block_size_]
+        idx = _match(block)
+        if idx is not None:
+            _copy(idx)
+            unmatched = 0
+            pos += block_size_
+            cur += block_size_
+            continue
+        # Look for a block starting at the following offsets, rolling the
+        # checksum one byte at a time
+        skip = block_size_
+        blocks = unmatched // block_size_
+        if blocks % ROLL_EVERY == 0 or not blocks & (blocks - 1):
+            window = bytearray(buf[cur:cur + 2 * block_size_])
+            value = _weak(block)
+            sum_a = value & 0xffff
+            sum_b = value >> 16
+            limit = min(block_size_, len(window) - block_size_ + 1)
+            for offset in range(1, limit):
+                out_byte = window[offset - 1]
+                sum_a = (sum_a - out_byte + window[offset + block_size_ - 1]) % _MOD_ADLER
+                sum_b = (sum_b - block_size_ * out_byte + sum_a - 1) % _MOD_ADLER
+                weak = (sum_b << 16) | sum_a
+                if weak in table and _match(
+                        buf[cur + offset:cur + offset + block_size_], weak) is not None:
+                    skip = offset
+                    break
+        literal.extend(buf[cur:cur + skip])
+        literal_size += skip
+        unmatched += skip
+        pos += skip
+        cur += skip
+
+    if literal:
+        ops.append(bytes(literal))
+    if eof and cur == len(buf):
+        return ops, None
+    return ops, pos
+
+
+def patch(src, ops, block_size_, dest):
+    '''
+    Write the file described by ops to the open file dest, copying blocks out
+    of the open file src
+    '''
+    for op_ in ops:
+        if isinstance(op_, (list, tuple)):
+            src.seek(op_[0] * block_size_)
+            remaining = op_[1] * block_size_
+            while remaining > 0:
+                data = src.read(min(remaining, READ_SIZE))
+                if not data:
+                    break
+                dest.write(data)
+                remaining -= len(data)
+        else:
+            dest.write(op_)
@@ -114,6 +114,84 @@ def store_job(opts, load, event=None, mminion=None):
         mminion.returners[updateetfstr](load['jid'], endtime)
 
 
+def store_jobs(opts, loads, event=None, mminion=None):
+    '''
+    Store the job information of a batch of returns using the configured
+    master_job_cache. If it has a returner_multi function the returns are
+    handed to it in a single call, otherwise they are stored one by one.
+    '''
+    if mminion is None:
+        mminion = salt.minion.MasterMinion(opts, states=False, rend=False)
+
+    job_cache = opts['master_job_cache']
+    multi_fstr = '{0}.returner_multi'.format(job_cache)
+    if not opts['job_cache'] or opts.get('ext_job_cache') \
+            or multi_fstr not in mminion.returners:
+        for load in loads:
+            store_job(opts, load, event=event, mminion=mminion)
+        return
+
+    # Generate EndTime
+    endtime = salt.utils.jid.jid_to_time(salt.utils.jid.gen_jid(opts))
+    batch = []
+    for load in loads:
+        # If the return data is invalid, just ignore it
+        if any(key not in load for key in ('return', 'jid', 'id')):
+            continue
+        if not salt.utils.verify.valid_id(opts, load['id']):
+            continue
+        if load['jid'] in ('req', 'nocache'):
+            # Standalone jobs need a jid of their own
+            store_job(opts, load, event=event, mminion=mminion)
+            continue
+        if 'fun' not in load and load.get('return', {}):
+            ret_ = load.get('return', {})
+            if 'fun' in ret_:
+                load.update({'fun': ret_['fun']})
+            if 'user' in ret_:
+                load.update({'user': ret_['user']})
+        batch.append(load)
+    if not batch:
+        return
+
+    # The last load of each jid is the one which ends up saved, just like
+    # when storing the returns one by one
+    jids = {}
+    for load in batch:
+        jids[load['jid']] = load
+
+    jidstore_fstr = '{0}.prep_jid'.format(job_cache)
+    savefstr = '{0}.save_load'.format(job_cache)
+    try:
+        jidstore_func = mminion.returners[jidstore_fstr]
+        savefstr_func = mminion.returners[savefstr]
+    except KeyError as error:
+        emsg = "Returner '{0}' does not support function {1}".format(job_cache, error)
+        log.error(emsg)
+        raise KeyError(emsg)
+    for jid in jids:
+        if salt.utils.jid.is_jid(jid):
+            # Store the jid
+            jidstore_func(False, passed_jid=jid)
+
+    if event:
+        for load in batch:
+            log.info('Got return from %s for job %s', load['id'], load['jid'])
+            event.fire_event(load,
+                             salt.utils.event.tagify([load['jid'], 'ret', load['id']], 'job'))
+            event.fire_ret_load(load)
+
+    for jid, load in jids.items():
+        savefstr_func(jid, load)
+    mminion.returners[multi_fstr](batch)
+
+    updateetfstr = '{0}.update_endtime'.format(job_cache)
+    if (opts.get('job_cache_store_endtime')
+            and updateetfstr in mminion.returners):
+        for jid in jids:
+            mminion.returners[updateetfstr](jid, endtime)
+
+
 def store_minions(opts, jid, minions, mminion=None, syndic_id=None):
     '''
     Store additional minions matched on lower-level masters using the configured
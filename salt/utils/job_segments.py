@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+'''
+Segmented storage for the local job cache
+
+Instead of a directory per job and a file per minion return, every master
+process appends the job data to its own segment file. Each record appended
+to a segment also gets a small entry appended to the index file of its job,
+which is what readers use to find the records of a job without reading the
+segments or the index of the other jobs. Every process keeps what it read
+from the index of the last jobs it looked up, and only reads the entries
+appended since.
+
+The jobs are also listed in a file per hour they were created in, which is
+used to list the jobs without reading their index.
+
+Segments are rotated when they get bigger than ``job_cache_segment_size``
+bytes or older than ``job_cache_segment_time`` seconds, and expired as a
+whole once they have not been written to for ``keep_jobs`` hours. The jobs
+are expired along with the list they were created in.
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import collections
+import errno
+import itertools
+import logging
+import os
+import struct
+import threading
+import time
+
+# Import salt libs
+import salt.payload
+import salt.utils.files
+import salt.utils.jid
+from salt.ext import six
+
+log = logging.getLogger(__name__)
+
+SEGMENT_DIR = 'job_segments'
+SEGMENT_EXT = '.seg'
+# The index files of the jobs, in the same layout as the local_cache jobs
+INDEX_DIR = 'index'
+# The lists of the jobs created every hour
+LIST_DIR = 'jids'
+
+# Kinds of records
+JID = 'jid'
+LOAD = 'load'
+MINIONS = 'minions'
+RETURN = 'return'
+ENDTIME = 'endtime'
+
+# Every record is prefixed with its length
+_HEADER = struct.Struct(str('>I'))
+
+# Tells apart the segments a process starts within the same millisecond
+_SEGMENT_SEQ = itertools.count()
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+# How many jobs a store keeps the index entries of
+_CACHED_JOBS = 100
+
+
+def get_store(opts):
+    '''
+    Return the segment store of this process for the cachedir in opts
+    '''
+    with _STORES_LOCK:
+        if opts['cachedir'] not in _STORES:
+            _STORES[opts['cachedir']] = SegmentStore(opts)
+        return _STORES[opts['cachedir']]
+
+
+class SegmentStore(object):
+    '''
+    The job cache segments under the master cachedir
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.serial = salt.payload.Serial(opts)
+        self.segment_dir = os.path.join(opts['cachedir'], SEGMENT_DIR)
+        self.index_dir = os.path.join(self.segment_dir, INDEX_DIR)
+        self.list_dir = os.path.join(self.segment_dir, LIST_DIR)
+        self.hash_type = opts.get('hash_type', 'sha256')
+        self.max_size = opts.get('job_cache_segment_size', 16777216)
+        self.max_age = opts.get('job_cache_segment_time', 3600)
+        if opts.get('keep_jobs'):
+            # A segment which is still written to must not expire
+            self.max_age = min(self.max_age, opts['keep_jobs'] * 3600)
+        self.lock = threading.RLock()
+        self._writer = None
+        self._jobs = collections.OrderedDict()
+
+    def _path(self, segment, ext):
+        return os.path.join(self.segment_dir, segment + ext)
+
+    def _index_path(self, jid):
+        return salt.utils.jid.jid_dir(jid, self.index_dir, self.hash_type)
+
+    def _read_entries(self, path, offset=0):
+        '''
+        Return the entries of an index or list file from offset on, along with
+        the offset after the last of them. An entry which is still being
+        written is left for the next read.
+        '''
+        entries = []
+        try:
+            with salt.utils.files.fopen(path, 'rb') as fh_:
+                end = os.fstat(fh_.fileno()).st_size
+                fh_.seek(offset)
+                while offset + _HEADER.size <= end:
+                    length, = _HEADER.unpack(fh_.read(_HEADER.size))
+                    if offset + _HEADER.size + length > end:
+                        break
+                    entries.append(self.serial.loads(fh_.read(length)))
+                    offset += _HEADER.size + length
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+        except Exception as exc:
+            log.error('Unable to read job cache index %s: %s', path, exc)
+        return entries, offset
+
+    def _append_entries(self, path, entries, exclusive=False):
+        '''
+        Append entries to an index or list file. The other master processes
+        append to it as well, so the entries go out in a single write.
+        Returns whether the file was created, None if exclusive is set and the
+        file exists already.
+        '''
+        chunks = []
+        for entry in entries:
+            entry_data = self.serial.dumps(list(entry))
+            chunks.append(_HEADER.pack(len(entry_data)))
+            chunks.append(entry_data)
+        data = b''.join(chunks)
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        created = True
+        try:
+            fd_ = self._open(path, flags | os.O_EXCL)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+            if exclusive:
+                return None
+            created = False
+            fd_ = self._open(path, flags)
+        try:
+            while data:
+                data = data[os.write(fd_, data):]
+        finally:
+            os.close(fd_)
+        return created
+
+    def _open(self, path, flags):
+        try:
+            return os.open(path, flags, 0o600)
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        return os.open(path, flags, 0o600)
+
+    def _write_index(self, jid, entries, exclusive=False):
+        '''
+        Append entries to the index file of a job, and list the job when this
+        creates it. Returns False if exclusive is set and the job exists.
+        '''
+        created = self._append_entries(self._index_path(jid), entries, exclusive)
+        if created is None:
+            return False
+        listed = [(None, jid)] if created else []
+        listed.extend((LOAD, jid) for entry in entries if entry[0] == LOAD)
+        if listed:
+            self._append_entries(
+                os.path.join(self.list_dir, str(int(time.time() // 3600))),
+                listed)
+        return True
+
+    def _open_writer(self):
+        try:
+            os.makedirs(self.segment_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        segment = '{0}-{1}-{2}'.format(int(time.time() * 1000),
+                                       os.getpid(),
+                                       next(_SEGMENT_SEQ))
+        seg_fh = salt.utils.files.fopen(self._path(segment, SEGMENT_EXT), 'ab')
+        self._writer = {'segment': segment,
+                        'seg_fh': seg_fh,
+                        'size': 0,
+                        'created': time.time(),
+                        'pid': os.getpid()}
+        return self._writer
+
+    def _close_writer(self):
+        if self._writer is not None:
+            if self._writer['pid'] == os.getpid():
+                self._writer['seg_fh'].close()
+            self._writer = None
+
+    def _get_writer(self):
+        writer = self._writer
+        if writer is not None:
+            if writer['pid'] != os.getpid():
+                # Forked, the segment belongs to the parent
+                self._writer = None
+            elif writer['size'] >= self.max_size \
+                    or time.time() - writer['created'] >= self.max_age \
+                    or not os.path.exists(self._path(writer['segment'], SEGMENT_EXT)):
+                self._close_writer()
+        if self._writer is None:
+            return self._open_writer()
+        return self._writer
+
+    def _write_segment(self, records):
+        '''
+        Append ``(kind, jid, data, minion)`` records to the segment of this
+        process with a single write. Returns their index entries.
+        '''
+        payloads = [self.serial.dumps(record[2]) for record in records]
+        with self.lock:
+            writer = self._get_writer()
+            chunks = []
+            entries = []
+            offset = writer['size']
+            for (kind, jid, _, minion), payload in zip(records, payloads):
+                chunks.append(_HEADER.pack(len(payload)))
+                chunks.append(payload)
+                offset += _HEADER.size
+                entries.append((kind, jid, minion, writer['segment'], offset, len(payload)))
+                offset += len(payload)
+            writer['seg_fh'].write(b''.join(chunks))
+            writer['seg_fh'].flush()
+            writer['size'] = offset
+        # The records are complete before they can be found in the index
+        return entries
+
+    def create(self, jid, data):
+        '''
+        Store the jid record of a new job. Returns False, and stores nothing,
+        if the job exists already.
+        '''
+        return self._write_index(jid, self._write_segment([(JID, jid, data, None)]),
+                                 exclusive=True)
+
+    def append(self, kind, jid, data, minion=None):
+        '''
+        Append a record to the segment of this process and index it, returns
+        its reference
+        '''
+        return self.append_many([(kind, jid, data, minion)])[0]
+
+    def append_many(self, records):
+        '''
+        Append a list of ``(kind, jid, data, minion)`` records with a single
+        write to the segment, and a single write to the index of each job.
+        Returns the references of the records.
+        '''
+        entries = self._write_segment(records)
+        jobs = collections.OrderedDict()
+        for entry in entries:
+            jobs.setdefault(entry[1], []).append(entry)
+        for jid, job_entries in six.iteritems(jobs):
+            self._write_index(jid, job_entries)
+        return [tuple(entry[3:]) for entry in entries]
+
+    def read(self, ref):
+        '''
+        Return the data of a record, None if its segment has expired
+        '''
+        segment, offset, length = ref
+        try:
+            with salt.utils.files.fopen(self._path(segment, SEGMENT_EXT), 'rb') as fh_:
+                fh_.seek(offset)
+                return self.serial.loads(fh_.read(length))
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _job_state(self, jid):
+        '''
+        Return what is known of a job, reading the entries appended to its
+        index since it was last looked up. None if the job is unknown.
+        '''
+        path = self._index_path(jid)
+        with self.lock:
+            state = self._jobs.pop(jid, None)
+            try:
+                stat = os.stat(path)
+            except OSError as exc:
+                if exc.errno != errno.ENOENT:
+                    raise
+                return None
+            if state is None or state['ino'] != stat.st_ino \
+                    or stat.st_size < state['offset']:
+                # Not looked up yet, or expired and created again since
+                state = {'ino': stat.st_ino, 'offset': 0, 'job': {}, 'nocache': False}
+            if stat.st_size > state['offset']:
+                entries, state['offset'] = self._read_entries(path, state['offset'])
+                job = state['job']
+                for kind, _, minion, segment, offset, length in entries:
+                    ref = (segment, offset, length)
+                    if kind == RETURN:
+                        # The first return of a minion is the one stored
+                        job.setdefault(RETURN, {}).setdefault(minion, ref)
+                    else:
+                        job.setdefault(kind, []).append(ref)
+                    if kind == JID and not state['nocache']:
+                        state['nocache'] = bool((self.read(ref) or {}).get('nocache'))
+            self._jobs[jid] = state
+            while len(self._jobs) > _CACHED_JOBS:
+                self._jobs.popitem(last=False)
+            return state
+
+    def job(self, jid):
+        '''
+        Return the index entries of a job, ``{kind: [(segment, offset,
+        length), ...]}`` with the first return of each minion in a dict keyed
+        by minion id instead. An empty dict if the job is unknown. The dict
+        is shared with the later lookups, it must not be modified.
+        '''
+        state = self._job_state(jid)
+        return state['job'] if state is not None else {}
+
+    def nocache(self, jid):
+        '''
+        Return True if the returns of a job must not be stored
+        '''
+        state = self._job_state(jid)
+        return state is not None and state['nocache']
+
+    def _lists(self):
+        try:
+            names = os.listdir(self.list_dir)
+        except OSError:
+            return []
+        return [os.path.join(self.list_dir, name) for name in names]
+
+    def jids(self):
+        '''
+        Return the sorted ids of the jobs which have a load
+        '''
+        ret = set()
+        for path in self._lists():
+            for kind, jid in self._read_entries(path)[0]:
+                if kind == LOAD:
+                    ret.add(jid)
+        return sorted(ret)
+
+    def last(self, jid, kind):
+        '''
+        Return the last record of a kind for a job, None if there is none
+        '''
+        refs = self.job(jid).get(kind)
+        if not refs:
+            return None
+        return self.read(refs[-1])
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as exc:
+            if exc.errno != errno.ENOENT:
+                log.error('Unable to remove job cache file %s: %s', path, exc)
+
+    def clean(self, keep_jobs):
+        '''
+        Remove the segments which were not written to for keep_jobs hours,
+        and the jobs listed in the lists which were not written to since
+        '''
+        limit = time.time() - keep_jobs * 3600
+        with self.lock:
+            try:
+                names = os.listdir(self.segment_dir)
+            except OSError:
+                return
+            current = self._writer['segment'] \
+                if self._writer is not None and self._writer['pid'] == os.getpid() \
+                else None
+            for name in names:
+                if not name.endswith(SEGMENT_EXT) \
+                        or name[:-len(SEGMENT_EXT)] == current:
+                    continue
+                path = os.path.join(self.segment_dir, name)
+                try:
+                    if os.path.getmtime(path) > limit:
+                        continue
+                except OSError:
+                    continue
+                self._remove(path)
+        for path in self._lists():
+            try:
+                if os.path.getmtime(path) > limit:
+                    continue
+                if not path.endswith('.old'):
+                    # The jobs created from now on go to a new list
+                    os.rename(path, path + '.old')
+                    path += '.old'
+            except OSError:
+                continue
+            for _, jid in self._read_entries(path)[0]:
+                self._remove(self._index_path(jid))
+            self._remove(path)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+'''
+Pools of pre-forked minion job workers
+
+The ``job_workers`` minion option starts that many long-lived processes,
+forked from the minion once its modules are loaded. The minion sends the jobs
+to the idle workers over a pipe instead of forking a process for each of them,
+and falls back to forking a process when all the workers are busy. A worker
+is replaced after it ran ``job_worker_max_jobs`` jobs, when it dies, for
+instance when ``saltutil.kill_job`` killed the job it was running, and when the
+modules of the minion are refreshed.
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import fnmatch
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+
+# Import salt libs
+import salt.utils.process
+from salt.ext import six
+from salt.utils.process import SignalHandlingMultiprocessingProcess, default_signals
+
+log = logging.getLogger(__name__)
+
+# How often an idle worker checks that the minion is still running, in seconds
+POLL_INTERVAL = 5
+
+
+def _work(conn, target, max_jobs):
+    '''
+    Run the jobs read from conn with target until the minion exits, asks the
+    worker to stop or the worker ran max_jobs jobs. The number of jobs
+    run so far is written back to conn after each of them.
+    '''
+    salt.utils.process.appendproctitle('JobWorker')
+    ppid = os.getppid()
+    jobs = 0
+    while not max_jobs or jobs < max_jobs:
+        try:
+            # Other processes forked by the minion may hold the parent end of
+            # the pipe, exit when the minion is gone
+            if not conn.poll(POLL_INTERVAL):
+                if os.getppid() != ppid:
+                    break
+                continue
+            job = conn.recv()
+        except (EOFError, IOError, OSError):
+            break
+        if job is None:
+            break
+        try:
+            target(*job)
+        except Exception:
+            log.error('Job worker failed to run a job', exc_info=True)
+        jobs += 1
+        try:
+            conn.send(jobs)
+        except (IOError, OSError):
+            break
+    conn.close()
+
+
+class JobWorkerPool(object):
+    '''
+    A pool of processes running the jobs sent to them with target
+
+    Workers are forked when the pool starts and whenever one of them exits,
+    they reply to the pool on the io_loop when done with a job.
+    '''
+    def __init__(self, target, io_loop, size, max_jobs=0, functions=None):
+        self.target = target
+        self.io_loop = io_loop
+        self.size = size
+        self.max_jobs = max_jobs
+        self.functions = functions or []
+        self.workers = []
+        self._closing = False
+
+    def start(self):
+        '''
+        Fork the workers
+        '''
+        while len(self.workers) < self.size:
+            self._spawn()
+
+    def _spawn(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        with default_signals(signal.SIGINT, signal.SIGTERM):
+            process = SignalHandlingMultiprocessingProcess(
+                target=_work, args=(child_conn, self.target, self.max_jobs)
+            )
+            process.start()
+        # Only the worker holds the other end of the pipe now, reading from
+        # parent_conn fails when it exits
+        child_conn.close()
+        worker = {'process': process,
+                  'conn': parent_conn,
+                  'jid': None,
+                  'jobs': 0,
+                  'stale': False}
+        self.workers.append(worker)
+        self.io_loop.add_handler(
+            parent_conn.fileno(),
+            functools.partial(self._handle_worker, worker),
+            self.io_loop.READ)
+        log.debug('Started job worker with PID %s', process.pid)
+
+    def accepts(self, fun):
+        '''
+        Return whether the workers may run the jobs of the function fun
+        '''
+        if not isinstance(fun, six.string_types):
+            return False
+        if not self.functions:
+            return True
+        return any(fnmatch.fnmatch(fun, glob) for glob in self.functions)
+
+    def dispatch(self, data, *args):
+        '''
+        Send the job data to an idle worker, return False when the workers
+        cannot take it
+        '''
+        if self._closing or not self.accepts(data.get('fun')):
+            return False
+        for worker in list(self.workers):
+            if worker['jid'] is not None or worker['stale']:
+                continue
+            try:
+                worker['conn'].send((data,) + args)
+            except (IOError, OSError):
+                self._replace(worker)
+                continue
+            worker['jid'] = data['jid']
+            log.debug('Sent job %s to job worker with PID %s',
+                      data['jid'], worker['process'].pid)
+            return True
+        return False
+
+    def recycle(self):
+        '''
+        Replace all the workers, once done with their current job
+        '''
+        for worker in self.workers:
+            worker['stale'] = True
+            if worker['jid'] is None:
+                self._stop(worker)
+
+    def _stop(self, worker):
+        try:
+            worker['conn'].send(None)
+        except (IOError, OSError):
+            pass
+
+    def _handle_worker(self, worker, fd, events):
+        try:
+            while worker['conn'].poll():
+                worker['jobs'] = worker['conn'].recv()
+                worker['jid'] = None
+                if self.max_jobs and worker['jobs'] >= self.max_jobs:
+                    # The worker exits by itself
+                    worker['stale'] = True
+                elif worker['stale']:
+                    self._stop(worker)
+        except (EOFError, IOError, OSError):
+            self._replace(worker)
+
+    def _replace(self, worker):
+        '''
+        Forget about an exited worker and fork another one
+        '''
+        if worker not in self.workers:
+            return
+        self.workers.remove(worker)
+        self.io_loop.remove_handler(worker['conn'].fileno())
+        worker['conn'].close()
+        worker['process'].join(1)
+        if worker['jid'] is not None:
+            log.info('Job worker with PID %s exited while running job %s',
+                     worker['process'].pid, worker['jid'])
+        else:
+            log.debug('Job worker with PID %s exited after %s jobs',
+                      worker['process'].pid, worker['jobs'])
+        if not self._closing:
+            self._spawn()
+
+    def close(self):
+        '''
+        Stop using the workers, they exit once done with their current job
+        '''
+        if self._closing:
+            return
+        self._closing = True
+        for worker in self.workers:
+            self._stop(worker)
+            self.io_loop.remove_handler(worker['conn'].fileno())
+            worker['conn'].close()
+        self.workers = []
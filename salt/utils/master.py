@@ -371,6 +371,8 @@ class MasterPillarUtil(object):
                     self.cache.store(bank, 'data', {'grains': minion_grains})
                 elif clear_grains and minion_pillar:
                     self.cache.store(bank, 'data', {'pillar': minion_pillar})
+                if clear_pillar or clear_grains:
+                    salt.utils.minions.minion_data_updated(self.opts, minion_id)
                 if clear_mine:
                     # Delete the whole mine file
                     self.cache.flush(bank, 'mine')
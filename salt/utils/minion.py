@@ -5,24 +5,177 @@ Utility functions for minions
 
 # Import Python Libs
 from __future__ import absolute_import, unicode_literals
+import errno
 import os
 import logging
 import threading
 
 # Import Salt Libs
 import salt.payload
+import salt.utils.event
 import salt.utils.files
 import salt.utils.platform
 import salt.utils.process
 
 log = logging.getLogger(__name__)
 
+# The job registry of the minion process, see start_job_registry
+_REGISTRY = None
+
+
+class JobRegistry(object):
+    '''
+    The jobs running on the minion, kept in memory by the minion process
+
+    Jobs tell the minion process when they start and finish, the proc files
+    are only read once, when the registry is created, to find the jobs which
+    survived a previous minion process. Jobs which die without telling, for
+    instance when killed by ``saltutil.kill_job``, are dropped as soon as they
+    are looked up.
+    '''
+    def __init__(self, opts):
+        self.opts = opts
+        self.pid = os.getpid()
+        self.proc_dir = os.path.join(opts['cachedir'], 'proc')
+        self.jobs = {}
+        for data in _scan(opts):
+            self.jobs[data['jid']] = data
+
+    def add(self, data):
+        '''
+        Add a job, data being the contents of its proc file
+        '''
+        # The job is over already if it removed its proc file
+        if os.path.isfile(os.path.join(self.proc_dir, data['jid'])):
+            self.jobs[data['jid']] = data
+
+    def remove(self, jid):
+        '''
+        Remove a finished job
+        '''
+        self.jobs.pop(jid, None)
+
+    def get(self, jid):
+        '''
+        Return the data of a running job, or None
+        '''
+        data = self.jobs.get(jid)
+        if data is None or not self._check(data):
+            return None
+        return data
+
+    def running(self):
+        '''
+        Return the data of the running jobs
+        '''
+        current_thread = threading.currentThread().name
+        ret = []
+        for data in list(self.jobs.values()):
+            if not self._check(data):
+                continue
+            # Like when reading the proc files, leave out the job asking
+            if not self.opts.get('multiprocessing') and data['jid'] == current_thread:
+                continue
+            ret.append(data)
+        return ret
+
+    def _check(self, data):
+        '''
+        Return whether the process of a job is still running, forget about the
+        job otherwise
+        '''
+        if data['pid'] == self.pid:
+            # A job thread of the minion process
+            if data['jid'] in [thread.name for thread in threading.enumerate()]:
+                return True
+        elif salt.utils.process.os_is_running(data['pid']):
+            return True
+        self.jobs.pop(data['jid'], None)
+        try:
+            os.remove(os.path.join(self.proc_dir, data['jid']))
+        except OSError:
+            pass
+        return False
+
+
+def start_job_registry(opts):
+    '''
+    Create the job registry of this process, which then answers running()
+    '''
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None or _REGISTRY.pid != os.getpid():
+        _REGISTRY = JobRegistry(opts)
+    return _REGISTRY
+
+
+def _get_job_registry():
+    '''
+    Return the job registry of this process, processes forked from the
+    minion process have none
+    '''
+    if _REGISTRY is not None and _REGISTRY.pid == os.getpid():
+        return _REGISTRY
+    return None
+
+
+def _notify(opts, tag, data):
+    '''
+    Tell the job registry of the minion process about a job
+    '''
+    if not opts.get('job_registry'):
+        return
+    registry = _get_job_registry()
+    if registry is not None:
+        # Job threads of the minion process
+        if tag == '__job_start':
+            registry.add(data)
+        else:
+            registry.remove(data['jid'])
+        return
+    event = salt.utils.event.get_event('minion', opts=opts, listen=False)
+    try:
+        event.fire_event(data, tag)
+    finally:
+        event.destroy()
+
+
+def job_started(opts, data):
+    '''
+    Tell the minion process that a job started, data being the contents of the
+    proc file it wrote
+    '''
+    _notify(opts, '__job_start', data)
+
+
+def job_finished(opts, path):
+    '''
+    Remove the proc file of a finished job and tell the minion process, when
+    it keeps a job registry
+    '''
+    if not opts.get('job_registry'):
+        return
+    try:
+        os.remove(path)
+    except OSError as exc:
+        if exc.errno != errno.ENOENT:
+            log.error('Failed to remove the proc file %s: %s', path, exc)
+    _notify(opts, '__job_finish', {'jid': os.path.basename(path)})
+
 
 def running(opts):
     '''
     Return the running jobs on this minion
     '''
+    registry = _get_job_registry()
+    if registry is not None:
+        return registry.running()
+    return _scan(opts)
+
 
+def _scan(opts):
+    '''
+    Return the running jobs on this minion, read from their proc files
+    '''
     ret = []
     proc_dir = os.path.join(opts['cachedir'], 'proc')
     if not os.path.isdir(proc_dir):
@@ -10,17 +10,20 @@ import os
 import fnmatch
 import re
 import logging
+import threading
+import time
 
 # Import salt libs
 import salt.payload
 import salt.roster
+import salt.utils.atomicfile
 import salt.utils.data
 import salt.utils.files
 import salt.utils.network
 import salt.utils.stringutils
 import salt.utils.versions
 from salt.defaults import DEFAULT_TARGET_DELIM
-from salt.exceptions import CommandExecutionError, SaltCacheError
+from salt.exceptions import CommandExecutionError, SaltCacheError, SaltInvocationError
 import salt.auth.ldap
 import salt.cache
 from salt.ext import six
@@ -182,6 +185,535 @@ def nodegroup_comp(nodegroup, nodegroups, skip=None, first_call=True):
         return ret
 
 
+COMPOUND_OPERS = ('and', 'or', 'not', '(', ')')
+# Number of compiled compound targets to keep
+COMPOUND_CACHE_SIZE = 1024
+_COMPOUND_CACHE = {}
+
+
+class _CompoundParser(object):
+    '''
+    Recursive descent parser for compound targets. ``and`` binds tighter
+    than ``or``, ``not`` binds tightest and implies an ``and`` when it
+    directly follows a term or a closing parenthesis.
+
+    The nodes of the tree are tuples:
+
+    - ``('or', [node, ...])``
+    - ``('and', [node, ...])``
+    - ``('not', node)``
+    - ``('term', engine, delimiter, pattern, word)``, with ``engine`` None
+      for globs
+    '''
+    def __init__(self, words):
+        self.words = words
+        self.pos = 0
+
+    def _peek(self):
+        if self.pos < len(self.words):
+            return self.words[self.pos]
+        return None
+
+    def _next(self):
+        word = self._peek()
+        self.pos += 1
+        return word
+
+    def parse(self):
+        node = self._or()
+        if self._peek() is not None:
+            if self._peek() == ')':
+                raise SaltInvocationError('unexpected right parenthesis')
+            raise SaltInvocationError(
+                'unexpected "{0}"'.format(self._peek()))
+        return node
+
+    def _or(self):
+        nodes = [self._and()]
+        while self._peek() == 'or':
+            self._next()
+            nodes.append(self._and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def _and(self):
+        nodes = [self._unary()]
+        while self._peek() in ('and', 'not'):
+            if self._peek() == 'and':
+                self._next()
+            nodes.append(self._unary())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def _unary(self):
+        word = self._next()
+        if word is None:
+            raise SaltInvocationError('unexpected end of expression')
+        if word == 'not':
+            return ('not', self._unary())
+        if word == '(':
+            node = self._or()
+            # Like the old evaluator, parentheses left open at the end of
+            # the expression are closed implicitly
+            if self._peek() == ')':
+                self._next()
+            elif self._peek() is not None:
+                raise SaltInvocationError(
+                    'unexpected "{0}"'.format(self._peek()))
+            return node
+        if word in COMPOUND_OPERS:
+            raise SaltInvocationError('unexpected operator "{0}"'.format(word))
+        target_info = parse_target(word)
+        return ('term',
+                target_info['engine'],
+                target_info['delimiter'],
+                target_info['pattern'],
+                word)
+
+
+def compile_compound(expr, nodegroups=None):
+    '''
+    Parse a compound target, given as a string or as a list of words, into a
+    tree of tuples which can be evaluated with :py:func:`evaluate_compound`.
+    Nodegroups are expanded in place. The trees are cached by expression.
+
+    Raises SaltInvocationError if the expression is not valid.
+    '''
+    if isinstance(expr, six.string_types):
+        words = expr.split()
+    elif isinstance(expr, (list, tuple)):
+        words = list(expr)
+    else:
+        raise SaltInvocationError(
+            'compound target is neither string, list nor tuple')
+    key = tuple(words)
+    if any('N@' in word for word in words):
+        # The expansion depends on the nodegroups configuration
+        key += (repr(sorted((nodegroups or {}).items())),)
+    try:
+        node = _COMPOUND_CACHE[key]
+    except KeyError:
+        pass
+    else:
+        if node[0] == 'error':
+            raise SaltInvocationError(node[1])
+        return node
+
+    expanded = []
+    while words:
+        word = words.pop(0)
+        if word not in COMPOUND_OPERS:
+            target_info = parse_target(word)
+            if target_info['engine'] == 'N':
+                decomposed = nodegroup_comp(target_info['pattern'], nodegroups or {})
+                if decomposed:
+                    words = list(decomposed) + words
+                continue
+        expanded.append(word)
+    try:
+        node = _CompoundParser(expanded).parse()
+    except SaltInvocationError as exc:
+        # Invalid targets tend to be repeated too
+        node = ('error', exc.strerror)
+    if len(_COMPOUND_CACHE) >= COMPOUND_CACHE_SIZE:
+        _COMPOUND_CACHE.clear()
+    _COMPOUND_CACHE[key] = node
+    if node[0] == 'error':
+        raise SaltInvocationError(node[1])
+    return node
+
+
+def evaluate_compound(node, match_term, minions=None):
+    '''
+    Evaluate a tree from :py:func:`compile_compound`. ``match_term`` is
+    called with each ``term`` node that needs to be evaluated.
+
+    If ``minions`` is None the terms return booleans, and ``and``/``or``
+    stop at the first term which decides the result. Otherwise the terms
+    return sets of minion ids, ``minions`` being the set of all minions, and
+    ``and`` stops as soon as no minion is left.
+    '''
+    kind = node[0]
+    if kind == 'term':
+        return match_term(node)
+    if kind == 'not':
+        ret = evaluate_compound(node[1], match_term, minions)
+        if minions is None:
+            return not ret
+        return minions - ret
+    if kind == 'and':
+        if minions is None:
+            return all(evaluate_compound(sub, match_term) for sub in node[1])
+        ret = None
+        for sub in node[1]:
+            sub_ret = evaluate_compound(sub, match_term, minions)
+            ret = sub_ret if ret is None else ret & sub_ret
+            if not ret:
+                break
+        return ret
+    if minions is None:
+        return any(evaluate_compound(sub, match_term) for sub in node[1])
+    ret = set()
+    for sub in node[1]:
+        ret |= evaluate_compound(sub, match_term, minions)
+    return ret
+
+
+MINION_DATA_INDEX_DIR = 'minion_data_index'
+# Rotate the minion data index journal once it grows past this many bytes
+MINION_DATA_INDEX_JOURNAL_MAX = 1024 * 1024
+_SCALAR_TYPES = six.string_types + six.integer_types + (float, bool, type(None))
+_MINION_DATA_INDEXES = {}
+_MINION_DATA_INDEXES_LOCK = threading.Lock()
+
+
+def _index_token(value):
+    '''
+    Return the value the way subdict_match compares it
+    '''
+    return six.text_type(value).lower()
+
+
+def minion_data_updated(opts, minion_id):
+    '''
+    Record that the cached data of a minion has changed, so that the minion
+    data index of every master process picks it up on its next lookup
+    '''
+    if not opts.get('minion_data_index', False):
+        return
+    index_dir = os.path.join(opts['cachedir'], MINION_DATA_INDEX_DIR)
+    journal = os.path.join(index_dir, 'journal')
+    try:
+        try:
+            os.makedirs(index_dir)
+        except OSError:
+            if not os.path.isdir(index_dir):
+                raise
+        # Appends this small are atomic, every master process may write here
+        with salt.utils.files.fopen(journal, 'ab') as fp_:
+            fp_.write(salt.utils.stringutils.to_bytes('{0}\n'.format(minion_id)))
+            size = fp_.tell()
+        if size > MINION_DATA_INDEX_JOURNAL_MAX:
+            # Readers follow the inode, so they finish reading the old
+            # journal before moving on to the new one
+            os.rename(journal, journal + '.old')
+    except (IOError, OSError) as exc:
+        log.warning('Unable to update the minion data index journal: %s', exc)
+
+
+def get_minion_data_index(opts, search_type):
+    '''
+    Return the minion data index of this process for the given search type,
+    the index is shared between all the CkMinions instances of a process
+    '''
+    key = (opts['cachedir'], search_type)
+    with _MINION_DATA_INDEXES_LOCK:
+        if key not in _MINION_DATA_INDEXES:
+            _MINION_DATA_INDEXES[key] = MinionDataIndex(opts, search_type)
+        return _MINION_DATA_INDEXES[key]
+
+
+class MinionDataIndex(object):
+    '''
+    Inverted index of the grains or pillar data in the minion data cache
+
+    Two tables are kept, both mapping to sets of minion ids:
+
+    ``leaves``
+        ``(path, value)`` for every scalar, or scalar list member, which is
+        reachable from the top of the data through dictionaries only. A hit
+        in this table is a match, no need to look at the data again.
+
+    ``tokens``
+        ``(top level key, value)`` for every scalar, list member and
+        dictionary key anywhere below a top level key. A minion which has
+        none of the values of a target below the top level key of the
+        target can not match it.
+
+    Values are lowercased strings, just like ``subdict_match`` compares
+    them. Minions which are in ``tokens`` but not in ``leaves`` are checked
+    against their cached data with ``subdict_match``, so the results are
+    always the same as a full scan of the cache.
+
+    The index is saved under the master cachedir so a new process does not
+    need to read the whole cache. Updates are picked up from the journal
+    written by :py:func:`minion_data_updated`, and the modification times
+    of the cached data are checked every ``minion_data_index_refresh``
+    seconds to pick up changes made by other masters sharing the cache.
+    '''
+    def __init__(self, opts, search_type):
+        self.opts = opts
+        self.search_type = search_type
+        self.cache = salt.cache.factory(opts)
+        self.serial = salt.payload.Serial(opts)
+        self.index_dir = os.path.join(opts['cachedir'], MINION_DATA_INDEX_DIR)
+        self.journal = os.path.join(self.index_dir, 'journal')
+        self.snapshot = os.path.join(self.index_dir, '{0}.p'.format(search_type))
+        self.refresh_interval = opts.get('minion_data_index_refresh', 300)
+        # minion id -> [updated, has_data, leaves, tokens]
+        self.minions = {}
+        self.leaves = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self._journal_pos = None
+        self._last_sweep = 0
+
+    @staticmethod
+    def _entries(data):
+        '''
+        Return the leaves and tokens to index for the data of a minion
+        '''
+        leaves = set()
+        tokens = set()
+
+        def _walk(top, value, path):
+            if isinstance(value, dict):
+                for key, sub in six.iteritems(value):
+                    tokens.add((top, _index_token(key)))
+                    if path is not None and isinstance(key, six.string_types):
+                        _walk(top, sub, path + (key,))
+                    else:
+                        _walk(top, sub, None)
+            elif isinstance(value, (list, tuple)):
+                for member in value:
+                    token = _index_token(member)
+                    tokens.add((top, token))
+                    if isinstance(member, _SCALAR_TYPES):
+                        if path is not None:
+                            leaves.add((path, token))
+                    else:
+                        _walk(top, member, None)
+            else:
+                token = _index_token(value)
+                tokens.add((top, token))
+                if path is not None:
+                    leaves.add((path, token))
+
+        for top, value in six.iteritems(data):
+            if isinstance(top, six.string_types):
+                _walk(top, value, (top,))
+        return list(leaves), list(tokens)
+
+    def _add(self, id_, record):
+        self.minions[id_] = record
+        for entry in record[2]:
+            self.leaves.setdefault(entry, set()).add(id_)
+        for entry in record[3]:
+            self.tokens.setdefault(entry, set()).add(id_)
+
+    def _remove(self, id_):
+        record = self.minions.pop(id_, None)
+        if record is None:
+            return
+        for table, entries in ((self.leaves, record[2]),
+                               (self.tokens, record[3])):
+            for entry in entries:
+                ids = table.get(entry)
+                if ids is not None:
+                    ids.discard(id_)
+                    if not ids:
+                        del table[entry]
+
+    def _index_minion(self, id_):
+        '''
+        (Re)index the cached data of a single minion
+        '''
+        bank = 'minions/{0}'.format(id_)
+        self._remove(id_)
+        if not self.cache.contains(bank):
+            return
+        # Read the timestamp first, a concurrent update is then seen as
+        # stale by the next sweep instead of being missed
+        updated = self.cache.updated(bank, 'data')
+        mdata = self.cache.fetch(bank, 'data')
+        data = mdata.get(self.search_type) if mdata else None
+        if isinstance(data, dict):
+            leaves, tokens = self._entries(data)
+        else:
+            leaves, tokens = [], []
+        self._add(id_, [updated, mdata is not None, leaves, tokens])
+
+    def _sweep(self):
+        '''
+        Compare the index with the cache, reindex every minion whose data
+        changed and drop the minions which are gone. Return True if the
+        index was changed.
+        '''
+        changed = False
+        cached = set(self.cache.list('minions'))
+        for id_ in set(self.minions) - cached:
+            self._remove(id_)
+            changed = True
+        for id_ in cached:
+            record = self.minions.get(id_)
+            updated = self.cache.updated('minions/{0}'.format(id_), 'data')
+            if record is None or record[0] != updated:
+                self._index_minion(id_)
+                changed = True
+        self._last_sweep = time.time()
+        return changed
+
+    def _load(self):
+        '''
+        Load the saved index, along with the journal position it is current
+        up to
+        '''
+        try:
+            with salt.utils.files.fopen(self.snapshot, 'rb') as fp_:
+                snapshot = self.serial.load(fp_)
+            journal_pos = tuple(snapshot['journal'])
+            minions = snapshot['minions']
+        except (IOError, OSError):
+            return
+        except Exception as exc:
+            log.warning('Discarding unreadable minion data index %s: %s',
+                        self.snapshot, exc)
+            return
+        for id_, record in six.iteritems(minions):
+            # msgpack hands back lists, the tables need hashable tuples
+            record[2] = [(tuple(path), token) for path, token in record[2]]
+            record[3] = [tuple(entry) for entry in record[3]]
+            self._add(id_, record)
+        self._journal_pos = journal_pos
+
+    def _save(self):
+        try:
+            try:
+                os.makedirs(self.index_dir)
+            except OSError:
+                if not os.path.isdir(self.index_dir):
+                    raise
+            with salt.utils.atomicfile.atomic_open(self.snapshot, 'wb') as fp_:
+                self.serial.dump({'journal': list(self._journal_pos),
+                                  'minions': self.minions},
+                                 fp_)
+        except (IOError, OSError) as exc:
+            log.warning('Unable to save the minion data index %s: %s',
+                        self.snapshot, exc)
+
+    def _stat_journal(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def _read_journal(self, path, start, end):
+        '''
+        Return the minion ids written to a journal between two offsets and
+        the offset of the end of the last complete line
+        '''
+        if end <= start:
+            return set(), start
+        with salt.utils.files.fopen(path, 'rb') as fp_:
+            fp_.seek(start)
+            data = fp_.read(end - start)
+        data = data[:data.rfind(b'\n') + 1]
+        ids = set(salt.utils.stringutils.to_unicode(data).splitlines())
+        return ids, start + len(data)
+
+    def _journal_updates(self):
+        '''
+        Return the minion ids which were written to the journal since the
+        last call, or None if updates may have been missed
+        '''
+        inode, size = self._stat_journal(self.journal)
+        last_inode, pos = self._journal_pos
+        if inode == last_inode:
+            ids, pos = self._read_journal(self.journal, pos, size)
+            self._journal_pos = (inode, pos)
+            return ids
+        if last_inode is None:
+            # The journal did not exist yet, it holds every update since
+            ids = set()
+        else:
+            # The journal was rotated, finish the old one first
+            ids = None
+            old = self.journal + '.old'
+            old_inode, old_size = self._stat_journal(old)
+            if old_inode == last_inode:
+                ids, _ = self._read_journal(old, pos, old_size)
+        if ids is None:
+            self._journal_pos = (inode, size)
+            return None
+        new_ids, pos = self._read_journal(self.journal, 0, size)
+        self._journal_pos = (inode, pos)
+        return ids | new_ids
+
+    def refresh(self):
+        '''
+        Bring the index up to date with the minion data cache
+        '''
+        if self._journal_pos is None:
+            self._load()
+            if self._journal_pos is None:
+                # Nothing to start from, the sweep below indexes everything
+                self._journal_pos = self._stat_journal(self.journal)
+            self._last_sweep = 0
+        updates = self._journal_updates()
+        for id_ in updates or ():
+            self._index_minion(id_)
+        # The modification times only have a resolution of a second, so the
+        # sweep may miss quick updates which the journal does not
+        if updates is None \
+                or time.time() - self._last_sweep >= self.refresh_interval:
+            if self._sweep() or updates:
+                self._save()
+
+    @staticmethod
+    def indexable(expr, regex_match=False, exact_match=False):
+        '''
+        Return True if the expression can be resolved from the index. Regular
+        expressions, globs and the ``*`` key wildcards need a full scan.
+        '''
+        if regex_match or '*' in expr:
+            return False
+        if not exact_match and ('?' in expr or '[' in expr):
+            return False
+        return True
+
+    def search(self, expr, delimiter=DEFAULT_TARGET_DELIM, exact_match=False):
+        '''
+        Return the set of minion ids whose data matches the expression. The
+        expression must be :py:meth:`indexable`.
+        '''
+        splits = expr.split(delimiter)
+        top = splits[0]
+        matched = set()
+        candidates = set()
+        for idx in range(1, len(splits)):
+            matchstr = delimiter.join(splits[idx:])
+            matched |= self.leaves.get(
+                (tuple(splits[:idx]), matchstr.lower()), set())
+            # Dictionaries are matched again with the default delimiter,
+            # which may end the match on any part of the expression
+            parts = matchstr.split(DEFAULT_TARGET_DELIM)
+            for pos in range(len(parts)):
+                candidates |= self.tokens.get(
+                    (top, DEFAULT_TARGET_DELIM.join(parts[pos:]).lower()), set())
+        for id_ in candidates - matched:
+            mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+            if mdata is not None \
+                    and salt.utils.data.subdict_match(mdata.get(self.search_type),
+                                                      expr,
+                                                      delimiter=delimiter,
+                                                      exact_match=exact_match):
+                matched.add(id_)
+        return matched
+
+    def check(self, expr, delimiter, greedy, minions, exact_match=False):
+        '''
+        Filter the minions the same way CkMinions._check_cache_minions does
+        '''
+        with self.lock:
+            self.refresh()
+            matched = self.search(expr, delimiter, exact_match)
+            if greedy:
+                return [id_ for id_ in minions
+                        if id_ in matched
+                        or id_ not in self.minions
+                        or not self.minions[id_][1]]
+            return list(matched)
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -275,6 +807,9 @@ class CkMinions(object):
         If not 'greedy' return the only minions have cache data and matched by the condition.
         '''
         cache_enabled = self.opts.get('minion_data_cache', False)
+        use_index = cache_enabled \
+            and self.opts.get('minion_data_index', False) \
+            and MinionDataIndex.indexable(expr, regex_match, exact_match)
 
         def list_cached_minions():
             return self.cache.list('minions')
@@ -284,12 +819,24 @@ class CkMinions(object):
             for fn_ in salt.utils.data.sorted_ignorecase(os.listdir(os.path.join(self.opts['pki_dir'], self.acc))):
                 if not fn_.startswith('.') and os.path.isfile(os.path.join(self.opts['pki_dir'], self.acc, fn_)):
                     minions.append(fn_)
+        elif use_index:
+            # The index knows the cached minions
+            minions = []
         elif cache_enabled:
             minions = list_cached_minions()
         else:
             return {'minions': [],
                     'missing': []}
 
+        if use_index:
+            index = get_minion_data_index(self.opts, search_type)
+            return {'minions': index.check(expr,
+                                           delimiter,
+                                           greedy,
+                                           minions,
+                                           exact_match=exact_match),
+                    'missing': []}
+
         if cache_enabled:
             if greedy:
                 cminions = list_cached_minions()
@@ -491,124 +1038,35 @@ class CkMinions(object):
                 ref['I'] = self._check_pillar_exact_minions
                 ref['J'] = self._check_pillar_exact_minions
 
-            results = []
-            unmatched = []
-            opers = ['and', 'or', 'not', '(', ')']
             missing = []
 
-            if isinstance(expr, six.string_types):
-                words = expr.split()
-            else:
-                # we make a shallow copy in order to not affect the passed in arg
-                words = expr[:]
-
-            while words:
-                word = words.pop(0)
-                target_info = parse_target(word)
-
-                # Easy check first
-                if word in opers:
-                    if results:
-                        if results[-1] == '(' and word in ('and', 'or'):
-                            log.error('Invalid beginning operator after "(": %s', word)
-                            return {'minions': [], 'missing': []}
-                        if word == 'not':
-                            if not results[-1] in ('&', '|', '('):
-                                results.append('&')
-                            results.append('(')
-                            results.append(six.text_type(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == 'and':
-                            results.append('&')
-                        elif word == 'or':
-                            results.append('|')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        elif word == ')':
-                            if not unmatched or unmatched[-1] != '(':
-                                log.error('Invalid compound expr (unexpected '
-                                          'right parenthesis): %s',
-                                          expr)
-                                return {'minions': [], 'missing': []}
-                            results.append(word)
-                            unmatched.pop()
-                            if unmatched and unmatched[-1] == '-':
-                                results.append(')')
-                                unmatched.pop()
-                        else:  # Won't get here, unless oper is added
-                            log.error('Unhandled oper in compound expr: %s',
-                                      expr)
-                            return {'minions': [], 'missing': []}
-                    else:
-                        # seq start with oper, fail
-                        if word == 'not':
-                            results.append('(')
-                            results.append(six.text_type(set(minions)))
-                            results.append('-')
-                            unmatched.append('-')
-                        elif word == '(':
-                            results.append(word)
-                            unmatched.append(word)
-                        else:
-                            log.error(
-                                'Expression may begin with'
-                                ' binary operator: %s', word
-                            )
-                            return {'minions': [], 'missing': []}
-
-                elif target_info and target_info['engine']:
-                    if 'N' == target_info['engine']:
-                        # if we encounter a node group, just evaluate it in-place
-                        decomposed = nodegroup_comp(target_info['pattern'], nodegroups)
-                        if decomposed:
-                            words = decomposed + words
-                        continue
-
-                    engine = ref.get(target_info['engine'])
-                    if not engine:
-                        # If an unknown engine is called at any time, fail out
-                        log.error(
-                            'Unrecognized target engine "%s" for'
-                            ' target expression "%s"',
-                            target_info['engine'],
-                            word,
-                        )
-                        return {'minions': [], 'missing': []}
-
-                    engine_args = [target_info['pattern']]
-                    if target_info['engine'] in ('G', 'P', 'I', 'J'):
-                        engine_args.append(target_info['delimiter'] or ':')
-                    engine_args.append(greedy)
-
-                    _results = engine(*engine_args)
-                    results.append(six.text_type(set(_results['minions'])))
-                    missing.extend(_results['missing'])
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-                else:
+            def _match_term(term):
+                engine, delimiter, pattern, word = term[1:]
+                if not engine:
                     # The match is not explicitly defined, evaluate as a glob
-                    _results = self._check_glob_minions(word, True)
-                    results.append(six.text_type(set(_results['minions'])))
-                    if unmatched and unmatched[-1] == '-':
-                        results.append(')')
-                        unmatched.pop()
-
-            # Add a closing ')' for each item left in unmatched
-            results.extend([')' for item in unmatched])
-
-            results = ' '.join(results)
-            log.debug('Evaluating final compound matching expr: %s',
-                      results)
+                    return set(self._check_glob_minions(word, True)['minions'])
+                check = ref.get(engine)
+                if not check:
+                    # If an unknown engine is called at any time, fail out
+                    raise SaltInvocationError(
+                        'unrecognized target engine "{0}" for target '
+                        'expression "{1}"'.format(engine, word))
+                engine_args = [pattern]
+                if engine in ('G', 'P', 'I', 'J'):
+                    engine_args.append(delimiter or ':')
+                engine_args.append(greedy)
+                _results = check(*engine_args)
+                missing.extend(_results['missing'])
+                return set(_results['minions'])
+
             try:
-                minions = list(eval(results))  # pylint: disable=W0123
-                return {'minions': minions, 'missing': missing}
-            except Exception:
-                log.error('Invalid compound target: %s', expr)
+                matched = evaluate_compound(compile_compound(expr, nodegroups),
+                                            _match_term,
+                                            minions)
+            except SaltInvocationError as exc:
+                log.error('Invalid compound target %s: %s', expr, exc)
                 return {'minions': [], 'missing': []}
+            return {'minions': list(matched), 'missing': missing}
 
         return {'minions': list(minions),
                 'missing': []}
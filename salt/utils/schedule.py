@@ -18,6 +18,7 @@ import time
 import copy
 import signal
 import datetime
+import heapq
 import itertools
 import threading
 import logging
@@ -148,6 +149,13 @@ class Schedule(object):
         self.schedule_returner = self.option('schedule_returner')
         # Keep track of the lowest loop interval needed in this variable
         self.loop_interval = six.MAXSIZE
+        # The next evaluation of the jobs, a heap of (time, count, name) and
+        # a dict mapping the name of each job to its (time, data), time being
+        # None when only modifying the job can make it run
+        self._queue = []
+        self._deadlines = {}
+        self._queued = itertools.count()
+        self._last_eval = None
         if not self.standalone:
             clean_proc_dir(opts)
         if cleanup:
@@ -302,6 +310,7 @@ class Schedule(object):
         self.enabled = True
         self.splay = None
         self.opts['schedule'] = {}
+        self._requeue()
 
     def delete_job_prefix(self, name, persist=True):
         '''
@@ -378,6 +387,7 @@ class Schedule(object):
         # ensure job exists, then enable it
         if name in self.opts['schedule']:
             self.opts['schedule'][name]['enabled'] = True
+            self._requeue(name)
             log.info('Enabling job %s in scheduler', name)
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -398,6 +408,7 @@ class Schedule(object):
         # ensure job exists, then disable it
         if name in self.opts['schedule']:
             self.opts['schedule'][name]['enabled'] = False
+            self._requeue(name)
             log.info('Disabling job %s in scheduler', name)
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -467,6 +478,7 @@ class Schedule(object):
         Enable the scheduler.
         '''
         self.opts['schedule']['enabled'] = True
+        self._requeue()
 
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
@@ -478,6 +490,7 @@ class Schedule(object):
         Disable the scheduler.
         '''
         self.opts['schedule']['enabled'] = False
+        self._requeue()
 
         # Fire the complete event back along with updated list of schedule
         evt = salt.utils.event.get_event('minion', opts=self.opts, listen=False)
@@ -490,6 +503,7 @@ class Schedule(object):
         '''
         # Remove all jobs from self.intervals
         self.intervals = {}
+        self._requeue()
 
         if 'schedule' in schedule:
             schedule = schedule['schedule']
@@ -542,6 +556,7 @@ class Schedule(object):
                 self.opts['schedule'][name]['run_explicit'] = []
             self.opts['schedule'][name]['run_explicit'].append({'time': new_time,
                                                                 'time_fmt': time_fmt})
+            self._requeue(name)
 
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -566,6 +581,7 @@ class Schedule(object):
                 self.opts['schedule'][name]['skip_explicit'] = []
             self.opts['schedule'][name]['skip_explicit'].append({'time': time,
                                                                  'time_fmt': time_fmt})
+            self._requeue(name)
 
         elif name in self._get_schedule(include_opts=False):
             log.warning("Cannot modify job %s, it's in the pillar!", name)
@@ -601,6 +617,109 @@ class Schedule(object):
         schedule = self._get_schedule()
         return schedule.get(name, {})
 
+    def _requeue(self, name=None):
+        '''
+        Evaluate a modified job, or all of them, on the next run of eval
+        '''
+        if name is None:
+            self._queue = []
+            self._deadlines = {}
+        else:
+            self._deadlines.pop(name, None)
+
+    def _queue_job(self, name, data, deadline):
+        '''
+        Queue the next evaluation of a job
+        '''
+        self._deadlines[name] = (deadline, data)
+        if deadline is not None:
+            heapq.heappush(self._queue, (deadline, next(self._queued), name))
+        if len(self._queue) > 2 * len(self._deadlines) + 100:
+            # Drop the entries of the modified and deleted jobs
+            self._queue = [(deadline, next(self._queued), name)
+                           for name, (deadline, data) in six.iteritems(self._deadlines)
+                           if deadline is not None]
+            heapq.heapify(self._queue)
+
+    def _due_jobs(self, schedule, hidden, now, loop_interval):
+        '''
+        Yield the name and data of the jobs to evaluate at now: the jobs whose
+        evaluation is due, and the new and modified ones. Once the caller
+        evaluated a job, queue its next evaluation.
+        '''
+        if self._last_eval is not None and now < self._last_eval:
+            # The clock went back, the queued times are meaningless
+            self._requeue()
+        self._last_eval = now
+
+        for name in list(self._deadlines):
+            if name not in schedule:
+                del self._deadlines[name]
+        for name, data in six.iteritems(schedule):
+            if name in hidden:
+                continue
+            queued = self._deadlines.get(name)
+            if queued is None or queued[1] is not data:
+                self._queue_job(name, data, now)
+
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            deadline, _, name = heapq.heappop(self._queue)
+            queued = self._deadlines.get(name)
+            if queued is not None and queued[0] == deadline and name not in due:
+                due.append(name)
+
+        for name in due:
+            data = schedule[name]
+            yield name, data
+            self._queue_job(name, data, self._next_eval(data, now, loop_interval))
+
+    def _next_eval(self, data, now, loop_interval):
+        '''
+        Return when an evaluated job has to be evaluated again, from the fire
+        times eval computed. A job in its run window is evaluated again on the
+        next run of eval, like every job used to be.
+        '''
+        if not isinstance(data, dict) or data.get('_error'):
+            return None
+        if 'enabled' in data and not data['enabled']:
+            return None
+        if data.get('_run_on_start'):
+            return now
+
+        times = []
+        fire_time = data.get('_splay') or data.get('_next_fire_time')
+        if '_seconds' in data or 'cron' in data:
+            # Unknown fire times are computed on the next run of eval
+            times.append(max(fire_time, now) if fire_time else now)
+        elif 'when' in data:
+            # The whens are parsed again on every run of eval: a time of day
+            # moves to its next occurrence, and the whens read from the
+            # pillar or the grains may change
+            times.append(now)
+        elif 'once' in data:
+            if fire_time is None:
+                if not data.get('_continue'):
+                    times.append(now)
+            elif fire_time > now:
+                times.append(fire_time)
+            elif fire_time + loop_interval >= now:
+                times.append(now)
+
+        for run_time in data.get('run_explicit', []):
+            if not isinstance(run_time, datetime.datetime):
+                try:
+                    run_time = datetime.datetime.strptime(run_time['time'],
+                                                          run_time['time_fmt'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+            if run_time > now:
+                times.append(run_time)
+            elif run_time + loop_interval > now:
+                times.append(now)
+
+        return min(times) if times else None
+
     def handle_func(self, multiprocessing_enabled, func, data):
         '''
         Execute this method in a multiprocess or thread
@@ -665,6 +784,7 @@ class Schedule(object):
                     # write this to /var/cache/salt/minion/proc
                     with salt.utils.files.fopen(proc_fn, 'w+b') as fp_:
                         fp_.write(salt.payload.Serial(self.opts).dumps(ret))
+                    salt.utils.minion.job_started(self.opts, ret)
 
             args = tuple()
             if 'args' in data:
@@ -810,6 +930,7 @@ class Schedule(object):
                 log.debug('schedule.handle_func: Removing %s', proc_fn)
 
                 try:
+                    salt.utils.minion.job_finished(self.opts, proc_fn)
                     os.unlink(proc_fn)
                 except OSError as exc:
                     if exc.errno == errno.EEXIST or exc.errno == errno.ENOENT:
@@ -1333,11 +1454,13 @@ class Schedule(object):
                    'skip_function',
                    'skip_during_range',
                    'splay']
-        for job, data in six.iteritems(schedule):
 
-            # Skip anything that is a global setting
-            if job in _hidden:
-                continue
+        if not now:
+            now = datetime.datetime.now()
+
+        # Only evaluate the jobs which may run now, the other ones keep the
+        # fire times computed when they were last evaluated
+        for job, data in self._due_jobs(schedule, _hidden, now, loop_interval):
 
             # Clear these out between runs
             for item in ['_continue',
@@ -1384,9 +1507,6 @@ class Schedule(object):
                     '_run_on_start' not in data:
                 data['_run_on_start'] = True
 
-            if not now:
-                now = datetime.datetime.now()
-
             # Used for quick lookups when detecting invalid option
             # combinations.
             schedule_keys = set(data.keys())
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+'''
+Pools of master workers dedicated to classes of requests
+
+The ``worker_pools`` master option maps the name of each pool to the number
+of workers in it, the depth of its queue and the commands it handles, for
+instance:
+
+.. code-block:: yaml
+
+    worker_pools:
+      fileserver:
+        worker_threads: 4
+        queue_depth: 2000
+        commands:
+          - _serve_file
+          - _file_hash
+      pillar:
+        worker_threads: 2
+        commands:
+          - _pillar
+
+The requests for any other command go to the ``default`` pool, made of the
+``worker_threads`` workers.
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import logging
+from collections import OrderedDict
+
+# Import salt libs
+from salt.ext import six
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POOL = 'default'
+# The default depth of the queue of a pool, per worker
+DEFAULT_QUEUE_DEPTH = 1000
+# Seconds after which the router stops counting a request as in flight, its
+# worker likely died while handling it
+REQUEST_TIMEOUT = 300
+
+
+def get_pools(opts):
+    '''
+    Return an ordered dict of the worker pools, the default pool first, with
+    the number of workers, queue depth and commands of each of them
+    '''
+    pools = OrderedDict()
+    pools[DEFAULT_POOL] = {'worker_threads': int(opts['worker_threads']),
+                           'queue_depth': None,
+                           'commands': []}
+    configured = opts.get('worker_pools') or {}
+    if not isinstance(configured, dict):
+        log.error('worker_pools must be a dict of pools, ignoring it')
+        return pools
+    for name in sorted(configured):
+        conf = configured[name] or {}
+        if name == DEFAULT_POOL or not isinstance(conf, dict):
+            log.error('Ignoring invalid worker pool %s', name)
+            continue
+        commands = conf.get('commands') or []
+        if isinstance(commands, six.string_types):
+            commands = [commands]
+        try:
+            worker_threads = max(1, int(conf.get('worker_threads', 1)))
+            queue_depth = int(conf.get('queue_depth',
+                                       DEFAULT_QUEUE_DEPTH * worker_threads))
+        except (TypeError, ValueError):
+            log.error('Ignoring invalid worker pool %s', name)
+            continue
+        pools[name] = {'worker_threads': worker_threads,
+                       'queue_depth': queue_depth,
+                       'commands': list(commands)}
+    return pools
+
+
+def get_routes(pools):
+    '''
+    Return a dict mapping commands to the pool handling them
+    '''
+    routes = {}
+    for name, pool in six.iteritems(pools):
+        for cmd in pool['commands']:
+            if cmd in routes:
+                log.error('Command %s is in the worker pools %s and %s, '
+                          'using %s', cmd, routes[cmd], name, routes[cmd])
+                continue
+            routes[cmd] = name
+    return routes
+
+
+def classify(payload, routes):
+    '''
+    Return the name of the pool which handles a request payload. Encrypted
+    loads are classified by the command the minion put next to them, the
+    requests of older minions go to the default pool.
+    '''
+    try:
+        if payload.get('enc') == 'clear':
+            cmd = payload['load'].get('cmd')
+        else:
+            cmd = payload.get('cmd')
+    except (AttributeError, KeyError):
+        return DEFAULT_POOL
+    return routes.get(cmd, DEFAULT_POOL)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark the symmetric encryption of payloads
+
+Encrypts and decrypts random payloads of a few sizes with
+``salt.crypt.Crypticle``, with AES-CBC and HMAC-SHA256 and with AES-GCM when
+it is available, and prints the throughput of each. Payloads smaller than
+``Crypticle.AEAD_MIN_SIZE`` are encrypted with AES-CBC in both modes.
+
+Usage:
+
+    python tests/perf/crypticle.py [SECONDS]
+'''
+
+from __future__ import absolute_import, print_function, unicode_literals
+# Import system libs
+import os
+import sys
+import time
+
+# Import salt libs
+import salt.crypt
+
+SIZES = ((1024, '1 KiB'), (65536, '64 KiB'), (1048576, '1 MiB'))
+DEFAULT_SECONDS = 1.0
+
+
+def run(crypticle, data, seconds):
+    '''
+    Encrypt and decrypt data for about seconds, return the number of bytes
+    which went through each per second
+    '''
+    count = 0
+    encrypt_time = decrypt_time = 0
+    while encrypt_time + decrypt_time < seconds:
+        start = time.time()
+        encr = crypticle.encrypt(data)
+        middle = time.time()
+        crypticle.decrypt(encr)
+        encrypt_time += middle - start
+        decrypt_time += time.time() - middle
+        count += 1
+    return (len(data) * count / encrypt_time,
+            len(data) * count / decrypt_time)
+
+
+def main(seconds):
+    key = salt.crypt.Crypticle.generate_key_string()
+    modes = [('aes-cbc', False)]
+    if salt.crypt.HAS_AEAD:
+        modes.append(('aes-gcm', True))
+    print('{0:>10} {1:>10} {2:>16} {3:>16}'.format(
+        'mode', 'payload', 'encrypt MiB/s', 'decrypt MiB/s'))
+    for name, aead in modes:
+        crypticle = salt.crypt.Crypticle({}, key, aead=aead)
+        for size, label in SIZES:
+            encrypt, decrypt = run(crypticle, os.urandom(size), seconds)
+            print('{0:>10} {1:>10} {2:>16.1f} {3:>16.1f}'.format(
+                name, label, encrypt / 1048576, decrypt / 1048576))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SECONDS)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark requisite resolution in the state system
+
+Builds synthetic lists of low chunks where every chunk requires the chunk
+before it, watches a chunk by name and depends on the previous sls, then
+times how long ``State.check_requisite`` takes to resolve all of them. If the resolution is
+linear the time per chunk should stay flat as the number of chunks grows.
+
+Usage:
+
+    python tests/perf/state_requisites.py [NUM_CHUNKS ...]
+'''
+
+from __future__ import absolute_import, print_function, unicode_literals
+# Import system libs
+import sys
+import time
+
+# Import salt libs
+import salt.state
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+
+def gen_chunks(num):
+    '''
+    Generate num low chunks spread over sls files of 100 chunks each
+    '''
+    chunks = []
+    for idx in range(num):
+        chunk = {'state': 'file',
+                 'fun': 'managed',
+                 '__id__': 'id_{0}'.format(idx),
+                 'name': '/srv/file_{0}'.format(idx),
+                 '__sls__': 'sls_{0}'.format(idx // 100),
+                 '__env__': 'base',
+                 'order': idx}
+        if idx:
+            chunk['require'] = [{'file': 'id_{0}'.format(idx - 1)}]
+            chunk['watch'] = [{'file': '/srv/file_{0}'.format(idx // 2)}]
+        if idx >= 100:
+            chunk['require'].append({'sls': 'sls_{0}'.format(idx // 100 - 1)})
+        chunks.append(chunk)
+    return chunks
+
+
+def get_state():
+    '''
+    Return a State object which is just complete enough to check requisites,
+    without loading any modules
+    '''
+    state = salt.state.State.__new__(salt.state.State)
+    state.states = {'file.mod_watch': None}
+    state.pre = {}
+    state._chunk_index = None
+    state._chunk_index_src = None
+    state._pending_procs = 0
+    return state
+
+
+def run(num):
+    '''
+    Time the requisite checks for num chunks, return the elapsed seconds
+    '''
+    chunks = gen_chunks(num)
+    state = get_state()
+    running = {}
+    start = time.time()
+    for low in chunks:
+        status, _ = state.check_requisite(low, running, chunks)
+        if status == 'unmet':
+            raise RuntimeError('Requisites of {0} were not met'.format(low['__id__']))
+        running[salt.state._gen_tag(low)] = {'result': True, 'changes': {}}
+    return time.time() - start
+
+
+def main(sizes):
+    print('{0:>10} {1:>12} {2:>16}'.format('chunks', 'seconds', 'usec/chunk'))
+    for num in sizes:
+        elapsed = run(num)
+        print('{0:>10} {1:>12.3f} {2:>16.2f}'.format(
+            num, elapsed, elapsed * 1000000 / num))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
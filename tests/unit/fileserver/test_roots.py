@@ -189,3 +189,91 @@ class RootsLimitTraversalTest(TestCase, AdaptedConfigurationTestCaseMixin):
         self.assertIn('test_deep.test', ret)
         self.assertIn('test_deep.a.test', ret)
         self.assertNotIn('test_deep.b.2.test', ret)
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class RootsIndexTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleMockMixin):
+    '''
+    Tests for the roots_index option
+    '''
+    def setup_loader_modules(self):
+        self.tmp_cachedir = tempfile.mkdtemp(dir=TMP)
+        self.roots = [tempfile.mkdtemp(dir=TMP), tempfile.mkdtemp(dir=TMP)]
+        self.opts = self.get_temp_config('master')
+        self.opts['cachedir'] = self.tmp_cachedir
+        self.opts['file_roots'] = {'base': self.roots}
+        self.opts['roots_index'] = True
+        self.opts['fileserver_events'] = False
+        self._write(self.roots[0], 'top.sls', 'base: {}')
+        self._write(self.roots[0], 'web/init.sls', 'web')
+        self._write(self.roots[1], 'web/init.sls', 'shadowed')
+        self._write(self.roots[1], 'db/init.sls', 'db')
+        os.makedirs(os.path.join(self.roots[1], 'empty'))
+        return {roots: {'__opts__': self.opts}}
+
+    def tearDown(self):
+        for path in self.roots + [self.tmp_cachedir]:
+            salt.utils.files.rm_rf(path)
+        del self.opts
+
+    @staticmethod
+    def _write(root, rel, data):
+        path = os.path.join(root, rel)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.files.fopen(path, 'w') as fp_:
+            fp_.write(data)
+        return path
+
+    def _hash(self, rel):
+        load = {'saltenv': 'base', 'path': rel}
+        return roots.file_hash(load, roots.find_file(rel))
+
+    def test_lists(self):
+        with patch.object(roots, '_walk_env', wraps=roots._walk_env) as walk:
+            roots.update()
+            self.assertEqual(walk.call_count, 1)
+            self.assertEqual(roots.file_list({'saltenv': 'base'}),
+                             ['db/init.sls', 'top.sls', 'web/init.sls'])
+            self.assertEqual(roots.dir_list({'saltenv': 'base'}),
+                             ['db', 'empty', 'web'])
+            self.assertEqual(roots.file_list_emptydirs({'saltenv': 'base'}),
+                             ['empty'])
+            self.assertEqual(walk.call_count, 1)
+
+    def test_find_file(self):
+        roots.update()
+        self.assertEqual(roots.find_file('web/init.sls')['path'],
+                         os.path.join(self.roots[0], 'web', 'init.sls'))
+        self.assertEqual(roots.find_file('db/init.sls')['path'],
+                         os.path.join(self.roots[1], 'db', 'init.sls'))
+        self.assertEqual(roots.find_file('missing.sls')['path'], '')
+        # Files added after the update are found
+        path = self._write(self.roots[0], 'db/init.sls', 'new db')
+        self.assertEqual(roots.find_file('db/init.sls')['path'], path)
+        path = self._write(self.roots[1], 'new.sls', 'new')
+        self.assertEqual(roots.find_file('new.sls')['path'], path)
+
+    def test_file_hash(self):
+        roots.update()
+        with patch('salt.utils.hashutils.get_hash') as get_hash:
+            ret = self._hash('web/init.sls')
+            get_hash.assert_not_called()
+        self.assertEqual(ret, {'hash_type': 'sha256',
+                               'hsum': salt.utils.hashutils.sha256_digest('web')})
+        # Files changed after the update are hashed again
+        self._write(self.roots[0], 'web/init.sls', 'changed')
+        self.assertEqual(self._hash('web/init.sls')['hsum'],
+                         salt.utils.hashutils.sha256_digest('changed'))
+
+    def test_update_rehashes_changed_files(self):
+        roots.update()
+        self._write(self.roots[0], 'web/init.sls', 'changed')
+        with patch('salt.utils.hashutils.get_hash',
+                   wraps=salt.utils.hashutils.get_hash) as get_hash:
+            roots.update()
+            self.assertEqual(get_hash.call_count, 1)
+        with patch('salt.utils.hashutils.get_hash') as get_hash:
+            self.assertEqual(self._hash('web/init.sls')['hsum'],
+                             salt.utils.hashutils.sha256_digest('changed'))
+            get_hash.assert_not_called()
@@ -30,6 +30,7 @@ from tests.support.mock import (
 # Import Salt libs
 import salt.utils.files
 import salt.utils.jid
+import salt.utils.job_segments
 import salt.utils.job
 import salt.utils.platform
 import salt.returners.local_cache as local_cache
@@ -351,3 +352,201 @@ class Local_CacheTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleM
         self._check_dir_files('new_jid_dir was not removed',
                               self.EMPTY_JID_DIR,
                               status='removed')
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class LocalCacheSegmentsTestCase(TestCase, LoaderModuleMockMixin):
+    '''
+    Test the local cache returner with the job cache kept in segments
+    '''
+    def setup_loader_modules(self):
+        self.tmp_cache_dir = tempfile.mkdtemp(dir=TMP)
+        self.addCleanup(shutil.rmtree, self.tmp_cache_dir, ignore_errors=True)
+        self.addCleanup(salt.utils.job_segments._STORES.clear)
+        return {
+            local_cache: {
+                '__opts__': {
+                    'cachedir': self.tmp_cache_dir,
+                    'hash_type': 'sha256',
+                    'keep_jobs': 24,
+                    'job_cache_segments': True,
+                    'job_cache_store_endtime': True,
+                }
+            }
+        }
+
+    def _add_job(self, fun='test.ping', minions=('minion1', 'minion2')):
+        jid = local_cache.prep_jid()
+        local_cache.save_load(jid, {'fun': fun, 'arg': [], 'tgt': '*',
+                                    'tgt_type': 'glob', 'user': 'root',
+                                    'jid': jid},
+                              minions=minions)
+        for minion in minions:
+            local_cache.returner({'jid': jid, 'id': minion, 'fun': fun,
+                                  'return': True, 'retcode': 0,
+                                  'success': True})
+        return jid
+
+    def test_job(self):
+        '''
+        Test that jobs are stored and read back
+        '''
+        jid = self._add_job()
+        self.assertEqual(local_cache.get_load(jid)['Minions'],
+                         ['minion1', 'minion2'])
+        self.assertEqual(local_cache.get_load(jid)['fun'], 'test.ping')
+        self.assertEqual(local_cache.get_jid(jid),
+                         {'minion1': {'return': True, 'retcode': 0, 'success': True},
+                          'minion2': {'return': True, 'retcode': 0, 'success': True}})
+        # A second return from a minion is dropped
+        self.assertFalse(local_cache.returner({'jid': jid, 'id': 'minion1',
+                                               'return': False}))
+        self.assertTrue(local_cache.get_jid(jid)['minion1']['return'])
+
+        local_cache.save_minions(jid, ['minion3'], syndic_id='syndic')
+        self.assertEqual(local_cache.get_load(jid)['Minions'],
+                         ['minion1', 'minion2', 'minion3'])
+
+        self.assertFalse(local_cache.get_endtime(jid))
+        local_cache.update_endtime(jid, '2019, Jun 01 12:00:00.000000')
+        self.assertEqual(local_cache.get_endtime(jid), '2019, Jun 01 12:00:00.000000')
+        self.assertEqual(local_cache.get_jids()[jid]['EndTime'],
+                         '2019, Jun 01 12:00:00.000000')
+
+        self.assertEqual(local_cache.get_load('20160603132323715452'), {})
+        self.assertEqual(local_cache.get_jid('20160603132323715452'), {})
+        # Nothing is written the old way
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_cache_dir, 'jobs')))
+
+    def test_nocache(self):
+        '''
+        Test that the returns of nocache jobs are not stored
+        '''
+        jid = local_cache.prep_jid(nocache=True)
+        local_cache.returner({'jid': jid, 'id': 'minion1', 'return': True})
+        self.assertEqual(local_cache.get_jid(jid), {})
+
+    def test_get_jids(self):
+        '''
+        Test listing the jobs, across processes and segments
+        '''
+        jids = [self._add_job(fun) for fun in ('test.ping', 'saltutil.find_job', 'test.echo')]
+        # Another master process only sees the jobs in the index
+        salt.utils.job_segments._STORES.clear()
+        with patch.dict(local_cache.__opts__, {'job_cache_segment_size': 0}):
+            jids.append(self._add_job('test.version'))
+        self.assertEqual(sorted(local_cache.get_jids()), sorted(jids))
+        ret = local_cache.get_jids_filter(2)
+        self.assertEqual([job['JID'] for job in ret], [jids[2], jids[3]])
+        ret = local_cache.get_jids_filter(3, filter_find_job=False)
+        self.assertEqual([job['Function'] for job in ret],
+                         ['saltutil.find_job', 'test.echo', 'test.version'])
+
+    def test_clean_old_jobs(self):
+        '''
+        Test that whole segments are expired
+        '''
+        jid = self._add_job()
+        local_cache.clean_old_jobs()
+        self.assertIn(jid, local_cache.get_jids())
+
+        # The segment of this process is only removed by the other processes
+        salt.utils.job_segments._STORES.clear()
+        with patch.dict(local_cache.__opts__, {'keep_jobs': 0.0000000010}):
+            local_cache.clean_old_jobs()
+        self.assertEqual(local_cache.get_jids(), {})
+        self.assertEqual(local_cache.get_jid(jid), {})
+        self.assertEqual(
+            [files for _, _, files in os.walk(os.path.join(self.tmp_cache_dir, 'job_segments'))
+             if files], [])
+
+    def test_job_other_process(self):
+        '''
+        Test that the returns another process stores later on are found
+        '''
+        jid = self._add_job(minions=('minion1',))
+        store = salt.utils.job_segments.get_store(local_cache.__opts__)
+        self.assertEqual(list(store.job(jid)[salt.utils.job_segments.RETURN]),
+                         ['minion1'])
+        # Another master process stores a return to the same job
+        other = salt.utils.job_segments.SegmentStore(local_cache.__opts__)
+        other.append(salt.utils.job_segments.RETURN, jid, {'return': 2},
+                     minion='minion2')
+        self.assertEqual(local_cache.get_jid(jid)['minion2'], {'return': 2})
+        # A record which is still being written is left out
+        index = salt.utils.jid.jid_dir(jid, store.index_dir, 'sha256')
+        with salt.utils.files.fopen(index, 'ab') as fh_:
+            fh_.write(b'\x00\x00\x01')
+        self.assertEqual(sorted(local_cache.get_jid(jid)), ['minion1', 'minion2'])
+
+    def test_returner_multi(self):
+        '''
+        Test storing a batch of returns
+        '''
+        jid = self._add_job(minions=('minion1',))
+        other_jid = local_cache.prep_jid()
+        local_cache.returner_multi([
+            {'jid': jid, 'id': 'minion2', 'return': 2},
+            {'jid': other_jid, 'id': 'minion1', 'return': 3},
+            {'jid': other_jid, 'id': 'minion1', 'return': 4},
+            {'jid': jid, 'id': 'minion1', 'return': 5}])
+        self.assertEqual(local_cache.get_jid(jid),
+                         {'minion1': {'return': True, 'retcode': 0, 'success': True},
+                          'minion2': {'return': 2}})
+        self.assertEqual(local_cache.get_jid(other_jid),
+                         {'minion1': {'return': 3}})
+
+    def test_returner_race(self):
+        '''
+        Test that only the first of two returns stored at the same time by
+        two master processes is kept
+        '''
+        jid = self._add_job(minions=('minion1',))
+        store = salt.utils.job_segments.get_store(local_cache.__opts__)
+        other = salt.utils.job_segments.SegmentStore(local_cache.__opts__)
+        append_many = store.append_many
+
+        def _append_many(records):
+            other.append(salt.utils.job_segments.RETURN, jid, {'return': 'other'},
+                         minion='minion2')
+            return append_many(records)
+
+        with patch.object(store, 'append_many', _append_many):
+            self.assertFalse(local_cache.returner({'jid': jid, 'id': 'minion2',
+                                                   'return': 'this'}))
+        self.assertEqual(local_cache.get_jid(jid)['minion2'], {'return': 'other'})
+
+    def test_prep_jid_collision(self):
+        '''
+        Test that a jid another master process got is not used again
+        '''
+        other = salt.utils.job_segments.SegmentStore(local_cache.__opts__)
+        self.assertTrue(other.create('20190601120000000000', {'nocache': True}))
+        with patch('salt.utils.jid.gen_jid',
+                   MagicMock(side_effect=['20190601120000000000',
+                                          '20190601120000000001'])):
+            self.assertEqual(local_cache.prep_jid(), '20190601120000000001')
+        store = salt.utils.job_segments.get_store(local_cache.__opts__)
+        self.assertTrue(store.nocache('20190601120000000000'))
+        self.assertFalse(store.nocache('20190601120000000001'))
+
+    def test_job_incremental(self):
+        '''
+        Test that looking a job up only reads the index entries appended since
+        the last lookup
+        '''
+        jid = self._add_job(minions=('minion1',))
+        store = salt.utils.job_segments.get_store(local_cache.__opts__)
+        index = salt.utils.jid.jid_dir(jid, store.index_dir, 'sha256')
+        store.job(jid)
+        size = os.path.getsize(index)
+        read_entries = store._read_entries
+        with patch.object(store, '_read_entries', MagicMock(side_effect=read_entries)) as read_mock:
+            store.job(jid)
+            read_mock.assert_not_called()
+            local_cache.returner({'jid': jid, 'id': 'minion2', 'return': True})
+            self.assertEqual(sorted(store.job(jid)[salt.utils.job_segments.RETURN]),
+                             ['minion1', 'minion2'])
+            self.assertTrue(read_mock.call_args_list)
+            for call in read_mock.call_args_list:
+                self.assertEqual(call[0], (index, size))
@@ -313,3 +313,152 @@ class TestM2CryptoRegression47124(TestCase):
         with patch('salt.crypt.get_rsa_key', return_value=key):
             signature = salt.crypt.sign_message('/keydir/keyname.pem', message, passphrase='password')
         self.assertEqual(signature, self.SIGNATURE)
+
+
+class CrypticleTestCase(TestCase):
+    '''
+    Test the symmetric encryption of payloads
+    '''
+    def setUp(self):
+        self.key = salt.crypt.Crypticle.generate_key_string()
+        self.opts = {'serial': 'msgpack'}
+
+    def test_dumps_loads(self):
+        crypticle = salt.crypt.Crypticle(self.opts, self.key)
+        data = crypticle.dumps({'fun': 'test.ping'})
+        self.assertFalse(data.startswith(salt.crypt.Crypticle.AEAD_MAGIC))
+        self.assertEqual(crypticle.loads(data), {'fun': 'test.ping'})
+
+    def test_tampered(self):
+        crypticle = salt.crypt.Crypticle(self.opts, self.key)
+        data = bytearray(crypticle.dumps({'fun': 'test.ping'}))
+        data[20] ^= 1
+        self.assertRaises(salt.crypt.AuthenticationError, crypticle.loads, bytes(data))
+
+    @skipIf(not salt.crypt.HAS_AEAD, 'AES-GCM needs pycryptodome')
+    def test_aead(self):
+        crypticle = salt.crypt.Crypticle(self.opts, self.key, aead=True)
+        load = {'fun': 'test.ping', 'arg': ['x' * 20000]}
+        data = crypticle.dumps(load)
+        self.assertTrue(data.startswith(salt.crypt.Crypticle.AEAD_MAGIC))
+        self.assertEqual(crypticle.loads(data), load)
+        # Either form is decrypted, whichever is used to encrypt
+        cbc = salt.crypt.Crypticle(self.opts, self.key)
+        self.assertEqual(cbc.loads(data), load)
+        self.assertEqual(crypticle.loads(crypticle.dumps(load, aead=False)), load)
+        # Small data is not worth setting up AES-GCM for
+        data = crypticle.dumps('ret')
+        self.assertFalse(data.startswith(salt.crypt.Crypticle.AEAD_MAGIC))
+        self.assertEqual(crypticle.loads(data), 'ret')
+        # Another key does not decrypt it
+        other = salt.crypt.Crypticle(self.opts, salt.crypt.Crypticle.generate_key_string())
+        self.assertRaises(salt.crypt.AuthenticationError, other.loads, data)
+
+    @skipIf(not salt.crypt.HAS_AEAD, 'AES-GCM needs pycryptodome')
+    def test_aead_tampered(self):
+        crypticle = salt.crypt.Crypticle(self.opts, self.key, aead=True)
+        data = bytearray(crypticle.dumps({'fun': 'test.ping', 'arg': ['x' * 20000]}))
+        data[20] ^= 1
+        self.assertRaises(salt.crypt.AuthenticationError, crypticle.loads, bytes(data))
+
+    @skipIf(not salt.crypt.HAS_AEAD, 'AES-GCM needs pycryptodome')
+    def test_cbc_with_magic(self):
+        # AES-CBC data whose IV starts like AES-GCM data
+        crypticle = salt.crypt.Crypticle(self.opts, self.key)
+        iv_bytes = salt.crypt.Crypticle.AEAD_MAGIC + b'\0' * 12
+        with patch('os.urandom', MagicMock(return_value=iv_bytes)):
+            data = crypticle.dumps('ret')
+        self.assertTrue(data.startswith(salt.crypt.Crypticle.AEAD_MAGIC))
+        self.assertEqual(crypticle.loads(data), 'ret')
+
+
+@skipIf(not HAS_PYCRYPTO_RSA and not HAS_M2, 'No RSA library available')
+class MinionKeyCacheTestCase(TestCase):
+    '''
+    Test the cache of minion public keys
+    '''
+    def setUp(self):
+        self.pki_dir = tempfile.mkdtemp()
+        for name in salt.crypt.MinionKeyCache.DIRS:
+            os.makedirs(os.path.join(self.pki_dir, name))
+        self._write('minions', 'minion1')
+        self.cache = salt.crypt.MinionKeyCache({'pki_dir': self.pki_dir})
+
+    def tearDown(self):
+        shutil.rmtree(self.pki_dir)
+
+    def _write(self, name, minion_id, data=PUBKEY_DATA):
+        with salt.utils.files.fopen(os.path.join(self.pki_dir, name, minion_id), 'w') as fp_:
+            fp_.write(data)
+
+    def test_get(self):
+        self.assertEqual(self.cache.get('minions', 'minion1'), PUBKEY_DATA)
+        self.assertIsNone(self.cache.get('minions_rejected', 'minion1'))
+        with patch('salt.utils.files.fopen', MagicMock(side_effect=IOError)) as fopen:
+            self.assertEqual(self.cache.get('minions', 'minion1'), PUBKEY_DATA)
+            self.assertIsNone(self.cache.get('minions_rejected', 'minion1'))
+        self.assertEqual(fopen.call_count, 0)
+
+    def test_changed(self):
+        self.assertIsNone(self.cache.get('minions_rejected', 'minion1'))
+        self.assertIsNone(self.cache.get('minions', 'minion2'))
+        # Rejecting minion1
+        os.rename(os.path.join(self.pki_dir, 'minions', 'minion1'),
+                  os.path.join(self.pki_dir, 'minions_rejected', 'minion1'))
+        self.assertIsNone(self.cache.get('minions', 'minion1'))
+        self.assertEqual(self.cache.get('minions_rejected', 'minion1'), PUBKEY_DATA)
+        # A new key written in place, as open_mode does, within the same
+        # mtime tick
+        path = os.path.join(self.pki_dir, 'minions_rejected', 'minion1')
+        stat = os.stat(path)
+        self._write('minions_rejected', 'minion1', PUBKEY_DATA.replace('MIIB', 'MIIC') + '\n')
+        os.utime(path, (stat.st_atime, stat.st_mtime))
+        self.assertEqual(self.cache.get('minions_rejected', 'minion1'),
+                         PUBKEY_DATA.replace('MIIB', 'MIIC') + '\n')
+
+    def test_set(self):
+        self.assertEqual(self.cache.get('minions', 'minion1'), PUBKEY_DATA)
+        self._write('minions', 'minion1', 'new key')
+        self.cache.set('minions', 'minion1', 'new key')
+        with patch('salt.utils.files.fopen', MagicMock(side_effect=IOError)) as fopen:
+            self.assertEqual(self.cache.get('minions', 'minion1'), 'new key')
+        self.assertEqual(fopen.call_count, 0)
+
+    def test_lru(self):
+        self.cache.size = 2
+        self.cache.get('minions', 'minion1')
+        self.cache.get('minions', 'minion2')
+        self.cache.get('minions', 'minion1')
+        self.cache.get('minions', 'minion3')
+        self.assertEqual(list(self.cache.keys),
+                         [('minions', 'minion1'), ('minions', 'minion3')])
+
+    def test_rsa(self):
+        with patch('salt.crypt._load_rsa_pub_key',
+                   MagicMock(wraps=salt.crypt._load_rsa_pub_key)) as load:
+            key = self.cache.rsa(PUBKEY_DATA)
+            self.assertIs(self.cache.rsa(PUBKEY_DATA), key)
+        self.assertEqual(load.call_count, 1)
+
+
+class SAuthBusyTestCase(TestCase):
+    '''
+    Test minions signing in to a busy master
+    '''
+    def test_busy(self):
+        auth = object.__new__(salt.crypt.SAuth)
+        auth.opts = {'acceptance_wait_time': 10, 'acceptance_wait_time_max': 0}
+        creds = {'aes': salt.crypt.Crypticle.generate_key_string(),
+                 'publish_port': 4505}
+
+        def sign_in(channel=None):
+            if sleep.call_count:
+                return creds
+            auth.retry_after = 2.5
+            return 'busy'
+        with patch('time.sleep', MagicMock()) as sleep, \
+                patch('salt.transport.client.ReqChannel.factory', MagicMock()), \
+                patch.object(auth, 'sign_in', MagicMock(side_effect=sign_in)):
+            auth.authenticate()
+        sleep.assert_called_once_with(2.5)
+        self.assertEqual(auth.creds, creds)
@@ -6,9 +6,11 @@ Tests for the salt fileclient
 # Import Python libs
 from __future__ import absolute_import
 import errno
+import functools
 import logging
 import os
 import shutil
+import tempfile
 
 # Import Salt Testing libs
 from tests.integration import AdaptedConfigurationTestCaseMixin
@@ -18,7 +20,10 @@ from tests.support.paths import TMP
 from tests.support.unit import TestCase, skipIf
 
 # Import Salt libs
+import salt.fileserver
+import salt.payload
 import salt.utils.files
+import salt.utils.hashutils
 from salt.ext.six.moves import range
 from salt import fileclient
 from salt.ext import six
@@ -127,6 +132,250 @@ class FileClientTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleMo
             self.assertEqual('remote_client', ret)
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class RemoteClientDeltaTest(TestCase):
+    '''
+    Tests for fetching the changes to files from the master
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.local = os.path.join(self.tmp_dir, 'local')
+        self.remote = os.path.join(self.tmp_dir, 'remote')
+        data = os.urandom(200000)
+        with salt.utils.files.fopen(self.local, 'wb') as fp_:
+            fp_.write(data)
+        self.new_data = data[:100000] + b'changed' + data[100000:]
+        with salt.utils.files.fopen(self.remote, 'wb') as fp_:
+            fp_.write(self.new_data)
+        self.hsum = {'hsum': salt.utils.hashutils.get_hash(self.remote, 'sha256'),
+                     'hash_type': 'sha256'}
+        fileserver = MagicMock()
+        fileserver.opts = {'file_buffer_size': 65536}
+        fileserver.find_file.return_value = {'back': 'roots',
+                                             'path': self.remote,
+                                             'rel': 'remote'}
+        fileserver.file_hash.return_value = self.hsum
+        self.client = fileclient.RemoteClient.__new__(fileclient.RemoteClient)
+        self.client.opts = {'file_delta': True}
+        self.client.channel = MagicMock()
+        self.client.channel.send.side_effect = \
+            lambda load, **kwargs: salt.fileserver.Fileserver.serve_file_delta(
+                fileserver, dict(load))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_file_delta(self):
+        ret = self.client._get_file_delta(
+            'salt://remote', self.local, 'base', 6, self.hsum)
+        self.assertEqual(ret, self.local)
+        with salt.utils.files.fopen(self.local, 'rb') as fp_:
+            self.assertEqual(fp_.read(), self.new_data)
+        # The changes fit in one chunk
+        self.assertEqual(self.client.channel.send.call_count, 1)
+
+    def test_get_file_delta_unsupported(self):
+        self.client.channel.send.side_effect = None
+        self.client.channel.send.return_value = False
+        ret = self.client._get_file_delta(
+            'salt://remote', self.local, 'base', None, self.hsum)
+        self.assertFalse(ret)
+        # The temporary file was removed
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['local', 'remote'])
+
+    def test_get_file_delta_hash_mismatch(self):
+        with salt.utils.files.fopen(self.local, 'rb') as fp_:
+            old_data = fp_.read()
+        ret = self.client._get_file_delta(
+            'salt://remote', self.local, 'base', None,
+            {'hsum': 'abc', 'hash_type': 'sha256'})
+        # The final chunk carries the hash of the master
+        self.assertEqual(ret, self.local)
+        self.hsum['hsum'] = 'abc'
+        with salt.utils.files.fopen(self.local, 'wb') as fp_:
+            fp_.write(old_data)
+        ret = self.client._get_file_delta(
+            'salt://remote', self.local, 'base', None, self.hsum)
+        self.assertFalse(ret)
+        with salt.utils.files.fopen(self.local, 'rb') as fp_:
+            self.assertEqual(fp_.read(), old_data)
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class RemoteClientBulkTest(TestCase):
+    '''
+    Tests for fetching files with fewer requests
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.root = os.path.join(self.tmp_dir, 'root')
+        os.makedirs(self.root)
+        self.files = {'a': b'a' * 800, 'b': b'b' * 800, 'c': b'c' * 800,
+                      'large': b'l' * 5000}
+        for name, data in self.files.items():
+            with salt.utils.files.fopen(os.path.join(self.root, name), 'wb') as fp_:
+                fp_.write(data)
+
+        def _find_file(path, saltenv):
+            full = os.path.join(self.root, path)
+            if not os.path.isfile(full):
+                return {'path': '', 'rel': ''}
+            return {'back': 'roots', 'path': full, 'rel': path}
+
+        def _file_hash(load, fnd):
+            return {'hsum': salt.utils.hashutils.get_hash(fnd['path'], 'sha256'),
+                    'hash_type': 'sha256'}
+
+        def _serve_file(load, fnd):
+            with salt.utils.files.fopen(fnd['path'], 'rb') as fp_:
+                fp_.seek(load['loc'])
+                return {'data': fp_.read(1000), 'dest': fnd['rel']}
+
+        self.fileserver = MagicMock()
+        self.fileserver.opts = {'file_buffer_size': 1000,
+                                'file_transfer_max_chunks': 2,
+                                'fileserver_list_cache_time': 0,
+                                'cachedir': os.path.join(self.tmp_dir, 'master')}
+        self.fileserver.find_file.side_effect = _find_file
+        self.fileserver.file_list.side_effect = \
+            lambda load: sorted(os.listdir(self.root))
+        self.fileserver.envs.return_value = ['base', 'dev/web']
+        self.fileserver.servers = {'roots.file_hash': _file_hash,
+                                   'roots.serve_file': _serve_file}
+        for name in ('_serve_chunks', '_get_manifest', '_refresh_manifest'):
+            getattr(self.fileserver, name).side_effect = functools.partial(
+                getattr(salt.fileserver.Fileserver, name), self.fileserver)
+
+        self.client = fileclient.RemoteClient.__new__(fileclient.RemoteClient)
+        self.client.opts = {'file_bulk_fetch': True,
+                            'file_buffer_size': 1000,
+                            'file_transfer_chunks': 2,
+                            'hash_type': 'sha256',
+                            'cachedir': os.path.join(self.tmp_dir, 'cache')}
+        self.client.serial = salt.payload.Serial(self.client.opts)
+        self.client._manifests = {}
+        self.client.channel = MagicMock()
+        self.client.channel.send.side_effect = \
+            lambda load, **kwargs: getattr(
+                salt.fileserver.Fileserver, load['cmd'].lstrip('_'))(
+                    self.fileserver, dict(load))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_serve_chunks(self):
+        load = {'path': 'large', 'saltenv': 'base', 'loc': 0, 'chunks': 4}
+        ret = salt.fileserver.Fileserver.serve_file(self.fileserver, dict(load))
+        # Limited by file_transfer_max_chunks
+        self.assertEqual(ret['data'], b'l' * 2000)
+        load['loc'] = 4000
+        ret = salt.fileserver.Fileserver.serve_file(self.fileserver, dict(load))
+        self.assertEqual(ret['data'], b'l' * 1000)
+
+    def test_cache_many(self):
+        paths = ['a', 'b', 'c', 'missing', 'large']
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='large_dest')) as cache_file:
+            ret = self.client._cache_many(paths)
+            cache_file.assert_called_once_with('salt://large', 'base', cachedir=None)
+        cachedir = os.path.join(self.tmp_dir, 'cache', 'files', 'base')
+        self.assertEqual(ret, [os.path.join(cachedir, 'a'),
+                               os.path.join(cachedir, 'b'),
+                               os.path.join(cachedir, 'c'),
+                               False,
+                               'large_dest'])
+        for name in ('a', 'b', 'c'):
+            with salt.utils.files.fopen(os.path.join(cachedir, name), 'rb') as fp_:
+                self.assertEqual(fp_.read(), self.files[name])
+        # The third file did not fit in the first reply
+        self.assertEqual(self.client.channel.send.call_count, 2)
+
+        # Nothing changed, nothing is sent
+        self.client.channel.send.reset_mock()
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='large_dest')):
+            self.assertEqual(self.client._cache_many(paths), ret)
+        self.assertEqual(self.client.channel.send.call_count, 1)
+
+    def test_file_manifest(self):
+        load = {'saltenv': 'base'}
+        ret = salt.fileserver.Fileserver.file_manifest(self.fileserver, dict(load))
+        self.assertTrue(ret['full'])
+        self.assertEqual(sorted(ret['files']), ['a', 'b', 'c', 'large'])
+        load['version'] = ret['version']
+        ret = salt.fileserver.Fileserver.file_manifest(self.fileserver, dict(load))
+        self.assertEqual(ret, {'version': load['version'], 'full': False,
+                               'files': {}, 'removed': []})
+        with salt.utils.files.fopen(os.path.join(self.root, 'a'), 'wb') as fp_:
+            fp_.write(b'new')
+        os.remove(os.path.join(self.root, 'b'))
+        ret = salt.fileserver.Fileserver.file_manifest(self.fileserver, dict(load))
+        self.assertFalse(ret['full'])
+        self.assertNotEqual(ret['version'], load['version'])
+        self.assertEqual(list(ret['files']), ['a'])
+        self.assertEqual(ret['removed'], ['b'])
+        # Unknown versions get the whole manifest
+        load['version'] = 'other:1'
+        ret = salt.fileserver.Fileserver.file_manifest(self.fileserver, dict(load))
+        self.assertTrue(ret['full'])
+        self.assertEqual(sorted(ret['files']), ['a', 'c', 'large'])
+
+    def test_file_manifest_saltenv(self):
+        manifest_dir = os.path.join(self.tmp_dir, 'master', 'file_manifests')
+        evil = os.path.join(self.tmp_dir, 'evil')
+        for saltenv in ('/../../' + evil, '../evil', 'a/b'):
+            ret = salt.fileserver.Fileserver.file_manifest(
+                self.fileserver, {'saltenv': saltenv})
+            self.assertEqual(ret, {'version': None, 'full': True,
+                                   'files': {}, 'removed': []})
+        self.assertFalse(os.path.exists(evil + '.p'))
+        self.assertFalse(os.path.exists(manifest_dir))
+        # Known saltenvs are stored under a safe file name
+        ret = salt.fileserver.Fileserver.file_manifest(
+            self.fileserver, {'saltenv': 'dev/web'})
+        self.assertEqual(sorted(ret['files']), ['a', 'b', 'c', 'large'])
+        self.assertEqual(os.listdir(manifest_dir), ['dev%2Fweb.p'])
+
+    def test_cache_master_manifest(self):
+        self.client.opts['file_manifest'] = True
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='large_dest')):
+            ret = self.client.cache_master()
+        self.assertEqual(len(ret), 4)
+        # Nothing changed: a single request for the manifest
+        self.client.channel.send.reset_mock()
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='large_dest')):
+            self.assertEqual(self.client.cache_master()[:3], ret[:3])
+        cmds = [call[0][0]['cmd'] for call in self.client.channel.send.call_args_list]
+        self.assertEqual(cmds, ['_file_manifest', '_serve_files'])
+        # The large file goes through the mocked cache_file and is never
+        # recorded, files which are all recorded need no request at all
+        self.client.channel.send.reset_mock()
+        with patch.object(self.client, 'cache_dir', MagicMock()):
+            ret = self.client._cache_many(['a', 'b', 'c'])
+        self.assertEqual(self.client.channel.send.call_count, 0)
+        # A changed file is fetched again
+        with salt.utils.files.fopen(os.path.join(self.root, 'a'), 'wb') as fp_:
+            fp_.write(b'new')
+        self.client.channel.send.reset_mock()
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='large_dest')):
+            self.client.cache_master()
+        with salt.utils.files.fopen(ret[0], 'rb') as fp_:
+            self.assertEqual(fp_.read(), b'new')
+        loads = [call[0][0] for call in self.client.channel.send.call_args_list]
+        self.assertEqual(loads[1]['paths'], ['a', 'large'])
+
+    def test_cache_many_unsupported(self):
+        self.client.channel.send.side_effect = None
+        self.client.channel.send.return_value = False
+        with patch.object(self.client, 'cache_file',
+                          MagicMock(return_value='dest')) as cache_file:
+            self.assertEqual(self.client._cache_many(['a', 'b']), ['dest', 'dest'])
+            self.assertEqual(cache_file.call_count, 2)
+
+
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 class FileclientCacheTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleMockMixin):
     '''
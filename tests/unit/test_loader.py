@@ -19,6 +19,8 @@ import shutil
 import sys
 import tempfile
 import textwrap
+import threading
+import time
 
 # Import Salt Testing libs
 from tests.support.case import ModuleCase
@@ -29,6 +31,7 @@ from tests.support.paths import TMP
 # Import Salt libs
 import salt.config
 import salt.loader
+import salt.utils.decorators
 import salt.utils.files
 import salt.utils.stringutils
 # pylint: disable=import-error,no-name-in-module,redefined-builtin
@@ -1246,3 +1249,127 @@ class LazyLoaderOptimizationOrderTest(TestCase):
         basename = os.path.basename(filename)
         expected = 'lazyloadertest.py' if six.PY3 else 'lazyloadertest.pyc'
         assert basename == expected, basename
+
+
+class GrainsTTLTest(TestCase):
+    '''
+    Test the reuse of the results of the grains functions
+    '''
+    def setUp(self):
+        self.opts = {'cachedir': tempfile.mkdtemp(dir=TMP),
+                     'grains_ttl': {}}
+        self.calls = collections.Counter()
+
+        @salt.utils.decorators.grains_ttl(300)
+        def slow():
+            self.calls['slow'] += 1
+            return {'slow': self.calls['slow']}
+
+        def fast():
+            self.calls['fast'] += 1
+            return {'fast': self.calls['fast']}
+
+        self.funcs = {'core.slow': slow, 'core.fast': fast}
+
+    def tearDown(self):
+        salt.loader._GRAINS_RUNS.pop(self.opts['cachedir'], None)
+        shutil.rmtree(self.opts['cachedir'])
+
+    def _grains(self, **kwargs):
+        with patch('salt.loader.grain_funcs', return_value=dict(self.funcs)):
+            return salt.loader.grains(self.opts, **kwargs)
+
+    def test_ttl(self):
+        self.assertEqual(self._grains(), {'slow': 1, 'fast': 1})
+        self.assertEqual(self._grains(), {'slow': 1, 'fast': 2})
+        self.assertEqual(self.calls, {'slow': 1, 'fast': 2})
+
+        # The result expires
+        runs = salt.loader._GRAINS_RUNS[self.opts['cachedir']]
+        runs['core.slow']['expires'] = 0
+        self.assertEqual(self._grains(), {'slow': 2, 'fast': 3})
+
+        timing = salt.loader.grains_timing(self.opts)
+        self.assertEqual(sorted(timing), ['core.fast', 'core.slow'])
+        self.assertEqual(timing['core.slow']['grains'], ['slow'])
+        self.assertIsNone(timing['core.fast']['expires'])
+        self.assertNotIn('ret', timing['core.slow'])
+
+    def test_ttl_option(self):
+        self.opts['grains_ttl'] = {'core.*': 300, 'core.slow': 0}
+        self._grains()
+        self.assertEqual(self._grains(), {'slow': 2, 'fast': 1})
+
+    def test_invalidate(self):
+        self._grains()
+        salt.loader.invalidate_grains(self.opts, ['other'])
+        self.assertEqual(self._grains(), {'slow': 1, 'fast': 2})
+        # By grain name or function name
+        salt.loader.invalidate_grains(self.opts, ['sl*'])
+        self.assertEqual(self._grains(), {'slow': 2, 'fast': 3})
+        salt.loader.invalidate_grains(self.opts, 'core.slow')
+        self.assertEqual(self._grains(), {'slow': 3, 'fast': 4})
+        salt.loader.invalidate_grains(self.opts)
+        self.assertEqual(self._grains(), {'slow': 4, 'fast': 5})
+
+
+class GrainsWorkersTest(TestCase):
+    '''
+    Test running the grains functions on threads
+    '''
+    def setUp(self):
+        self.opts = {'cachedir': tempfile.mkdtemp(dir=TMP),
+                     'grains_workers': 2,
+                     'grains_timeout': 1}
+        self.hang = False
+        self.fail = False
+        self.release = threading.Event()
+
+        def slow():
+            if self.hang:
+                self.release.wait(10)
+            return {'slow': time.time()}
+
+        def fast():
+            if self.fail:
+                raise Exception('fast failed')
+            return {'fast': time.time(), 'shared': 'fast'}
+
+        def shared():
+            return {'shared': 'custom'}
+
+        def merged(grains):
+            return {'merged': sorted(grains)}
+
+        # The functions returning the same grains are merged in order
+        self.funcs = collections.OrderedDict([('core.slow', slow),
+                                              ('core.fast', fast),
+                                              ('custom.shared', shared),
+                                              ('custom.merged', merged)])
+
+    def tearDown(self):
+        self.release.set()
+        salt.loader._GRAINS_RUNS.pop(self.opts['cachedir'], None)
+        shutil.rmtree(self.opts['cachedir'])
+
+    def _grains(self):
+        with patch('salt.loader.grain_funcs', return_value=self.funcs):
+            return salt.loader.grains(self.opts)
+
+    def test_workers(self):
+        grains = self._grains()
+        self.assertEqual(grains['shared'], 'custom')
+        self.assertEqual(grains['merged'], ['fast', 'shared', 'slow'])
+        self.assertEqual(sorted(salt.loader.grains_timing(self.opts)),
+                         ['core.fast', 'core.slow', 'custom.merged', 'custom.shared'])
+
+    def test_timeout(self):
+        first = self._grains()
+        self.hang = True
+        self.fail = True
+        start = time.time()
+        grains = self._grains()
+        self.assertLess(time.time() - start, 5)
+        # The failed and hung functions keep their last grains
+        self.assertEqual(grains['slow'], first['slow'])
+        self.assertEqual(grains['fast'], first['fast'])
@@ -331,3 +331,59 @@ class ClearFuncsTestCase(TestCase):
                 patch('salt.utils.master.get_values_of_matching_keys', MagicMock(return_value=['test'])), \
                 patch('salt.utils.minions.CkMinions.auth_check', MagicMock(return_value=False)):
             self.assertEqual(mock_ret, self.clear_funcs.publish(load))
+
+
+class AESFuncsTestCase(TestCase):
+    '''
+    TestCase for salt.master.AESFuncs class
+    '''
+
+    def setUp(self):
+        opts = salt.config.master_config(None)
+        self.aes_funcs = salt.master.AESFuncs.__new__(salt.master.AESFuncs)
+        self.aes_funcs.opts = opts
+        self.aes_funcs.event = MagicMock()
+        self.aes_funcs.mminion = MagicMock()
+        self.returners = {
+            'local_cache.prep_jid': MagicMock(),
+            'local_cache.save_load': MagicMock(),
+            'local_cache.returner': MagicMock(),
+            'local_cache.returner_multi': MagicMock(),
+            'local_cache.get_load': MagicMock(return_value={}),
+            'local_cache.update_endtime': MagicMock(),
+        }
+        self.aes_funcs.mminion.returners = self.returners
+
+    def test_return_multi(self):
+        '''
+        Asserts that a batch of returns is stored with one returner_multi call
+        and that returns for other minions are dropped.
+        '''
+        rets = [{'id': 'minion', 'jid': '20190603132323715452', 'fun': 'test.ping',
+                 'return': True},
+                {'id': 'minion', 'jid': '20190603132323715453', 'fun': 'test.ping',
+                 'return': True},
+                {'id': 'other', 'jid': '20190603132323715452', 'fun': 'test.ping',
+                 'return': True}]
+        self.aes_funcs._return_multi({'cmd': '_return_multi', 'id': 'minion',
+                                      'load': rets})
+        self.returners['local_cache.returner_multi'].assert_called_once_with(rets[:2])
+        self.returners['local_cache.returner'].assert_not_called()
+        self.assertEqual(self.returners['local_cache.save_load'].call_count, 2)
+        tags = [call[0][1] for call in self.aes_funcs.event.fire_event.call_args_list]
+        self.assertEqual(tags, ['salt/job/20190603132323715452/ret/minion',
+                                'salt/job/20190603132323715453/ret/minion'])
+
+    def test_return_multi_no_returner_multi(self):
+        '''
+        Asserts that returns are stored one by one when the job cache has no
+        returner_multi function.
+        '''
+        del self.returners['local_cache.returner_multi']
+        rets = [{'id': 'minion', 'jid': '20190603132323715452', 'fun': 'test.ping',
+                 'return': True},
+                {'id': 'minion', 'jid': '20190603132323715453', 'fun': 'test.ping',
+                 'return': True}]
+        self.aes_funcs._return_multi({'cmd': '_return_multi', 'id': 'minion',
+                                      'load': rets})
+        self.assertEqual(self.returners['local_cache.returner'].call_count, 2)
@@ -7,6 +7,8 @@
 from __future__ import absolute_import
 import copy
 import os
+import shutil
+import tempfile
 
 # Import Salt Testing libs
 from tests.support.unit import TestCase, skipIf
@@ -15,6 +17,7 @@ from tests.support.mixins import AdaptedConfigurationTestCaseMixin
 from tests.support.helpers import skip_if_not_root
 # Import salt libs
 import salt.minion
+import salt.payload
 import salt.utils.event as event
 from salt.exceptions import SaltSystemExit
 import salt.syspaths
@@ -282,6 +285,185 @@ class MinionTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
             finally:
                 minion.destroy()
 
+    def test_return_batch(self):
+        '''
+        Tests that queued returns are sent in one request once
+        return_batch_size returns are waiting
+        '''
+        mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+        mock_opts['return_batch_window'] = 1
+        mock_opts['return_batch_size'] = 2
+        io_loop = tornado.ioloop.IOLoop()
+        minion = salt.minion.Minion(mock_opts, io_loop=io_loop)
+        try:
+            with patch.object(minion, '_return_pub_multi') as pub_multi:
+                minion._queue_return({'jid': '1'})
+                self.assertIsNotNone(minion._return_batch_timer)
+                pub_multi.assert_not_called()
+                minion._queue_return({'jid': '2'})
+                self.assertEqual(pub_multi.call_count, 1)
+                self.assertEqual(pub_multi.call_args[0][0], [{'jid': '1'}, {'jid': '2'}])
+                self.assertEqual(pub_multi.call_args[1]['ret_cmd'], '_return_multi')
+                self.assertEqual(minion._return_batch, [])
+                self.assertIsNone(minion._return_batch_timer)
+        finally:
+            minion.destroy()
+
+    def test_return_batch_schedule(self):
+        '''
+        Tests that the returns of scheduled jobs, which all use the req jid,
+        are all sent when batched together
+        '''
+        mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+        mock_opts['return_batch_window'] = 1
+        mock_opts['return_batch_size'] = 2
+        mock_opts['multiprocessing'] = False
+        io_loop = tornado.ioloop.IOLoop()
+        minion = salt.minion.Minion(mock_opts, io_loop=io_loop)
+        try:
+            with patch.object(minion, '_send_req_async') as send_req:
+                minion._queue_return({'jid': 'req', 'fun': 'test.ping', 'schedule': 'a'})
+                minion._queue_return({'jid': 'req', 'fun': 'test.ping', 'schedule': 'b'})
+                self.assertEqual(send_req.call_count, 1)
+                load = send_req.call_args[0][0]
+                self.assertEqual(load['cmd'], '_return_multi')
+                self.assertEqual([ret['schedule'] for ret in load['load']], ['a', 'b'])
+        finally:
+            minion.destroy()
+
+    def test_return_batch_multi_master(self):
+        '''
+        Tests that only the Minion of the master which sent a job sends its
+        return, when the batch event is handed to every Minion
+        '''
+        mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+        mock_opts['return_batch_window'] = 1
+        minions = []
+        try:
+            for master in ('master1', 'master2'):
+                opts = copy.copy(mock_opts)
+                opts['master'] = master
+                minion = salt.minion.Minion(opts, io_loop=tornado.ioloop.IOLoop())
+                minion.ready = True
+                minion.serial = salt.payload.Serial(opts)
+                minions.append(minion)
+            event = MagicMock()
+            event.fire_event.return_value = True
+            with patch('salt.utils.event.get_event', MagicMock(return_value=event)):
+                minions[1]._send_return({'jid': '1'})
+            tag = event.fire_event.call_args[0][1]
+            package = b''.join([salt.utils.stringutils.to_bytes(tag),
+                                salt.utils.stringutils.to_bytes(salt.utils.event.TAGEND),
+                                salt.payload.Serial(mock_opts).dumps({'jid': '1'})])
+            for minion in minions:
+                with patch.object(minion, '_queue_return') as queue_return:
+                    minion.io_loop.run_sync(lambda: minion.handle_event(package))
+                    if minion is minions[1]:
+                        queue_return.assert_called_once_with({'jid': '1'})
+                    else:
+                        queue_return.assert_not_called()
+        finally:
+            for minion in minions:
+                minion.destroy()
+
+    def test_handle_decoded_payload_job_workers(self):
+        '''
+        Tests that jobs go to an idle job worker rather than to a new process
+        '''
+        with patch('salt.minion.Minion.ctx', MagicMock(return_value={})), \
+                patch('salt.utils.process.SignalHandlingMultiprocessingProcess.start', MagicMock(return_value=True)), \
+                patch('salt.utils.process.SignalHandlingMultiprocessingProcess.join', MagicMock(return_value=True)):
+            mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+            minion = salt.minion.Minion(mock_opts, jid_queue=[], io_loop=tornado.ioloop.IOLoop())
+            try:
+                minion.job_workers = MagicMock()
+                minion.job_workers.dispatch.return_value = True
+                minion._handle_decoded_payload({'fun': 'test.ping', 'jid': '1'}).result()
+                minion.job_workers.dispatch.assert_called_once_with({'fun': 'test.ping', 'jid': '1'}, False)
+                salt.utils.process.SignalHandlingMultiprocessingProcess.start.assert_not_called()
+
+                # All the workers are busy
+                minion.job_workers.dispatch.return_value = False
+                minion._handle_decoded_payload({'fun': 'test.ping', 'jid': '2'}).result()
+                self.assertEqual(salt.utils.process.SignalHandlingMultiprocessingProcess.start.call_count, 1)
+            finally:
+                minion.job_workers = None
+                minion.destroy()
+
+    def test_handle_job_query(self):
+        '''
+        Tests that saltutil.find_job and saltutil.running are answered from the
+        job registry without starting a job
+        '''
+        with patch('salt.utils.process.SignalHandlingMultiprocessingProcess.start', MagicMock(return_value=True)), \
+                patch('salt.utils.process.SignalHandlingMultiprocessingProcess.join', MagicMock(return_value=True)):
+            mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+            mock_opts['pillar'] = {}
+            mock_opts['grains'] = {}
+            minion = salt.minion.Minion(mock_opts, jid_queue=[], io_loop=tornado.ioloop.IOLoop())
+            try:
+                job = {'jid': '1', 'pid': 1234, 'fun': 'test.sleep'}
+                minion.connected = True
+                minion.functions = {'saltutil.find_job': lambda jid: {},
+                                    'saltutil.running': lambda: []}
+                minion.job_registry = MagicMock()
+                minion.job_registry.get.return_value = job
+                minion.job_registry.running.return_value = [job]
+                with patch.object(minion, '_return_pub') as return_pub:
+                    minion._handle_decoded_payload({'fun': 'saltutil.find_job', 'jid': '2',
+                                                    'arg': ['1'], 'ret': ''}).result()
+                    minion.job_registry.get.assert_called_once_with('1')
+                    ret = return_pub.call_args[0][0]
+                    self.assertEqual(ret['return'], job)
+                    self.assertEqual(ret['jid'], '2')
+                    self.assertEqual(ret['fun_args'], ['1'])
+
+                    minion._handle_decoded_payload({'fun': 'saltutil.running', 'jid': '3',
+                                                    'arg': [], 'ret': ''}).result()
+                    self.assertEqual(return_pub.call_args[0][0]['return'], [job])
+                    salt.utils.process.SignalHandlingMultiprocessingProcess.start.assert_not_called()
+
+                    # Queries sent to returners run as usual
+                    minion._handle_decoded_payload({'fun': 'saltutil.running', 'jid': '4',
+                                                    'arg': [], 'ret': 'mysql'}).result()
+                    self.assertEqual(return_pub.call_count, 2)
+                    self.assertEqual(salt.utils.process.SignalHandlingMultiprocessingProcess.start.call_count, 1)
+            finally:
+                minion.job_registry = None
+                minion.destroy()
+
+    def test_run_pooled_job(self):
+        '''
+        Tests that job workers run jobs without daemonizing and remove their
+        proc file once done
+        '''
+        mock_opts = copy.copy(salt.config.DEFAULT_MINION_OPTS)
+        minion = salt.minion.Minion(mock_opts, io_loop=tornado.ioloop.IOLoop())
+        proc_dir = tempfile.mkdtemp()
+        try:
+            minion.proc_dir = proc_dir
+            minion.functions = MagicMock()
+            minion.functions.__contains__.return_value = True
+            minion.executors = {'direct_call.execute': MagicMock(return_value=True)}
+            minion.serial = salt.payload.Serial(mock_opts)
+            proc_files = []
+
+            def send_return(ret, **kwargs):
+                proc_files.extend(os.listdir(proc_dir))
+
+            with patch('salt.minion.Minion.ctx', MagicMock()), \
+                    patch('salt.utils.process.daemonize_if') as daemonize_if, \
+                    patch('salt.minion.load_args_and_kwargs', MagicMock(return_value=([], {}))), \
+                    patch.object(minion, '_return_pub', side_effect=send_return):
+                minion._run_pooled_job({'fun': 'test.ping', 'jid': '1', 'arg': [], 'ret': ''}, True)
+            daemonize_if.assert_not_called()
+            self.assertTrue(minion.job_worker)
+            self.assertEqual(proc_files, ['1'])
+            self.assertEqual(os.listdir(proc_dir), [])
+        finally:
+            minion.destroy()
+            shutil.rmtree(proc_dir)
+
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 class MinionAsyncTestCase(TestCase, AdaptedConfigurationTestCaseMixin, tornado.testing.AsyncTestCase):
@@ -312,3 +494,29 @@ class MinionAsyncTestCase(TestCase, AdaptedConfigurationTestCaseMixin, tornado.t
             except SaltSystemExit:
                 result = False
         self.assertTrue(result)
+
+
+class MatcherTestCase(TestCase):
+    '''
+    Tests for salt.minion.Matcher
+    '''
+    def setUp(self):
+        opts = {'id': 'web1',
+                'grains': {'os': 'Ubuntu', 'roles': ['web']},
+                'pillar': {'env': 'prod'},
+                'nodegroups': {'webs': 'web* and G@roles:web'}}
+        self.matcher = salt.minion.Matcher(opts)
+
+    def test_compound_match(self):
+        self.assertTrue(self.matcher.compound_match('G@os:Ubuntu and web*'))
+        self.assertTrue(self.matcher.compound_match(['I@env:prod', 'not', 'db*']))
+        self.assertFalse(self.matcher.compound_match('G@os:CentOS or I@env:dev'))
+        self.assertTrue(self.matcher.compound_match('N@webs and not I@env:dev'))
+        self.assertTrue(self.matcher.compound_match('I|@env|prod'))
+        self.assertFalse(self.matcher.compound_match('web1 and or'))
+        self.assertFalse(self.matcher.compound_match('X@foo'))
+
+    def test_compound_match_short_circuit(self):
+        with patch.object(self.matcher, 'pillar_match') as pillar_match:
+            self.assertFalse(self.matcher.compound_match('db* and I@env:prod'))
+        pillar_match.assert_not_called()
@@ -5,6 +5,7 @@
 
 # Import Python libs
 from __future__ import absolute_import, print_function, unicode_literals
+import copy
 import os
 import shutil
 import tempfile
@@ -23,6 +24,8 @@ from tests.support.paths import BASE_FILES
 # Import Salt libs
 import salt.exceptions
 import salt.state
+import salt.utils.files
+import salt.utils.platform
 from salt.utils.odict import OrderedDict
 from salt.utils.decorators import state as statedecorators
 
@@ -73,6 +76,56 @@ class StateCompilerTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
             with self.assertRaises(salt.exceptions.SaltRenderError):
                 state_obj.call_high(high_data)
 
+    @skipIf(salt.utils.platform.is_windows(), 'state_workers is not supported on Windows')
+    def test_call_high_state_workers(self):
+        '''
+        Test that running the chunks on state workers returns the same
+        results as running them sequentially
+        '''
+        def _state(fun, order, **kwargs):
+            args = [fun, {'order': order}]
+            for key, val in kwargs.items():
+                args.append({key: val})
+            return OrderedDict([('test', args),
+                                ('__sls__', 'workers'),
+                                ('__env__', 'base')])
+
+        high_data = OrderedDict([
+            ('first', _state('succeed_without_changes', 'first')),
+            ('one', _state('succeed_with_changes', 10000)),
+            ('two', _state('fail_without_changes', 10001)),
+            ('three', _state('succeed_without_changes', 10002,
+                             require=[{'test': 'one'}])),
+            ('four', _state('succeed_without_changes', 10003,
+                            onchanges=[{'test': 'one'}])),
+            ('five', _state('succeed_without_changes', 10004,
+                            require=[{'test': 'two'}])),
+            ('six', _state('succeed_without_changes', 10005,
+                           onfail=[{'test': 'two'}])),
+            ('seven', _state('succeed_without_changes', 10006,
+                             onchanges=[{'test': 'three'}])),
+        ])
+
+        def _run(workers):
+            with patch('salt.state.State._gather_pillar'):
+                minion_opts = self.get_temp_config('minion', state_workers=workers)
+                state_obj = salt.state.State(minion_opts)
+            ret = state_obj.call_high(copy.deepcopy(high_data))
+            return dict((tag, (val['result'], val['comment']))
+                        for tag, val in ret.items())
+
+        serial = _run(0)
+        workers = _run(4)
+        self.assertEqual(len(serial), 8)
+        self.assertEqual(serial, workers)
+
+        # The workers are reused for the following chunks
+        spawn = salt.state.State._spawn_state_worker
+        with patch('salt.state.State._spawn_state_worker',
+                   side_effect=spawn, autospec=True) as spawn_mock:
+            self.assertEqual(_run(2), serial)
+        self.assertIn(spawn_mock.call_count, (1, 2))
+
 
 class HighStateTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
     def setUp(self):
@@ -171,6 +224,77 @@ class HighStateTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
         ret = salt.state.find_sls_ids('issue-47182.stateA.newer', high)
         self.assertEqual(ret, [('somestuff', 'cmd')])
 
+    def test_render_cache(self):
+        '''
+        Test that unchanged SLS files are served from the render cache
+        '''
+        sls_path = os.path.join(self.state_tree_dir, 'cached.sls')
+        with salt.utils.files.fopen(sls_path, 'w') as fp_:
+            fp_.write('{% for i in range(2) %}\n'
+                      'id_{{ i }}:\n'
+                      '  test.succeed_without_changes:\n'
+                      '    - name: {{ sls }}\n'
+                      '{% endfor %}\n')
+        with salt.utils.files.fopen(
+                os.path.join(self.state_tree_dir, 'macros.jinja'), 'w') as fp_:
+            fp_.write('{% macro fun() %}succeed_without_changes{% endmacro %}\n')
+        with salt.utils.files.fopen(
+                os.path.join(self.state_tree_dir, 'imports.sls'), 'w') as fp_:
+            fp_.write('{% from "macros.jinja" import fun %}\n'
+                      'other:\n'
+                      '  test.{{ fun() }}\n')
+        self.highstate.render_cache = salt.state.StateRenderCache(self.config)
+        stats = self.highstate.render_cache.stats
+        matches = {'base': ['cached', 'imports']}
+
+        high, errors = self.highstate.render_highstate(matches)
+        self.assertEqual(errors, [])
+        self.assertEqual(list(high), ['id_0', 'id_1', 'other'])
+        self.assertEqual(salt.state.render_cache_stats(self.config),
+                         {'hits': 0, 'misses': 1, 'skipped': 1})
+
+        self.highstate.building_highstate = OrderedDict()
+        with patch('salt.state.compile_template') as compile_mock:
+            compile_mock.return_value = OrderedDict(
+                [('other', {'test': ['succeed_without_changes']})])
+            cached_high, errors = self.highstate.render_highstate(matches)
+        # Only the SLS importing another template was rendered
+        self.assertEqual(compile_mock.call_count, 1)
+        self.assertEqual(errors, [])
+        # The iorder keeps counting up, so leave it out of the comparison
+        self.assertEqual(cached_high['id_1']['test'][:2], high['id_1']['test'][:2])
+        self.assertEqual(salt.state.render_cache_stats(self.config),
+                         {'hits': 1, 'misses': 1, 'skipped': 2})
+        self.assertEqual(stats, {'hits': 0, 'misses': 0, 'skipped': 0})
+
+        # A changed file or pillar is rendered again
+        with salt.utils.files.fopen(sls_path, 'a') as fp_:
+            fp_.write('# changed\n')
+        self.highstate.building_highstate = OrderedDict()
+        self.highstate.render_highstate({'base': ['cached']})
+        self.highstate.state.opts['pillar'] = {'changed': True}
+        self.highstate.render_cache = salt.state.StateRenderCache(self.config)
+        self.highstate.building_highstate = OrderedDict()
+        self.highstate.render_highstate({'base': ['cached']})
+        self.assertEqual(salt.state.render_cache_stats(self.config),
+                         {'hits': 1, 'misses': 3, 'skipped': 2})
+
+    def test_render_cache_skip(self):
+        '''
+        Test that the SLS files loading other files are not cached
+        '''
+        for text in ('{% import "macros.jinja" as macros %}',
+                     '{%- include "other.sls" %}',
+                     '{% from "map.jinja" import map with context %}',
+                     '{% extends "base.sls" %}',
+                     '{% import_yaml "defaults.yaml" as defaults %}',
+                     '{%- import_json "defaults.json" as defaults %}',
+                     '{%+ import_text "motd.txt" as motd %}'):
+            self.assertTrue(salt.state.StateRenderCache.SKIP_RE.search(text), text)
+        for text in ('{% set imports = [] %}',
+                     '{% load_yaml as defaults %}a: b{% endload %}'):
+            self.assertFalse(salt.state.StateRenderCache.SKIP_RE.search(text), text)
+
 
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 @skipIf(pytest is None, 'PyTest is missing')
@@ -360,3 +484,57 @@ class StateFormatSlotsTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
             self.state_obj.format_slots(cdata)
         mock.assert_not_called()
         self.assertEqual(cdata, sls_data)
+
+
+class RequisiteIndexTestCase(TestCase):
+    '''
+    Test the chunk index used to resolve requisites
+    '''
+    def setUp(self):
+        self.chunks = [
+            {'state': 'pkg', '__id__': 'nginx', 'name': 'nginx',
+             'fun': 'installed', '__sls__': 'web.nginx'},
+            {'state': 'file', '__id__': 'nginx_conf', 'name': '/etc/nginx/nginx.conf',
+             'fun': 'managed', '__sls__': 'web.nginx'},
+            {'state': 'service', '__id__': 'nginx_svc', 'name': 'nginx',
+             'fun': 'running', '__sls__': 'web.service'},
+            {'state': 'file', '__id__': 'motd', 'name': '/etc/motd',
+             'fun': 'managed', '__sls__': 'base'},
+        ]
+
+    def test_find_by_id(self):
+        ret = salt.state.find_requisite_chunks('id', 'nginx_conf', self.chunks)
+        self.assertEqual(ret, [self.chunks[1]])
+
+    def test_find_by_state_and_name(self):
+        ret = salt.state.find_requisite_chunks('service', 'nginx', self.chunks)
+        self.assertEqual(ret, [self.chunks[2]])
+        ret = salt.state.find_requisite_chunks('id', 'nginx', self.chunks)
+        self.assertEqual(ret, [self.chunks[0], self.chunks[2]])
+
+    def test_find_glob(self):
+        ret = salt.state.find_requisite_chunks('file', '/etc/*', self.chunks)
+        self.assertEqual(ret, [self.chunks[1], self.chunks[3]])
+
+    def test_find_sls(self):
+        index = salt.state.build_chunk_index(self.chunks)
+        ret = salt.state.find_requisite_chunks('sls', 'web.nginx', self.chunks, index=index)
+        self.assertEqual(ret, self.chunks[:2])
+        ret = salt.state.find_requisite_chunks('sls', 'web.*', self.chunks, index=index)
+        self.assertEqual(ret, self.chunks[:3])
+
+    def test_find_missing(self):
+        self.assertEqual(
+            salt.state.find_requisite_chunks('pkg', 'apache', self.chunks), [])
+
+    def test_find_names(self):
+        high = OrderedDict([
+            ('nginx_conf', OrderedDict([
+                ('file', [{'name': '/etc/nginx/nginx.conf'}, 'managed']),
+                ('__sls__', 'web.nginx'), ('__env__', 'base')])),
+            ('other_conf', OrderedDict([
+                ('file', [{'name': '/etc/nginx/nginx.conf'}, 'exists']),
+                ('__sls__', 'web.nginx'), ('__env__', 'base')])),
+        ])
+        self.assertEqual(salt.state.find_names(high),
+                         {'/etc/nginx/nginx.conf': {'file': 'nginx_conf'}})
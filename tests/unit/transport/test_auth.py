@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for the master side of the authentication of minions
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+
+# Import Salt libs
+import salt.transport.mixins.auth
+
+# Import test support libs
+from tests.support.unit import TestCase
+from tests.support.mock import MagicMock, patch
+
+
+class AuthAdmissionTest(TestCase):
+    '''
+    Test the rate limit of the sign-ins
+    '''
+    def test_unlimited(self):
+        admission = salt.transport.mixins.auth.AuthAdmission(0)
+        for _ in range(100):
+            self.assertEqual(admission.admit(), 0)
+        self.assertEqual(admission.stats(),
+                         {'admitted': 100, 'rejected': 0, 'queued': 0, 'rate': 0})
+
+    def test_rate(self):
+        clock = MagicMock(return_value=1000.0)
+        with patch('time.time', clock):
+            admission = salt.transport.mixins.auth.AuthAdmission(10.0)
+            # A second worth of sign-ins is admitted at once
+            for _ in range(10):
+                self.assertEqual(admission.admit(), 0)
+            # The others are told to come back one after another
+            retries = [admission.admit() for _ in range(20)]
+            self.assertEqual([round(retry, 6) for retry in retries],
+                             [round(0.1 * idx, 6) for idx in range(1, 21)])
+            self.assertEqual(admission.queued(), 20)
+            clock.return_value = 1001.0
+            self.assertEqual(admission.queued(), 10)
+            # The bucket refilled
+            for _ in range(10):
+                self.assertEqual(admission.admit(), 0)
+            self.assertEqual(round(admission.admit(), 6), 1.1)
+            stats = admission.stats()
+        self.assertEqual(stats['admitted'], 20)
+        self.assertEqual(stats['rejected'], 21)
+        self.assertEqual(admission.stats()['rejected'], 0)
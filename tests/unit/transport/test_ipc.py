@@ -27,7 +27,7 @@ from salt.ext.six.moves import range
 # Import Salt Testing libs
 from tests.support.mock import MagicMock
 from tests.support.paths import TMP
-from tests.support.unit import skipIf
+from tests.support.unit import skipIf, TestCase
 
 log = logging.getLogger(__name__)
 
@@ -154,3 +154,20 @@ class IPCMessageClient(BaseIPCReqCase):
         self.channel.send({'stop': True})
         self.wait()
         self.assertEqual(self.payloads[:-1], [None, None, 'foo', 'foo'])
+
+
+class TagFilterTest(TestCase):
+    '''
+    Test the tag filters of the IPC subscribers
+    '''
+    def test_compile_tag_filter(self):
+        tag_filter = salt.transport.ipc.compile_tag_filter(
+            ['salt/job/', 'salt/*/stats', 'salt/auth'])
+        for tag in ('salt/job/1/ret/minion', 'salt/MWorker-1/stats',
+                    'salt/auth', 'salt/auth/stats'):
+            self.assertTrue(tag_filter.match(tag), tag)
+        for tag in ('salt/key', 'other/salt/job/1', 'salt/MWorker-1/stats/more'):
+            self.assertFalse(tag_filter.match(tag), tag)
+        # Regex characters in prefixes match themselves
+        self.assertFalse(salt.transport.ipc.compile_tag_filter(['a.b']).match('axb'))
+        self.assertFalse(salt.transport.ipc.compile_tag_filter([]).match('salt/job'))
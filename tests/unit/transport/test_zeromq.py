@@ -6,6 +6,8 @@
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
 import os
+import shutil
+import tempfile
 import time
 import threading
 
@@ -25,16 +27,21 @@ import tornado.gen
 
 # Import Salt libs
 import salt.config
+import salt.crypt
+import salt.master
+import salt.payload
 from salt.ext import six
 import salt.utils.process
 import salt.transport.server
 import salt.transport.client
+import salt.transport.zeromq
+import salt.utils.workerpools
 import salt.exceptions
 from salt.ext.six.moves import range
-from salt.transport.zeromq import AsyncReqMessageClientPool
+from salt.transport.zeromq import AsyncReqMessageClientPool, ZeroMQPubServerChannel
 
 # Import test support libs
-from tests.support.paths import TMP_CONF_DIR
+from tests.support.paths import TMP, TMP_CONF_DIR
 from tests.support.unit import TestCase, skipIf
 from tests.support.helpers import flaky, get_unused_localhost_port
 from tests.support.mixins import AdaptedConfigurationTestCaseMixin
@@ -338,3 +345,216 @@ class ZMQConfigTest(TestCase):
             assert salt.transport.zeromq._get_master_uri(master_ip=m_ip,
                                                          master_port=m_port,
                                                          source_port=s_port) == 'tcp://0.0.0.0:{0};{1}:{2}'.format(s_port, m_ip, m_port)
+
+
+class ZMQPubServerChannelPublishTest(TestCase):
+    '''
+    Test handing publications to the publisher daemon
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'sock_dir': self.tmp_dir,
+                          'pki_dir': self.tmp_dir,
+                          'sign_pub_messages': True})
+        salt.crypt.gen_keys(self.tmp_dir, 'master', 2048)
+        self.aes = salt.crypt.Crypticle.generate_key_string()
+        self.secrets = patch.dict(
+            salt.master.SMaster.secrets,
+            {'aes': {'secret': MagicMock(value=self.aes)}})
+        self.secrets.start()
+        self.context = zmq.Context()
+        self.pull_sock = self.context.socket(zmq.PULL)
+        self.pull_sock.bind('ipc://' + os.path.join(self.tmp_dir, 'publish_pull.ipc'))
+        self.serial = salt.payload.Serial(self.opts)
+
+    def tearDown(self):
+        self.secrets.stop()
+        self.pull_sock.close(0)
+        self.context.term()
+        shutil.rmtree(self.tmp_dir)
+
+    def _recv(self):
+        if not self.pull_sock.poll(5000):
+            self.fail('Nothing was published')
+        ret = []
+        for frame in self.pull_sock.recv_multipart():
+            payload = self.serial.loads(self.serial.loads(frame)['payload'])
+            self.assertTrue(salt.crypt.verify_signature(
+                os.path.join(self.tmp_dir, 'master.pub'),
+                payload['load'],
+                payload['sig']))
+            crypticle = salt.crypt.Crypticle(self.opts, self.aes)
+            ret.append(crypticle.loads(payload['load']))
+        return ret
+
+    def test_publish(self):
+        chan = ZeroMQPubServerChannel(self.opts)
+        self.addCleanup(chan.pub_close)
+        load = {'fun': 'test.ping', 'tgt': '*', 'tgt_type': 'glob', 'jid': '1'}
+        with patch('salt.crypt.get_rsa_key', MagicMock(wraps=salt.crypt.get_rsa_key)) as get_key:
+            chan.publish(load)
+            sock = chan.pub_sock
+            crypticle = chan._crypticle
+            self.assertEqual(self._recv(), [load])
+            chan.publish(dict(load, jid='2'))
+            self.assertEqual(self._recv(), [dict(load, jid='2')])
+        # The socket, cipher and signing key are reused
+        self.assertIs(chan.pub_sock, sock)
+        self.assertIs(chan._crypticle, crypticle)
+        self.assertEqual(get_key.call_count, 1)
+
+    def test_publish_batch(self):
+        chan = ZeroMQPubServerChannel(self.opts)
+        self.addCleanup(chan.pub_close)
+        loads = [{'fun': 'test.ping', 'tgt': '*', 'tgt_type': 'glob', 'jid': six.text_type(jid)}
+                 for jid in range(3)]
+        chan.publish_batch(loads)
+        self.assertEqual(self._recv(), loads)
+
+    def test_publish_key_rotation(self):
+        chan = ZeroMQPubServerChannel(self.opts)
+        self.addCleanup(chan.pub_close)
+        load = {'fun': 'test.ping', 'tgt': '*', 'tgt_type': 'glob', 'jid': '1'}
+        chan.publish(load)
+        self._recv()
+        self.aes = salt.crypt.Crypticle.generate_key_string()
+        salt.master.SMaster.secrets['aes']['secret'].value = self.aes
+        chan.publish(load)
+        self.assertEqual(self._recv(), [load])
+
+    def test_publish_filtering(self):
+        self.opts['zmq_filtering'] = True
+        chan = ZeroMQPubServerChannel(self.opts)
+        self.addCleanup(chan.pub_close)
+        check_minions = MagicMock(return_value={'minions': ['m1', 'm2'],
+                                                'missing': []})
+        load = {'fun': 'test.ping', 'tgt': 'os|Debian', 'tgt_type': 'grain',
+                'delimiter': '|', 'jid': '1'}
+        with patch.object(chan.ckminions, 'check_minions', check_minions):
+            package = self.serial.loads(chan._package(load))
+            self.assertEqual(package['topic_lst'], ['m1', 'm2'])
+            check_minions.assert_called_once_with(
+                'os|Debian', tgt_type='grain', delimiter='|', greedy=True)
+
+            # Without the minion data cache, grains match every minion
+            check_minions.reset_mock()
+            self.opts['minion_data_cache'] = False
+            package = self.serial.loads(chan._package(load))
+            self.assertNotIn('topic_lst', package)
+            self.assertEqual(check_minions.call_count, 0)
+
+            load.update({'tgt': 'web* and G@os:Debian', 'tgt_type': 'compound'})
+            package = self.serial.loads(chan._package(load))
+            self.assertEqual(package['topic_lst'], ['m1', 'm2'])
+
+
+class ZMQReqServerChannelPoolsTest(TestCase):
+    '''
+    Test routing requests to the worker pools
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'sock_dir': self.tmp_dir,
+                          'interface': '127.0.0.1',
+                          'ret_port': get_unused_localhost_port(),
+                          'worker_threads': 1,
+                          'worker_pools': {
+                              'fileserver': {'commands': ['_serve_file'],
+                                             'queue_depth': 2},
+                              'control': {'commands': ['publish']}}})
+        self.serial = salt.payload.Serial(self.opts)
+        self.sockets = []
+        self.chan = salt.transport.zeromq.ZeroMQReqServerChannel(self.opts)
+        self.chan.context = zmq.Context()
+        self.chan.clients = self.chan.context.socket(zmq.ROUTER)
+        self.chan.clients.bind('tcp://127.0.0.1:{0}'.format(self.opts['ret_port']))
+        self.chan.workers = self.chan.context.socket(zmq.DEALER)
+        self.chan.workers.bind(self.chan._worker_uri())
+        self.router = threading.Thread(
+            target=self.chan._route_pools,
+            args=(salt.utils.workerpools.get_pools(self.opts),))
+        self.router.start()
+
+    def tearDown(self):
+        self.chan._closing = True
+        self.router.join()
+        for sock in self.sockets:
+            sock.close(0)
+        self.chan.clients.close(0)
+        self.chan.workers.close(0)
+        for sock in self.chan.pool_sockets.values():
+            sock.close(0)
+        self.chan.context.term()
+        shutil.rmtree(self.tmp_dir)
+
+    def _socket(self, kind, uri):
+        sock = self.chan.context.socket(kind)
+        self.sockets.append(sock)
+        sock.connect(uri)
+        return sock
+
+    def test_worker_uri(self):
+        self.assertEqual(self.chan._worker_uri(),
+                         'ipc://' + os.path.join(self.tmp_dir, 'workers.ipc'))
+        self.assertEqual(self.chan._worker_uri('control'),
+                         'ipc://' + os.path.join(self.tmp_dir, 'workers-control.ipc'))
+        self.opts.update({'ipc_mode': 'tcp', 'tcp_master_workers': 4515})
+        self.assertEqual(self.chan._worker_uri(), 'tcp://127.0.0.1:4515')
+        self.assertEqual(self.chan._worker_uri('control'), 'tcp://127.0.0.1:4516')
+        self.assertEqual(self.chan._worker_uri('fileserver'), 'tcp://127.0.0.1:4517')
+
+    def test_route_pools(self):
+        workers = dict(
+            (pool, self._socket(zmq.REP, self.chan._worker_uri(pool)))
+            for pool in ('default', 'fileserver', 'control'))
+        # Requests to a pool no worker connected to yet are dropped
+        time.sleep(0.5)
+        payloads = [
+            ('fileserver', {'enc': 'aes', 'load': 'crypted', 'cmd': '_serve_file'}),
+            ('control', {'enc': 'clear', 'load': {'cmd': 'publish'}}),
+            ('default', {'enc': 'aes', 'load': 'crypted', 'cmd': '_return'}),
+            ('default', {'enc': 'aes', 'load': 'crypted'}),
+        ]
+        for pool, payload in payloads:
+            client = self._socket(zmq.REQ, 'tcp://127.0.0.1:{0}'.format(self.opts['ret_port']))
+            client.send(self.serial.dumps(payload))
+            worker = workers[pool]
+            if not worker.poll(5000):
+                self.fail('The {0} pool got no request'.format(pool))
+            self.assertEqual(self.serial.loads(worker.recv()), payload)
+            worker.send(self.serial.dumps(pool))
+            if not client.poll(5000):
+                self.fail('No reply from the {0} pool'.format(pool))
+            self.assertEqual(self.serial.loads(client.recv()), pool)
+
+    def test_route_pools_queue_depth(self):
+        worker = self._socket(zmq.REP, self.chan._worker_uri('fileserver'))
+        # Requests to a pool no worker connected to yet are dropped
+        time.sleep(0.5)
+        uri = 'tcp://127.0.0.1:{0}'.format(self.opts['ret_port'])
+        payload = {'enc': 'aes', 'load': 'crypted', 'cmd': '_serve_file'}
+        clients = []
+        for num in range(3):
+            client = self._socket(zmq.REQ, uri)
+            client.send(self.serial.dumps(dict(payload, num=num)))
+            clients.append(client)
+        # Let the router queue the requests before the worker replies
+        time.sleep(1)
+        received = []
+        while worker.poll(1000):
+            num = self.serial.loads(worker.recv())['num']
+            received.append(num)
+            worker.send(self.serial.dumps(num))
+        # The request over the queue depth of the pool was dropped
+        self.assertEqual(len(received), 2)
+        replied = [client for client in clients if client.poll(1000)]
+        self.assertEqual(len(replied), 2)
+
+        # The pool takes requests again once its workers replied
+        client = self._socket(zmq.REQ, uri)
+        client.send(self.serial.dumps(dict(payload, num=3)))
+        if not worker.poll(5000):
+            self.fail('The fileserver pool got no request')
+        self.assertEqual(self.serial.loads(worker.recv())['num'], 3)
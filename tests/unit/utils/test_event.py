@@ -11,6 +11,9 @@
 from __future__ import absolute_import, unicode_literals, print_function
 import os
 import hashlib
+import shutil
+import tempfile
+import threading
 import time
 from tornado.testing import AsyncTestCase
 import zmq
@@ -22,9 +25,12 @@ from contextlib import contextmanager
 from multiprocessing import Process
 
 # Import Salt Testing libs
+from tests.support.mock import MagicMock, patch
 from tests.support.unit import expectedFailure, skipIf, TestCase
 
 # Import salt libs
+import salt.config
+import salt.minion
 import salt.utils.event
 import salt.utils.stringutils
 import tests.integration as integration
@@ -292,6 +298,58 @@ class TestSaltEvent(TestCase):
             evt2 = me2.get_event(tag='evt1')
             self.assertGotEvent(evt2, {'data': 'foo1'})
 
+    def test_event_tag_filter(self):
+        '''Test the publisher only sends the events matching a tag filter'''
+        with eventpublisher_process():
+            me1 = salt.utils.event.MasterEvent(SOCK_DIR, listen=True)
+            me1.set_tag_filter(['salt/job/', 'salt/*/stats'])
+            me2 = salt.utils.event.MasterEvent(SOCK_DIR, listen=True)
+            # The filter is sent along with the first read
+            me1.get_event(wait=0.5)
+            time.sleep(0.5)
+            for tag in ('other/evt', 'salt/job/1/ret/minion', 'salt/MWorker-1/stats'):
+                me2.fire_event({'data': tag}, tag)
+            tags = [me2.get_event(tag='', full=True)['tag'] for _ in range(3)]
+            self.assertEqual(tags, ['other/evt', 'salt/job/1/ret/minion', 'salt/MWorker-1/stats'])
+            evt = me1.get_event(tag='', full=True)
+            self.assertGotEvent(evt, {'tag': 'salt/job/1/ret/minion'})
+            evt = me1.get_event(tag='', full=True)
+            self.assertGotEvent(evt, {'tag': 'salt/MWorker-1/stats'})
+            self.assertIsNone(me1.get_event(tag='', wait=0.5))
+
+            # Back to all the events
+            me1.set_tag_filter(None)
+            me1.get_event(wait=0.5)
+            time.sleep(0.5)
+            me2.fire_event({'data': 'other'}, 'other/evt')
+            self.assertGotEvent(me1.get_event(tag='other/evt'), {'data': 'other'})
+
+    def test_event_unpack_tag(self):
+        '''Test splitting the tag of an event from its packed data'''
+        me = salt.utils.event.MasterEvent(SOCK_DIR, listen=False)
+        raw = salt.utils.stringutils.to_bytes('salt/job/1/ret/minion' + salt.utils.event.TAGEND) \
+            + me.serial.dumps({'return': True})
+        mtag, mdata = me.unpack_tag(raw)
+        self.assertEqual(mtag, 'salt/job/1/ret/minion')
+        self.assertEqual(me.unpack_data(mdata), {'return': True})
+        self.assertEqual(me.unpack(raw), (mtag, {'return': True}))
+
+    def test_event_lazy_decoding(self):
+        '''Test only the data of the events matching the tag is decoded'''
+        with eventpublisher_process():
+            me = salt.utils.event.MasterEvent(SOCK_DIR, listen=True)
+            me.subscribe('salt/job/1/ret/')
+            for tag in ('salt/job/2/ret/minion', 'salt/job/1/ret/minion', 'salt/job/3/ret/minion'):
+                me.fire_event({'data': tag}, tag)
+            with patch.object(me, 'unpack_data', wraps=me.unpack_data) as unpack_data:
+                evt = me.get_event(tag='salt/job/3/ret/', full=True)
+                self.assertGotEvent(evt, {'tag': 'salt/job/3/ret/minion'})
+                # The subscribed event was cached without being decoded
+                self.assertEqual(unpack_data.call_count, 1)
+                evt = me.get_event(tag='salt/job/1/ret/', full=True)
+                self.assertGotEvent(evt['data'], {'data': 'salt/job/1/ret/minion'})
+                self.assertEqual(unpack_data.call_count, 2)
+
     @expectedFailure
     def test_event_nested_sub_all(self):
         '''Test nested event subscriptions do not drop events, get event for all tags'''
@@ -366,3 +424,124 @@ class TestAsyncEventPublisher(AsyncTestCase):
         self.assertEqual(self.tag, 'evt1')
         self.data.pop('_stamp')  # drop the stamp
         self.assertEqual(self.data, {'data': 'foo1'})
+
+
+class TestEventReturn(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'cachedir': self.tmp_dir,
+                          'event_return': 'fake',
+                          'event_return_queue': 3})
+        self.written = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _returner(self, batch):
+        self.release.wait(5)
+        self.written.append([event['tag'] for event in batch])
+
+    def _get_event_return(self, **opts):
+        self.opts.update(opts)
+        with patch('salt.minion.MasterMinion', MagicMock()):
+            evr = salt.utils.event.EventReturn(self.opts)
+        evr.minion.returners = {'fake.event_return': self._returner}
+        return evr
+
+    def _add(self, evr, *tags):
+        for tag in tags:
+            evr.add_event({'tag': tag, 'data': {'tag': tag}})
+            if evr._batch_full():
+                evr.flush_events()
+
+    def _wait_written(self, count):
+        for _ in range(50):
+            if sum(len(batch) for batch in self.written) >= count:
+                return
+            time.sleep(0.1)
+        self.fail('The events were not written: {0}'.format(self.written))
+
+    def test_batch_full(self):
+        evr = self._get_event_return(event_return_queue_max_bytes=100,
+                                     event_return_queue_max_seconds=60)
+        self.assertFalse(evr._batch_full())
+        evr.add_event({'tag': 'a', 'data': {}})
+        self.assertFalse(evr._batch_full())
+        # By age
+        evr.event_queue_time -= 61
+        self.assertTrue(evr._batch_full())
+        evr.flush_events()
+        # By size
+        evr.add_event({'tag': 'a', 'data': {'data': 'x' * 100}})
+        self.assertTrue(evr._batch_full())
+        evr.flush_events()
+        # By count
+        for _ in range(3):
+            evr.add_event({'tag': 'a', 'data': {}})
+        self.assertTrue(evr._batch_full())
+
+    def test_writer(self):
+        evr = self._get_event_return()
+        evr.start_writer()
+        self._add(evr, 'a', 'b', 'c', 'd')
+        self._wait_written(3)
+        evr.stop_writer()
+        self.assertEqual(self.written, [['a', 'b', 'c'], ['d']])
+        stats = evr.get_stats()
+        self.assertEqual(stats['flushes'], 2)
+        self.assertEqual(stats['flushed'], 4)
+        self.assertEqual(stats['dropped'], 0)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_spill(self):
+        evr = self._get_event_return(event_return_queue=1,
+                                     event_return_backlog=2)
+        self.release.clear()
+        evr.start_writer()
+        # The writer is stuck on the first event, the next two wait in
+        # memory and the others are spilled
+        self._add(evr, 'a')
+        for _ in range(50):
+            if not evr.batches:
+                break
+            time.sleep(0.1)
+        self._add(evr, 'b', 'c', 'd', 'e')
+        self.assertEqual(evr.queued, 2)
+        self.assertEqual(len(evr.spill_files), 2)
+        self.assertEqual(len(os.listdir(evr.spill_dir)), 2)
+        stats = evr.get_stats()
+        self.assertEqual(stats['queue_depth'], 2)
+        self.assertEqual(stats['spilled'], 2)
+        self.release.set()
+        self._wait_written(5)
+        evr.stop_writer()
+        self.assertEqual(self.written, [['a'], ['b'], ['c'], ['d'], ['e']])
+        self.assertEqual(os.listdir(evr.spill_dir), [])
+        self.assertEqual(evr.spill_bytes, 0)
+
+    def test_spill_next_run(self):
+        evr = self._get_event_return(event_return_queue=1)
+        # Not started, everything is left for the next run
+        self._add(evr, 'a', 'b')
+        evr.stop_writer()
+        self.assertEqual(self.written, [])
+        self.assertEqual(len(os.listdir(evr.spill_dir)), 2)
+
+        evr = self._get_event_return()
+        evr.start_writer()
+        self._wait_written(2)
+        evr.stop_writer()
+        self.assertEqual(self.written, [['a'], ['b']])
+
+    def test_drop(self):
+        evr = self._get_event_return(event_return_queue=1,
+                                     event_return_backlog=1,
+                                     event_return_spill_size=0)
+        self._add(evr, 'a', 'b', 'c')
+        self.assertEqual(evr.get_stats()['dropped'], 2)
+        # Without spilling, what is left is written on the way out
+        evr.stop_writer()
+        self.assertEqual(self.written, [['a']])
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Import python libs
+from __future__ import absolute_import, unicode_literals, print_function
+import io
+import os
+import random
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from tests.support.paths import TMP
+from tests.support.unit import TestCase
+
+# Import Salt libs
+import salt.utils.filedelta
+import salt.utils.files
+
+
+class FiledeltaTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.path = os.path.join(self.tmp_dir, 'old')
+        rand = random.Random(1)
+        self.old = bytes(bytearray(rand.getrandbits(8) for _ in range(300000)))
+        with salt.utils.files.fopen(self.path, 'wb') as fp_:
+            fp_.write(self.old)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _roundtrip(self, new, max_literal=1048576):
+        '''
+        Diff new against the old copy, return the operations and the size of
+        the new data, after checking they rebuild new
+        '''
+        block_size = salt.utils.filedelta.block_size(len(self.old))
+        sigs = salt.utils.filedelta.signatures(self.path, block_size)
+        new_fp = io.BytesIO(new)
+        ops = []
+        loc = 0
+        while loc is not None:
+            chunk, loc = salt.utils.filedelta.delta(
+                new_fp, sigs, block_size, loc, max_literal)
+            ops.extend(chunk)
+        result = io.BytesIO()
+        with salt.utils.files.fopen(self.path, 'rb') as src:
+            salt.utils.filedelta.patch(src, ops, block_size, result)
+        self.assertEqual(result.getvalue(), new)
+        return ops, sum(len(op_) for op_ in ops if not isinstance(op_, list))
+
+    def test_block_size(self):
+        self.assertEqual(salt.utils.filedelta.block_size(0), 2048)
+        self.assertEqual(salt.utils.filedelta.block_size(300000), 2048)
+        self.assertEqual(salt.utils.filedelta.block_size(2 ** 30), 262144)
+
+    def test_unchanged(self):
+        ops, literal = self._roundtrip(self.old)
+        self.assertEqual(ops, [[0, len(self.old) // 2048 + 1]])
+        self.assertEqual(literal, 0)
+
+    def test_edit(self):
+        new = self.old[:100000] + b'changed' + self.old[100007:]
+        self.assertLessEqual(self._roundtrip(new)[1], 2048)
+
+    def test_insert_and_delete(self):
+        new = self.old[:50000] + b'inserted' * 500 + self.old[50000:200000] \
+            + self.old[210000:]
+        # The inserted data and up to two blocks around each change
+        self.assertLessEqual(self._roundtrip(new)[1], 4000 + 4 * 2048)
+
+    def test_truncated(self):
+        # Only the last, partial block is sent
+        self.assertLess(self._roundtrip(self.old[:-1000])[1], 2048)
+
+    def test_new_data(self):
+        new = os.urandom(100000)
+        ops, literal = self._roundtrip(new, max_literal=10000)
+        self.assertEqual(literal, len(new))
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+Unit tests for salt.utils.jobworkers
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import shutil
+import signal
+import tempfile
+import time
+
+# Import Salt Testing libs
+from tests.support.unit import TestCase, skipIf
+
+# Import salt libs
+import salt.utils.files
+import salt.utils.jobworkers
+import salt.utils.platform
+
+# Import 3rd-party libs
+import tornado.gen
+import tornado.ioloop
+
+
+def _run_job(data, path):
+    '''
+    Record the job and the worker which ran it
+    '''
+    if data['fun'] == 'test.sleep':
+        time.sleep(30)
+    with salt.utils.files.fopen(os.path.join(path, data['jid']), 'w') as fp_:
+        fp_.write('{0}'.format(os.getpid()))
+
+
+@skipIf(salt.utils.platform.is_windows(), 'Job workers need fork')
+class JobWorkerPoolTest(TestCase):
+    def setUp(self):
+        self.io_loop = tornado.ioloop.IOLoop()
+        self.tmpdir = tempfile.mkdtemp()
+        self.pool = None
+
+    def tearDown(self):
+        if self.pool is not None:
+            workers = [worker['process'] for worker in self.pool.workers]
+            self.pool.close()
+            for process in workers:
+                process.terminate()
+                process.join(5)
+        self.io_loop.close(all_fds=True)
+        shutil.rmtree(self.tmpdir)
+
+    def _start(self, size, **kwargs):
+        self.pool = salt.utils.jobworkers.JobWorkerPool(
+            _run_job, self.io_loop, size, **kwargs)
+        self.pool.start()
+        return self.pool
+
+    def _wait(self, condition, timeout=20):
+        @tornado.gen.coroutine
+        def wait():
+            while not condition():
+                yield tornado.gen.sleep(0.05)
+        self.io_loop.run_sync(wait, timeout=timeout)
+
+    def _pid(self, jid):
+        with salt.utils.files.fopen(os.path.join(self.tmpdir, jid)) as fp_:
+            return int(fp_.read())
+
+    def _idle(self):
+        return all(worker['jid'] is None for worker in self.pool.workers)
+
+    def test_dispatch(self):
+        pool = self._start(2)
+        pids = set(worker['process'].pid for worker in pool.workers)
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '1'}, self.tmpdir))
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '2'}, self.tmpdir))
+        # All the workers are busy
+        self.assertFalse(pool.dispatch({'fun': 'test.ping', 'jid': '3'}, self.tmpdir))
+        self._wait(self._idle)
+        self.assertEqual(set([self._pid('1'), self._pid('2')]), pids)
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '3'}, self.tmpdir))
+        self._wait(self._idle)
+        self.assertIn(self._pid('3'), pids)
+        self.assertEqual(set(worker['process'].pid for worker in pool.workers), pids)
+
+    def test_functions(self):
+        pool = self._start(1, functions=['status.*', 'test.ping'])
+        self.assertTrue(pool.accepts('status.loadavg'))
+        self.assertTrue(pool.accepts('test.ping'))
+        self.assertFalse(pool.accepts('state.apply'))
+        self.assertFalse(pool.accepts(['test.ping', 'status.loadavg']))
+        self.assertFalse(pool.dispatch({'fun': 'state.apply', 'jid': '1'}, self.tmpdir))
+
+    def test_max_jobs(self):
+        pool = self._start(1, max_jobs=2)
+        pid = pool.workers[0]['process'].pid
+        for jid in ('1', '2'):
+            self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': jid}, self.tmpdir))
+            self._wait(self._idle)
+        self.assertEqual(self._pid('1'), pid)
+        self.assertEqual(self._pid('2'), pid)
+        # The worker exits after its second job and gets replaced
+        self._wait(lambda: pool.workers and pool.workers[0]['process'].pid != pid)
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '3'}, self.tmpdir))
+        self._wait(self._idle)
+        self.assertEqual(self._pid('3'), pool.workers[0]['process'].pid)
+
+    def test_killed_worker(self):
+        pool = self._start(1)
+        pid = pool.workers[0]['process'].pid
+        self.assertTrue(pool.dispatch({'fun': 'test.sleep', 'jid': '1'}, self.tmpdir))
+        os.kill(pid, signal.SIGKILL)
+        self._wait(lambda: pool.workers and pool.workers[0]['process'].pid != pid)
+        self.assertIsNone(pool.workers[0]['jid'])
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '2'}, self.tmpdir))
+        self._wait(self._idle)
+        self.assertEqual(self._pid('2'), pool.workers[0]['process'].pid)
+
+    def test_recycle(self):
+        pool = self._start(2)
+        pids = set(worker['process'].pid for worker in pool.workers)
+        pool.recycle()
+        self.assertFalse(pool.dispatch({'fun': 'test.ping', 'jid': '1'}, self.tmpdir))
+        self._wait(lambda: len(pool.workers) == 2 and not any(
+            worker['process'].pid in pids for worker in pool.workers))
+        self.assertTrue(pool.dispatch({'fun': 'test.ping', 'jid': '1'}, self.tmpdir))
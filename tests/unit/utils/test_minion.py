@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+'''
+Unit tests for salt.utils.minion
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from tests.support.unit import TestCase
+from tests.support.mock import patch, MagicMock
+
+# Import salt libs
+import salt.payload
+import salt.utils.files
+import salt.utils.minion
+
+
+class JobRegistryTest(TestCase):
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.proc_dir = os.path.join(self.cachedir, 'proc')
+        os.makedirs(self.proc_dir)
+        self.opts = {'cachedir': self.cachedir,
+                     'multiprocessing': True,
+                     'job_registry': True}
+        self.serial = salt.payload.Serial(self.opts)
+
+    def tearDown(self):
+        salt.utils.minion._REGISTRY = None
+        shutil.rmtree(self.cachedir)
+
+    def _write(self, data):
+        path = os.path.join(self.proc_dir, data['jid'])
+        with salt.utils.files.fopen(path, 'w+b') as fp_:
+            fp_.write(self.serial.dumps(data))
+        return path
+
+    def test_load(self):
+        '''
+        The jobs which outlived the previous minion process are read from
+        their proc files
+        '''
+        self._write({'jid': '1', 'pid': 1234, 'fun': 'test.sleep'})
+        with patch('salt.utils.process.os_is_running', MagicMock(return_value=True)), \
+                patch('salt.utils.minion._check_cmdline', MagicMock(return_value=True)):
+            registry = salt.utils.minion.start_job_registry(self.opts)
+            self.assertEqual(registry.get('1'), {'jid': '1', 'pid': 1234, 'fun': 'test.sleep'})
+            # running() answers from the registry in the minion process
+            with patch('salt.utils.minion._scan') as scan:
+                self.assertEqual(salt.utils.minion.running(self.opts), [registry.get('1')])
+                scan.assert_not_called()
+
+    def test_start_finish(self):
+        registry = salt.utils.minion.start_job_registry(self.opts)
+        data = {'jid': '1', 'pid': 1234, 'fun': 'test.ping'}
+        path = self._write(data)
+        with patch('salt.utils.process.os_is_running', MagicMock(return_value=True)):
+            salt.utils.minion.job_started(self.opts, data)
+            self.assertEqual(registry.running(), [data])
+            salt.utils.minion.job_finished(self.opts, path)
+            self.assertEqual(registry.running(), [])
+            self.assertIsNone(registry.get('1'))
+        self.assertFalse(os.path.exists(path))
+
+        # A job which finished before its start was handled is left out
+        registry.add({'jid': '2', 'pid': 1234})
+        self.assertEqual(registry.jobs, {})
+
+    def test_dead_job(self):
+        '''
+        The jobs killed before telling the minion process are dropped
+        '''
+        registry = salt.utils.minion.start_job_registry(self.opts)
+        data = {'jid': '1', 'pid': 1234, 'fun': 'test.sleep'}
+        path = self._write(data)
+        registry.add(data)
+        with patch('salt.utils.process.os_is_running', MagicMock(return_value=False)):
+            self.assertIsNone(registry.get('1'))
+        self.assertEqual(registry.jobs, {})
+        self.assertFalse(os.path.exists(path))
+
+    def test_forked_process(self):
+        '''
+        The processes forked from the minion read the proc files and tell the
+        minion process about their jobs with events
+        '''
+        registry = salt.utils.minion.start_job_registry(self.opts)
+        data = {'jid': '1', 'pid': 1234, 'fun': 'test.ping'}
+        with patch.object(registry, 'pid', registry.pid + 1), \
+                patch('salt.utils.minion._scan', MagicMock(return_value=[])) as scan, \
+                patch('salt.utils.event.get_event') as get_event:
+            self.assertEqual(salt.utils.minion.running(self.opts), [])
+            scan.assert_called_once_with(self.opts)
+            salt.utils.minion.job_started(self.opts, data)
+            get_event.return_value.fire_event.assert_called_once_with(data, '__job_start')
+        self.assertEqual(registry.jobs, {})
+
+    def test_disabled(self):
+        opts = dict(self.opts, job_registry=False)
+        path = self._write({'jid': '1', 'pid': 1234})
+        with patch('salt.utils.event.get_event') as get_event:
+            salt.utils.minion.job_started(opts, {'jid': '1', 'pid': 1234})
+            salt.utils.minion.job_finished(opts, path)
+            get_event.assert_not_called()
+        self.assertTrue(os.path.exists(path))
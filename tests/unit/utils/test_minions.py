@@ -2,12 +2,19 @@
 
 # Import python libs
 from __future__ import absolute_import, unicode_literals
+import os
+import shutil
 import sys
+import tempfile
 
 # Import Salt Libs
+import salt.cache
+import salt.config
 import salt.utils.minions
+from salt.exceptions import SaltInvocationError
 
 # Import Salt Testing Libs
+from tests.support.paths import TMP
 from tests.support.unit import TestCase, skipIf
 from tests.support.mock import (
     patch,
@@ -509,3 +516,213 @@ class NodegroupCompTest(TestCase):
         # If this works, it should also print an error to the console
         ret = salt.utils.minions.nodegroup_comp('group1', referenced_nodegroups)
         self.assertEqual(ret, [])
+
+
+class MinionDataIndexTestCase(TestCase):
+    '''
+    TestCase for salt.utils.minions.MinionDataIndex
+    '''
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=TMP)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
+        self.opts.update({'cachedir': os.path.join(self.tmp_dir, 'cache'),
+                          'pki_dir': os.path.join(self.tmp_dir, 'pki')})
+        os.makedirs(os.path.join(self.opts['pki_dir'], 'minions'))
+        self.cache = salt.cache.factory(self.opts)
+        oses = ('Ubuntu', 'CentOS', 'Debian')
+        for idx in range(30):
+            grains = {'os': oses[idx % 3],
+                      'num_cpus': idx % 4,
+                      'roles': ['web', 'db'] if idx % 2 else ['web'],
+                      'nested': {'a': {'b': 'c{0}'.format(idx % 5)}},
+                      'ip': ['10.0.0.{0}'.format(idx)],
+                      'colon': 'x:y' if idx % 2 else 'x',
+                      'list_of_dicts': [{'k': 'v{0}'.format(idx % 2)}]}
+            self.add_minion('minion{0}'.format(idx), grains)
+        # An accepted minion without cached data
+        self.add_minion('nodata', None)
+        self.addCleanup(salt.utils.minions._MINION_DATA_INDEXES.clear)
+
+    def add_minion(self, id_, grains):
+        with salt.utils.files.fopen(
+                os.path.join(self.opts['pki_dir'], 'minions', id_), 'w') as fp_:
+            fp_.write('key')
+        if grains is not None:
+            self.cache.store('minions/{0}'.format(id_),
+                             'data',
+                             {'grains': grains, 'pillar': {}})
+
+    def check(self, expr, greedy, exact_match=False):
+        scan = salt.utils.minions.CkMinions(self.opts)._check_cache_minions(
+            expr, ':', greedy, 'grains', exact_match=exact_match)
+        opts = dict(self.opts, minion_data_index=True)
+        indexed = salt.utils.minions.CkMinions(opts)._check_cache_minions(
+            expr, ':', greedy, 'grains', exact_match=exact_match)
+        self.assertEqual(sorted(indexed['minions']), sorted(scan['minions']))
+        return sorted(indexed['minions'])
+
+    def test_same_as_scan(self):
+        '''
+        The index must find the same minions as a scan of the cache
+        '''
+        for expr in ('os:Ubuntu', 'os:ubuntu', 'os:Arch', 'num_cpus:2',
+                     'roles:db', 'nested:a:b:c1', 'nested:a', 'nested:a:b',
+                     'ip:10.0.0.7', 'ip:0:10.0.0.7', 'colon:x:y', 'colon:x',
+                     'list_of_dicts:k:v1', 'list_of_dicts:k', 'missing:key',
+                     'os', 'nested:c2'):
+            for greedy in (True, False):
+                self.check(expr, greedy)
+                self.check(expr, greedy, exact_match=True)
+        self.assertEqual(len(self.check('os:Ubuntu', False)), 10)
+        self.assertIn('nodata', self.check('os:Ubuntu', True))
+
+    def test_not_indexable(self):
+        '''
+        Globs and regular expressions fall back to a scan of the cache
+        '''
+        indexable = salt.utils.minions.MinionDataIndex.indexable
+        self.assertTrue(indexable('os:Ubuntu'))
+        self.assertFalse(indexable('os:Ubu*'))
+        self.assertFalse(indexable('os:Ubuntu', regex_match=True))
+        self.assertFalse(indexable('os:Ubunt?'))
+        self.assertTrue(indexable('os:Ubunt?', exact_match=True))
+        self.assertFalse(indexable('os:*', exact_match=True))
+        self.assertEqual(len(self.check('os:Ub*', False)), 10)
+
+    def test_updates(self):
+        '''
+        Changes written to the journal are picked up by the index and a new
+        process starts from the saved index
+        '''
+        self.assertEqual(self.check('os:Arch', False), [])
+        self.cache.store('minions/minion0', 'data',
+                         {'grains': {'os': 'Arch'}, 'pillar': {}})
+        self.opts['minion_data_index'] = True
+        salt.utils.minions.minion_data_updated(self.opts, 'minion0')
+        self.opts['minion_data_index'] = False
+        self.assertEqual(self.check('os:Arch', False), ['minion0'])
+        self.assertNotIn('minion0', self.check('os:Ubuntu', False))
+
+        self.cache.flush('minions/minion1')
+        self.add_minion('new', {'os': 'Arch'})
+        self.opts['minion_data_index'] = True
+        salt.utils.minions.minion_data_updated(self.opts, 'minion1')
+        salt.utils.minions.minion_data_updated(self.opts, 'new')
+        self.opts['minion_data_index'] = False
+        self.assertEqual(self.check('os:Arch', False), ['minion0', 'new'])
+        self.assertIn('minion1', self.check('os:CentOS', True))
+
+        # Only the minions in the journal since the index was saved are read
+        index = salt.utils.minions.MinionDataIndex(self.opts, 'grains')
+        with patch.object(index, '_index_minion',
+                          MagicMock(side_effect=index._index_minion)) as index_minion:
+            index.refresh()
+        self.assertEqual(sorted(call[0][0] for call in index_minion.call_args_list),
+                         ['minion0', 'minion1', 'new'])
+        self.assertEqual(sorted(index.search('os:Arch')), ['minion0', 'new'])
+
+
+class CompoundTestCase(TestCase):
+    '''
+    TestCase for the compound target compiler
+    '''
+    def setUp(self):
+        salt.utils.minions._COMPOUND_CACHE.clear()
+        self.addCleanup(salt.utils.minions._COMPOUND_CACHE.clear)
+
+    def match(self, expr, ids, nodegroups=None):
+        '''
+        Evaluate expr both ways, with terms matching when the word is in ids
+        '''
+        node = salt.utils.minions.compile_compound(expr, nodegroups)
+        ret = salt.utils.minions.evaluate_compound(
+            node, lambda term: term[4] in ids)
+        # 'x' stands for the one minion which matches the terms in ids
+        universe = {'x', 'y'}
+        set_ret = salt.utils.minions.evaluate_compound(
+            node,
+            lambda term: {'x'} if term[4] in ids else set(),
+            universe)
+        self.assertEqual(ret, 'x' in set_ret)
+        return ret
+
+    def test_compile(self):
+        compile_compound = salt.utils.minions.compile_compound
+        self.assertEqual(
+            compile_compound('G@os:Ubuntu and not web*'),
+            ('and', [('term', 'G', None, 'os:Ubuntu', 'G@os:Ubuntu'),
+                     ('not', ('term', None, None, 'web*', 'web*'))]))
+        self.assertEqual(
+            compile_compound(['a', 'or', 'b', 'and', 'c']),
+            ('or', [('term', None, None, 'a', 'a'),
+                    ('and', [('term', None, None, 'b', 'b'),
+                             ('term', None, None, 'c', 'c')])]))
+        self.assertEqual(
+            compile_compound('I|@roles|web'),
+            ('term', 'I', '|', 'roles|web', 'I|@roles|web'))
+        # Compiled targets are cached
+        self.assertIs(compile_compound('a and b'), compile_compound('a and b'))
+
+    def test_evaluate(self):
+        self.assertTrue(self.match('a and b', ('a', 'b')))
+        self.assertFalse(self.match('a and b', ('a',)))
+        self.assertTrue(self.match('a or b and c', ('a',)))
+        self.assertFalse(self.match('( a or b ) and c', ('a',)))
+        self.assertTrue(self.match('a not b', ('a',)))
+        self.assertFalse(self.match('not a', ('a',)))
+        self.assertTrue(self.match('not ( a and b )', ('a',)))
+        self.assertTrue(self.match('( a or b ) not c', ('b',)))
+        # An unclosed parenthesis is closed at the end of the expression
+        self.assertTrue(self.match('( a or b', ('b',)))
+
+    def test_invalid(self):
+        for expr in ('', 'and a', 'a or', '( or a )', 'a )', 'a b',
+                     'a ( b )', 42):
+            self.assertRaises(SaltInvocationError,
+                              salt.utils.minions.compile_compound, expr)
+        # Errors are cached as well
+        self.assertRaises(SaltInvocationError,
+                          salt.utils.minions.compile_compound, 'a b')
+
+    def test_nodegroups(self):
+        nodegroups = {'web': ['a', 'or', 'b'],
+                      'both': 'N@web and c'}
+        self.assertTrue(self.match('N@web and c', ('b', 'c'), nodegroups))
+        self.assertFalse(self.match('N@both', ('b',), nodegroups))
+        self.assertTrue(self.match('N@both', ('a', 'c'), nodegroups))
+        # A nodegroup change is picked up
+        nodegroups = {'web': 'L@d,e'}
+        self.assertEqual(
+            salt.utils.minions.compile_compound('N@web', nodegroups),
+            ('term', 'L', None, 'd,e', 'L@d,e'))
+
+    def test_short_circuit(self):
+        node = salt.utils.minions.compile_compound('a and b or c')
+        calls = []
+
+        def _match_term(term):
+            calls.append(term[4])
+            return term[4] == 'c'
+
+        self.assertTrue(salt.utils.minions.evaluate_compound(node, _match_term))
+        self.assertEqual(calls, ['a', 'c'])
+
+    def test_check_compound_minions(self):
+        opts = {'minion_data_cache': True,
+                'nodegroups': {'group1': 'L@m1,m2'}}
+        ckminions = salt.utils.minions.CkMinions(opts)
+        grains = MagicMock(return_value={'minions': ['m1', 'm3'], 'missing': []})
+        with patch.object(ckminions, '_pki_minions',
+                          MagicMock(return_value=['m1', 'm2', 'm3'])), \
+                patch.object(ckminions, '_check_grain_minions', grains):
+            ret = ckminions._check_compound_minions(
+                'G@os:Ubuntu and not N@group1', None, True)
+            self.assertEqual(ret['minions'], ['m3'])
+            grains.assert_called_once_with('os:Ubuntu', ':', True)
+            ret = ckminions._check_compound_minions(
+                'm2 or L@m1,m4', None, True)
+            self.assertEqual(sorted(ret['minions']), ['m1', 'm2'])
+            self.assertEqual(ret['missing'], ['m4'])
+            ret = ckminions._check_compound_minions('m1 and or', None, True)
+            self.assertEqual(ret, {'minions': [], 'missing': []})
@@ -16,6 +16,7 @@ import tests.integration as integration
 
 # Import Salt Libs
 import salt.config
+import salt.utils.schedule
 from salt.utils.schedule import Schedule
 
 # pylint: disable=import-error,unused-import
@@ -331,3 +332,66 @@ class ScheduleTestCase(TestCase):
         self.schedule.eval()
         self.assertTrue(self.schedule.opts['schedule']['testjob']['_splay'] >
                         self.schedule.opts['schedule']['testjob']['_next_fire_time'])
+
+    def test_eval_due_jobs(self):
+        '''
+        Tests eval only evaluates the jobs whose fire time has come
+        '''
+        self.schedule.opts.update({'pillar': {'schedule': {}}})
+        self.schedule.opts.update({'schedule': {'testjob': {'function': 'test.true', 'seconds': 60}}})
+        now = datetime.datetime(2019, 6, 1, 12, 0, 0)
+        self.schedule.eval(now=now)
+        fire_time = self.schedule.opts['schedule']['testjob']['_next_fire_time']
+        self.assertEqual(self.schedule._deadlines['testjob'][0], fire_time)
+
+        with patch.object(self.schedule, '_next_eval', MagicMock(return_value=None)) as next_eval:
+            self.schedule.eval(now=now + datetime.timedelta(seconds=10))
+            next_eval.assert_not_called()
+            self.schedule.eval(now=fire_time)
+            self.assertEqual(next_eval.call_count, 1)
+
+    def test_eval_due_jobs_modified(self):
+        '''
+        Tests eval evaluates the modified jobs and the parked ones stay out of
+        the queue
+        '''
+        self.schedule.opts.update({'pillar': {'schedule': {}}})
+        self.schedule.opts.update({'schedule': {'testjob': {'function': 'test.true', 'seconds': 60}}})
+        now = datetime.datetime(2019, 6, 1, 12, 0, 0)
+        self.schedule.eval(now=now)
+
+        with patch('salt.utils.event.get_event'):
+            self.schedule.disable_job('testjob')
+        self.assertNotIn('testjob', self.schedule._deadlines)
+        self.schedule.eval(now=now + datetime.timedelta(seconds=10))
+        self.assertIsNone(self.schedule._deadlines['testjob'][0])
+
+        with patch.object(self.schedule, '_next_eval', MagicMock(return_value=None)) as next_eval:
+            self.schedule.eval(now=now + datetime.timedelta(seconds=60))
+            next_eval.assert_not_called()
+            # The clock going back evaluates every job again
+            self.schedule.eval(now=now)
+            self.assertEqual(next_eval.call_count, 1)
+
+    def test_eval_due_jobs_when_recurring(self):
+        '''
+        Tests a job running at a time of day is evaluated again once it ran
+        '''
+        self.schedule.opts.update({'pillar': {'schedule': {}}})
+        self.schedule.opts.update({'schedule': {'testjob': {'function': 'test.true',
+                                                            'when': '5:00pm'}}})
+        now = datetime.datetime(2017, 11, 29, 16, 58)
+        end = datetime.datetime(2017, 12, 1, 17, 5)
+        parse = salt.utils.schedule.dateutil_parser.parse
+        runs = []
+        with patch.object(self.schedule, '_run_job',
+                          MagicMock(side_effect=lambda func, data: runs.append(now))), \
+                patch('salt.utils.minion.running', MagicMock(return_value=[])), \
+                patch('salt.utils.schedule.dateutil_parser.parse',
+                      MagicMock(side_effect=lambda when: parse(when, default=now))):
+            while now <= end:
+                self.schedule.eval(now=now)
+                now += datetime.timedelta(seconds=60)
+        self.assertEqual(runs, [datetime.datetime(2017, 11, 29, 17, 0),
+                                datetime.datetime(2017, 11, 30, 17, 0),
+                                datetime.datetime(2017, 12, 1, 17, 0)])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# Import python libs
+from __future__ import absolute_import, unicode_literals, print_function
+
+# Import Salt Testing libs
+from tests.support.unit import TestCase
+
+# Import Salt libs
+import salt.utils.workerpools
+
+
+class WorkerPoolsTestCase(TestCase):
+
+    def setUp(self):
+        self.opts = {'worker_threads': 5,
+                     'worker_pools': {
+                         'fileserver': {'worker_threads': 4,
+                                        'commands': ['_serve_file', '_file_hash']},
+                         'pillar': {'worker_threads': 2,
+                                    'queue_depth': 10,
+                                    'commands': '_pillar'}}}
+
+    def test_get_pools(self):
+        pools = salt.utils.workerpools.get_pools(self.opts)
+        self.assertEqual(list(pools), ['default', 'fileserver', 'pillar'])
+        self.assertEqual(pools['default']['worker_threads'], 5)
+        self.assertEqual(pools['fileserver'],
+                         {'worker_threads': 4,
+                          'queue_depth': 4000,
+                          'commands': ['_serve_file', '_file_hash']})
+        self.assertEqual(pools['pillar'],
+                         {'worker_threads': 2,
+                          'queue_depth': 10,
+                          'commands': ['_pillar']})
+
+    def test_get_pools_invalid(self):
+        self.opts['worker_pools'].update({'default': {'commands': ['_return']},
+                                          'broken': ['_return'],
+                                          'bad_size': {'worker_threads': 'many'}})
+        pools = salt.utils.workerpools.get_pools(self.opts)
+        self.assertEqual(list(pools), ['default', 'fileserver', 'pillar'])
+        self.assertEqual(pools['default']['commands'], [])
+
+        self.opts['worker_pools'] = None
+        self.assertEqual(list(salt.utils.workerpools.get_pools(self.opts)),
+                         ['default'])
+
+    def test_classify(self):
+        routes = salt.utils.workerpools.get_routes(
+            salt.utils.workerpools.get_pools(self.opts))
+        classify = salt.utils.workerpools.classify
+        self.assertEqual(
+            classify({'enc': 'clear', 'load': {'cmd': '_pillar'}}, routes),
+            'pillar')
+        self.assertEqual(
+            classify({'enc': 'aes', 'load': b'crypted', 'cmd': '_file_hash'}, routes),
+            'fileserver')
+        self.assertEqual(
+            classify({'enc': 'aes', 'load': b'crypted', 'cmd': '_return'}, routes),
+            'default')
+        # Requests of older minions and bad payloads
+        self.assertEqual(classify({'enc': 'aes', 'load': b'crypted'}, routes),
+                         'default')
+        self.assertEqual(classify({'enc': 'clear', 'load': 'bad'}, routes),
+                         'default')
+        self.assertEqual(classify('bad', routes), 'default')